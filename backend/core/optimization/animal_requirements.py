@@ -167,7 +167,8 @@ def rsm_calculate_an_requirements(animal_inputs):
         }
         df = pd.DataFrame(data)
 
-        # Plot the result in a table format
+        # Plot the result in a table format (matplotlib is only loaded when a table is rendered)
+        import matplotlib.pyplot as plt
         fig, ax = plt.subplots(figsize=(6, 2))
         ax.axis('off')
         table = ax.table(
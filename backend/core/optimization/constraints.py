@@ -10,7 +10,9 @@ This module contains all constraint evaluation logic for diet optimization:
 """
 
 import numpy as np
+from collections.abc import Sequence
 from dataclasses import dataclass
+from functools import lru_cache
 
 # Import configuration
 from .config import Constraints, CONSTRAINT_TOLERANCE_RANGES
@@ -303,6 +305,236 @@ def evaluate_constraints(x, nutritional_supply, nutrient_targets, epsilon, f_nd,
     return constraint_severities, satisfaction_flag
 
 
+_SEVERITY_LEVELS = ("perfect", "good", "marginal", "infeasible")
+
+# Core constraint name -> (supply/target index, tolerance key), as mapped in evaluate_constraints
+_CORE_TOLERANCE_KEYS = {
+    "DMI_max": (0, "dmi"), "DMI_min": (0, "dmi"),
+    "Energy_max": (1, "energy"), "Energy_min": (1, "energy"),
+    "MP_max": (2, "protein"), "MP_min": (2, "protein"),
+    "Ca_min": (3, "ca"), "P_min": (4, "p"), "NDF_max": (5, "ndf"), "NDFfor_min": (6, "ndf_for"),
+    "Starch_max": (7, "starch"), "EE_max": (8, "fat"),
+}
+
+# Conditional constraint name -> (severity key, category mask, thr key, default fraction, is_min)
+_CONDITIONAL_TOLERANCE_KEYS = (
+    ("Conc_max", "conc_max", "mask_conc_all", "conc_max", 0.6, False),
+    ("MoistForage_min", "moist_forage_min", "mask_moist_forage", "moist_forage_min", 0.2, True),
+    ("Straw_max", "forage_straw_max", "mask_straw", "forage_straw_max", 0.25, False),
+    ("LQF_max", "forage_fibrous_max", "mask_lqf", "forage_fibrous_max", 0.80, False),
+    ("Byprod_max", "conc_byprod_max", "mask_wet_byprod", "conc_byprod_max", 0.30, False),
+    ("WetOther_max", "other_wet_ingr_max", "mask_wet_other", "other_wet_ingr_max", 0.30, False),
+)
+
+
+_CATEGORY_MASKS = ("mask_straw", "mask_moist_forage", "mask_lqf", "mask_wet_byprod", "mask_wet_other", "mask_conc_all")
+
+
+def category_matrix(categories, f_nd):
+    """
+    (n_feeds, k) 0/1 membership matrix of the constraint categories, with the k mask
+    keys. Built once per feed library so the per-diet category amounts of a whole
+    population are a single product Q @ M.
+    """
+    masks = {key: categories[key] for key in _CATEGORY_MASKS if key in categories}
+    if "mask_conc_all" not in masks:
+        fd_type_lower = np.char.strip(np.char.lower(np.array(f_nd["Fd_Type"], dtype=str)))
+        masks["mask_conc_all"] = fd_type_lower == "concentrate"
+    keys = tuple(masks)
+    return keys, np.column_stack([np.asarray(masks[k], dtype=float) for k in keys])
+
+
+def _category_amounts(Q, categories, f_nd, matrix=None):
+    # Per-diet kg of each constraint category, shared by the batched build and evaluate passes
+    keys, M = matrix if matrix is not None else category_matrix(categories, f_nd)
+    return dict(zip(keys, (Q @ M).T))
+
+
+def _severity_codes(dev, tol, eps=0.0, inclusive_perfect=False):
+    # Vectorized band lookup: index into _SEVERITY_LEVELS, first matching level wins, default infeasible
+    codes = np.full(dev.shape, 3, dtype=np.int8)
+    open_ = np.ones(dev.shape, dtype=bool)
+    for k, level in enumerate(_SEVERITY_LEVELS):
+        if level not in tol:
+            continue
+        lo, hi = tol[level]
+        if inclusive_perfect and level == "perfect":
+            hit = ((dev + eps) >= lo) & ((dev - eps) <= hi)
+        else:
+            hit = (lo <= dev + eps) & (dev + eps < hi + eps)
+        hit &= open_
+        codes[hit] = k
+        open_ &= ~hit
+    return codes
+
+
+def evaluate_constraints_batch(Q, nutritional_supply, nutrient_targets, epsilon, f_nd, Trg_Dt_DMIn, thr, categories, animal_requirements, *, energy_offset=1.0, mp_offset=0.10, dmi_lo=0.90, dmi_hi=1.05, cfg=None, constraint_names=None, category_sums=None):
+    """
+    Population version of evaluate_constraints.
+
+    Q is (pop, n_feeds) in kg/d, nutritional_supply and nutrient_targets are (pop, 9)
+    and must be finite. Severity bands and the satisfaction flag are computed with
+    array operations over axis 0. Returns (constraint_maps, satisfaction_flags), one
+    entry per row, identical to calling evaluate_constraints row by row;
+    constraint_maps is a SeverityMaps that builds each dict when it is read.
+    category_sums can pass the per-diet category amounts already computed by the
+    constraint builder.
+    """
+    S = np.asarray(nutritional_supply, dtype=float)
+    T = np.asarray(nutrient_targets, dtype=float)
+    n = len(S)
+    animal_type = animal_requirements.get("An_StatePhys", "Lactating Cow")
+    if constraint_names is None:
+        constraint_names = []
+
+    # Severity codes per canonical key (-1 = not evaluated on that row), in evaluate_constraints order
+    codes = {}
+
+    for original_name in constraint_names:
+        if original_name not in _CORE_TOLERANCE_KEYS:
+            continue
+        idx, tol_key = _CORE_TOLERANCE_KEYS[original_name]
+        target = T[:, idx]
+        present = target > 0
+        if not np.any(present):
+            continue
+        actual = S[:, idx]
+        tolerance_config = CONSTRAINT_TOLERANCE_RANGES[animal_type].get(tol_key)
+        if not tolerance_config:
+            continue
+        basis = tolerance_config.get("basis", "target")
+        tol_type = tolerance_config.get("tolerance_type")
+        denom = np.maximum(target, 1e-12)
+        shortfall = np.where(actual < target, (target - actual) / denom * 100.0, 0.0)
+        excess = np.where(actual > target, (actual - target) / denom * 100.0, 0.0)
+
+        if basis == "target":
+            if tol_type == "both":
+                deviation_pct = shortfall if original_name.endswith("_min") else excess
+            elif tol_type == "minimum":
+                deviation_pct = shortfall
+            else:
+                deviation_pct = np.abs((actual - target) / denom * 100.0)
+            sev = _severity_codes(deviation_pct, tolerance_config, eps=1e-9, inclusive_perfect=True)
+        else:  # basis == "limit"
+            sev = _severity_codes(excess, tolerance_config, eps=1e-9)
+            if tolerance_config.get("perfect_zero", False):
+                sev[excess <= 1e-9] = 0
+
+        key = ca_constraint_name(original_name)
+        prev = codes.get(key)
+        codes[key] = np.where(present, sev, -1 if prev is None else prev).astype(np.int8)
+
+    # Derived/conditional constraints that depend on diet structure
+    has_dmi = S[:, 0] > 0
+    for name, sev_key, mask_key, thr_key, default, is_min in _CONDITIONAL_TOLERANCE_KEYS:
+        if name not in constraint_names or not np.any(has_dmi):
+            continue
+        if category_sums is not None and mask_key in category_sums:
+            amount = category_sums[mask_key]
+        else:
+            mask = categories.get(mask_key)
+            amount = Q[:, mask].sum(axis=1) if mask is not None else np.zeros(n)
+        limit = float(thr.get(thr_key, default) * Trg_Dt_DMIn)
+        if name == "Conc_max":
+            if limit <= 0:
+                continue
+            dev = np.where(amount > limit, ((amount - limit) / limit) * 100.0, 0.0)
+        elif is_min:
+            dev = np.where(amount < limit, (limit - amount) / max(limit, 1e-12) * 100.0, 0.0)
+        else:
+            dev = np.where(amount > limit, (amount - limit) / max(limit, 1e-12) * 100.0, 0.0)
+        tol = CONSTRAINT_TOLERANCE_RANGES[animal_type].get(sev_key)
+        if tol:
+            codes[sev_key] = np.where(has_dmi, _severity_codes(dev, tol), -1).astype(np.int8)
+
+    # Final satisfaction flag using severity codes and density conflicts
+    eps = 1e-6
+    dmi_cap = (dmi_hi + epsilon) * T[:, 0]
+    emin_req = (T[:, 1] * 0.95 - epsilon)
+    mpmin_req = (T[:, 2] * 0.95 - epsilon)
+
+    E_density = S[:, 1] / np.maximum(S[:, 0], eps)
+    MP_density = S[:, 2] / np.maximum(S[:, 0], eps)
+
+    conflict_E = emin_req / np.maximum(E_density, eps) > dmi_cap + 1e-9
+    conflict_MP = mpmin_req / np.maximum(MP_density, eps) > dmi_cap + 1e-9
+
+    safety_violation_levels = {
+        "dmi_min": (2, 3), "dmi_max": (2, 3),
+        "energy_min": (3,), "energy_max": (3,),
+        "protein_min": (3,), "protein_max": (3,),
+    }
+    critical_nutrients = {ca_constraint_name(name) for name in ["DMI_min", "DMI_max", "Energy_min", "Energy_max", "MP_min", "MP_max"]}
+
+    safety_violations = np.zeros(n, dtype=int)
+    critical_infeasible = np.zeros(n, dtype=int)
+    counts = np.zeros((4, n), dtype=int)
+    for cname, sev in codes.items():
+        lvls = safety_violation_levels.get(cname)
+        if lvls:
+            safety_violations += np.isin(sev, lvls)
+        if cname in critical_nutrients:
+            critical_infeasible += (sev == 3)
+        for k in range(4):
+            counts[k] += (sev == k)
+    perfect_count, good_count, marginal_count, infeasible_count = counts
+    total_constraints = counts.sum(axis=0)
+
+    satisfaction_flags = np.select(
+        [
+            conflict_E & conflict_MP,
+            conflict_E,
+            conflict_MP,
+            critical_infeasible > 0,
+            safety_violations > 1,
+            infeasible_count > 1,
+            total_constraints == 0,
+            (marginal_count + infeasible_count) >= 4,
+            perfect_count >= (total_constraints * 0.85),
+            (perfect_count + good_count) >= (total_constraints * 0.75),
+        ],
+        [
+            "INFEASIBLE|CONFLICT:E&MP",
+            "INFEASIBLE|CONFLICT:E",
+            "INFEASIBLE|CONFLICT:MP",
+            "INFEASIBLE",
+            "INFEASIBLE",
+            "INFEASIBLE",
+            "MARGINAL",
+            "INFEASIBLE",
+            "PERFECT",
+            "GOOD",
+        ],
+        default="MARGINAL",
+    ).tolist()
+
+    # Per-diet severity dicts are only built for the rows that get read
+    keys = tuple(codes)
+    C = np.column_stack([codes[k] for k in keys]) if keys else np.empty((n, 0), dtype=np.int8)
+    return SeverityMaps(keys, C), satisfaction_flags
+
+
+class SeverityMaps(Sequence):
+    """
+    Read-only sequence of per-diet constraint severity dicts (as returned by
+    evaluate_constraints), stored as an int8 code matrix and materialized on access.
+    """
+    __slots__ = ("keys", "codes")
+
+    def __init__(self, keys, codes):
+        self.keys = tuple(keys)
+        self.codes = codes  # (n, len(keys)), index into _SEVERITY_LEVELS, -1 = not evaluated
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return {k: _SEVERITY_LEVELS[c] for k, c in zip(self.keys, self.codes[i].tolist()) if c >= 0}
+
+
 def build_conditional_constraints(x, nutritional_supply, nutrient_targets, epsilon, f_nd, Trg_Dt_DMIn, thr, categories, animal_requirements, energy_offset=1.0, mp_offset=0.10,
                                   apply_offset_on_max=True, dmi_lo=0.90, dmi_hi=1.05, cfg=None):
     G = []
@@ -421,11 +653,131 @@ def build_conditional_constraints(x, nutritional_supply, nutrient_targets, epsil
         scales.append(max(thr["conc_max"] * max(total_dmi, 1e-6), 1e-3))
         constraint_names.append("Conc_max")
 
-    
+
     # Central classification handled elsewhere
     return G, scales, constraint_names
 
 
+# Conditional constraints of the batched builder: (category flag, mask, thr key, name, sign of G)
+_CONDITIONAL_BUILD = (
+    ("has_straw", "mask_straw", "forage_straw_max", "Straw_max", 1.0),
+    ("has_moist_forage", "mask_moist_forage", "moist_forage_min", "MoistForage_min", -1.0),
+    ("has_lqf", "mask_lqf", "forage_fibrous_max", "LQF_max", 1.0),
+    ("has_wet_byprod", "mask_wet_byprod", "conc_byprod_max", "Byprod_max", 1.0),
+    ("has_wet_other", "mask_wet_other", "other_wet_ingr_max", "WetOther_max", 1.0),
+)
+# 12 core + 5 conditional + Conc_max
+_MAX_BATCH_CONSTRAINTS = 12 + len(_CONDITIONAL_BUILD) + 1
+
+
+def build_conditional_constraints_batch(Q, nutritional_supply, nutrient_targets, epsilon, f_nd, Trg_Dt_DMIn, thr, categories,
+                                        energy_offset=1.0, mp_offset=0.10, apply_offset_on_max=True, dmi_lo=0.90, dmi_hi=1.05,
+                                        category_sums=None, constraint_names=None):
+    """
+    Population version of build_conditional_constraints.
+
+    Q is (pop, n_feeds) in kg/d, nutritional_supply and nutrient_targets are (pop, 9)
+    (the MP target varies per diet). Returns G and scales as (pop, m) arrays plus the
+    m constraint names, in the same order as build_conditional_constraints. Conc_max
+    is only defined for a positive total DMI; on other rows its column holds G = 0
+    with a unit scale, i.e. the padding value. category_sums can pass precomputed
+    per-diet category amounts (see _category_amounts). The names only depend on
+    (thr, categories, apply_offset_on_max); callers that fixed them once can pass
+    constraint_names, which is then returned as-is instead of a new list.
+    """
+    S = np.asarray(nutritional_supply, dtype=float)
+    T = np.asarray(nutrient_targets, dtype=float)
+    if category_sums is None:
+        category_sums = _category_amounts(Q, categories, f_nd)
+
+    # Columns are written straight into preallocated (pop, max) matrices and trimmed to the m built ones
+    G = np.empty((len(S), _MAX_BATCH_CONSTRAINTS))
+    scales = np.empty_like(G)
+    names = [] if constraint_names is None else None
+    m = 0
+
+    def add(g, scale, name):
+        nonlocal m
+        G[:, m] = g
+        scales[:, m] = scale
+        m += 1
+        if names is not None:
+            names.append(name)
+
+    # DMI constraints
+    add(S[:, 0] - ((dmi_hi + epsilon) * T[:, 0]), T[:, 0], "DMI_max")
+    add(((dmi_lo - epsilon) * T[:, 0]) - S[:, 0], T[:, 0], "DMI_min")
+
+    # Energy constraints
+    E_req = 0.95 * T[:, 1]
+    E_tgt = T[:, 1] + energy_offset
+    if apply_offset_on_max:
+        add(S[:, 1] - (1.20 + epsilon) * E_tgt, E_tgt, "Energy_max")
+    add((E_req - epsilon) - S[:, 1], E_req, "Energy_min")
+
+    # Protein constraints
+    MP_req = 0.95 * T[:, 2]
+    MP_tgt = T[:, 2] + mp_offset
+    if apply_offset_on_max:
+        add(S[:, 2] - (1.20 + epsilon) * MP_tgt, MP_tgt, "MP_max")
+    add((MP_req - epsilon) - S[:, 2], MP_req, "MP_min")
+
+    # Mineral constraints
+    add(T[:, 3] - S[:, 3], T[:, 3], "Ca_min")
+    add(T[:, 4] - S[:, 4], T[:, 4], "P_min")
+
+    # Nutrient limits
+    add(S[:, 5] - (T[:, 5] + epsilon), T[:, 5], "NDF_max")
+    add((T[:, 6] - epsilon) - S[:, 6], T[:, 6], "NDFfor_min")
+    add(S[:, 7] - (T[:, 7] + epsilon), T[:, 7], "Starch_max")
+    add(S[:, 8] - (T[:, 8] + epsilon), T[:, 8], "EE_max")
+
+    # Conditional ingredient-specific constraints (sum of the category, per diet)
+    for flag, mask_key, thr_key, name, sign in _CONDITIONAL_BUILD:
+        if not categories[flag] or (sign < 0 and thr_key not in thr):
+            continue
+        limit = thr[thr_key] * Trg_Dt_DMIn
+        add(sign * (category_sums[mask_key] - limit), limit, name)
+
+    total_dmi = S[:, 0]
+    if "conc_max" in thr:
+        conc_kg = category_sums["mask_conc_all"]
+        has_dmi = total_dmi > 0
+        add(np.where(has_dmi, conc_kg - (thr["conc_max"] * total_dmi), 0.0),
+            np.where(has_dmi, np.maximum(thr["conc_max"] * np.maximum(total_dmi, 1e-6), 1e-3), 1.0),
+            "Conc_max")
+
+    return G[:, :m], scales[:, :m], (names if names is not None else constraint_names)
+
+
+def build_and_evaluate_constraints_batch(Q, nutritional_supply, nutrient_targets, epsilon, f_nd, Trg_Dt_DMIn, thr, categories, animal_requirements, *,
+                                         energy_offset=1.0, mp_offset=0.10, apply_offset_on_max=True, dmi_lo=0.90, dmi_hi=1.05, cfg=None, rows=None,
+                                         category_matrix=None, constraint_names=None):
+    """
+    Single constraint pass for a population: G / scales / names from
+    build_conditional_constraints_batch and the severity maps / flags from
+    evaluate_constraints_batch, sharing one computation of the category amounts.
+    rows (index array or mask) selects the diets to classify, e.g. those with a
+    finite supply; maps and flags are returned for those rows only. category_matrix
+    can pass the cached result of category_matrix(categories, f_nd) and
+    constraint_names the names fixed for the run.
+    """
+    category_sums = _category_amounts(Q, categories, f_nd, category_matrix)
+    G, scales, constraint_names = build_conditional_constraints_batch(
+        Q, nutritional_supply, nutrient_targets, epsilon, f_nd, Trg_Dt_DMIn, thr, categories,
+        energy_offset=energy_offset, mp_offset=mp_offset, apply_offset_on_max=apply_offset_on_max,
+        dmi_lo=dmi_lo, dmi_hi=dmi_hi, category_sums=category_sums, constraint_names=constraint_names
+    )
+    if rows is None:
+        rows = slice(None)
+    constraint_maps, satisfaction_flags = evaluate_constraints_batch(
+        Q[rows], nutritional_supply[rows], nutrient_targets[rows], epsilon, f_nd, Trg_Dt_DMIn, thr, categories, animal_requirements,
+        energy_offset=energy_offset, mp_offset=mp_offset, dmi_lo=dmi_lo, dmi_hi=dmi_hi, cfg=cfg,
+        constraint_names=constraint_names, category_sums={k: v[rows] for k, v in category_sums.items()}
+    )
+    return G, scales, constraint_names, constraint_maps, satisfaction_flags
+
+
 def evaluate_constraint_adequacy(actual, target, constraint_key, animal_requirements, constraint_name, units=""):
     """Evaluate constraint using CONSTRAINT_TOLERANCE_RANGES logic for adequacy display"""
     animal_type = animal_requirements.get("An_StatePhys", "Lactating Cow")
@@ -484,44 +836,83 @@ def evaluate_constraint_adequacy(actual, target, constraint_key, animal_requirem
     return f"{status} {adequacy_pct:.1f}% {severity.upper()} {type_desc}"
 
 
+def evaluate_constraint_adequacy_many(actual, target, constraint_keys, animal_requirements, constraint_names, units):
+    """
+    evaluate_constraint_adequacy for several constraints at once: deviations and severity
+    bands are computed as arrays, only the display texts are formatted one by one.
+    Returns one text per constraint (None where the constraint has no tolerance range).
+    """
+    animal_type = animal_requirements.get("An_StatePhys", "Lactating Cow")
+    tolerance_ranges = CONSTRAINT_TOLERANCE_RANGES.get(animal_type, {})
+    configs = [tolerance_ranges.get(key) for key in constraint_keys]
+
+    actual = np.asarray(actual, dtype=float)
+    target = np.asarray(target, dtype=float)
+    is_limit = np.array([c is not None and c.get("basis", "target") != "target" for c in configs], dtype=bool)
+    is_minimum = np.array([c is not None and c.get("basis", "target") == "target"
+                           and c.get("tolerance_type", "both") == "minimum" for c in configs], dtype=bool)
+    # (n, level, lo/hi); NaN where a constraint has no such level, so it never matches
+    bands = np.array([[c[level] if c is not None and level in c else (np.nan, np.nan) for level in _SEVERITY_LEVELS]
+                      for c in configs], dtype=float).reshape(len(configs), len(_SEVERITY_LEVELS), 2)
+
+    # Deviation percentage per basis type (shortfall, excess over limit, or either direction)
+    denom = np.maximum(target, 1e-12)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        deviation_pct = np.where(
+            is_limit, np.where(actual > target, (actual - target) / denom * 100.0, 0.0),
+            np.where(is_minimum, np.where(actual < target, (target - actual) / denom * 100.0, 0.0),
+                     np.abs((actual - target) / denom * 100.0)))
+        adequacy_pct = 100.0 * actual / denom
+
+    lo, hi = bands[:, :, 0], bands[:, :, 1]
+    d = deviation_pct[:, None]
+    in_band = (lo <= d + 1e-9) & (d + 1e-9 < hi + 1e-9)
+    in_band[:, 0] = ((d[:, 0] + 1e-9) >= lo[:, 0]) & ((d[:, 0] - 1e-9) <= hi[:, 0])
+    severity_idx = np.where(in_band.any(axis=1), in_band.argmax(axis=1), len(_SEVERITY_LEVELS) - 1)
+
+    texts = []
+    for config, a, t, pct, sev, limit, unit in zip(configs, actual.tolist(), target.tolist(), adequacy_pct.tolist(),
+                                                   severity_idx.tolist(), is_limit.tolist(), units):
+        if config is None:
+            texts.append(None)
+            continue
+        severity = _SEVERITY_LEVELS[sev]
+        status = "⚠️" if severity in ("marginal", "infeasible") else "✓"
+        type_desc = f"(supply {a:.2f} / {'LIMIT' if limit else 'REQ'} {t:.2f} {unit})"
+        texts.append(f"{status} {pct:.1f}% {severity.upper()} {type_desc}")
+    return texts
+
+
+def _build_canon_index():
+    """
+    Map every canonical key and normalized alias of CONSTRAINT_TOLERANCE_RANGES
+    to its (canonical_key, config), first match in animal-type / key order winning.
+    """
+    index = {}
+    for constraints in CONSTRAINT_TOLERANCE_RANGES.values():
+        for key, config in constraints.items():
+            index.setdefault(key, (key, config))
+            for alias in config.get("aliases", []):
+                alias_normalized = alias.strip().lower().replace(" ", "_").replace("-", "_")
+                index.setdefault(alias_normalized, (key, config))
+    return index
+
+
+_CANON = _build_canon_index()
+
+
+@lru_cache(maxsize=512)
 def ca_constraint_name(name: str, format_type: str = "canonical", severity=None, deviation_percent=None) -> str:
     # constraint name function - handles all constraint name operations
+    # (memoized: the tolerance config it searches is static, and the same names recur on every request)
     if not name:
         return ""
     
     # Normalize input: lowercase, replace spaces/hyphens with underscores
     normalized_name = str(name).strip().lower().replace(" ", "_").replace("-", "_")
     
-    # Find canonical key and config
-    canonical_key = None
-    constraint_config = None
-    
-    # Search through all constraint configs in all animal types for aliases
-    for animal_type, constraints in CONSTRAINT_TOLERANCE_RANGES.items():
-        for key, config in constraints.items():
-            # Check if it's already the canonical key
-            if normalized_name == key:
-                canonical_key = key
-                constraint_config = config
-                break
-            
-            # Check aliases if they exist
-            aliases = config.get("aliases", [])
-            for alias in aliases:
-                alias_normalized = alias.strip().lower().replace(" ", "_").replace("-", "_")
-                if normalized_name == alias_normalized:
-                    canonical_key = key
-                    constraint_config = config
-                    break
-            
-            if canonical_key:
-                break
-        if canonical_key:
-            break
-    
-    # If not found, use normalized name
-    if not canonical_key:
-        canonical_key = normalized_name
+    # Find canonical key and config (if not found, use normalized name)
+    canonical_key, constraint_config = _CANON.get(normalized_name, (normalized_name, None))
     
     # Get base display value based on format_type
     if format_type == "canonical":
@@ -650,7 +1041,7 @@ PRESENTATION = {
     "max_actions": 4,  # show at most this many actions
 }
 
-CRITICAL_REQS = {"protein", "energy", "dmi", "ndf_for"}
+CRITICAL_REQS = frozenset({"protein", "energy", "dmi", "ndf_for"})
 
 
 @dataclass
@@ -736,7 +1127,7 @@ def pick_band_and_distance(constraint_name: str, pct_dev: float, ranges: dict) -
             magnitude = abs(pct_dev)
 
     # Place magnitude into band
-    for band in ("perfect", "good", "marginal", "infeasible"):
+    for band in _SEVERITY_LEVELS:
         lo, hi = band_tuple(band)
         if lo <= magnitude < hi:
             span = max(1e-9, hi - lo)
@@ -750,6 +1141,76 @@ def pick_band_and_distance(constraint_name: str, pct_dev: float, ranges: dict) -
     return ConstraintEval("infeasible", direction, float(norm), float(pct_dev))
 
 
+def _build_band_table(ranges):
+    """
+    Per-constraint (kind, bands) of a tolerance-range dict for pick_bands_batch:
+    kind is 0 = limit (max-type), 1 = min-type target, 2 = both-type target, and
+    bands the (band, lo, hi, span) rows in evaluation order.
+    """
+    table = {}
+    for name, info in ranges.items():
+        if name not in CONSTRAINT_META or "basis" not in info:
+            continue  # resolved by pick_band_and_distance itself
+        if info["basis"] == "limit":
+            kind = 0
+        elif (info.get("tolerance_type") or "").lower() in ("min", "minimum"):
+            kind = 1
+        else:
+            kind = 2
+        bands = []
+        for band in _SEVERITY_LEVELS:
+            lo, hi = tuple(info[band]) if band in info else (0.0, 100.0)
+            bands.append((band, lo, hi, max(1e-9, hi - lo)))
+        table[name] = (kind, tuple(bands))
+    return table
+
+
+# Band tables of the configured animal classes, built at import
+_CLASS_BAND_TABLES = tuple((ranges, _build_band_table(ranges)) for ranges in CONSTRAINT_TOLERANCE_RANGES.values())
+
+
+def _band_table(ranges):
+    # Any other tolerance-range dict (e.g. a caller's ranges_by_class) gets its table built per call
+    for class_ranges, table in _CLASS_BAND_TABLES:
+        if class_ranges is ranges:
+            return table
+    return _build_band_table(ranges)
+
+
+def pick_bands_batch(constraint_names, pct_devs, ranges):
+    """
+    pick_band_and_distance for several constraints at once, returning the
+    ConstraintEval list in input order. The basis / tolerance type / band
+    edges are looked up once per ranges dict instead of on every call.
+    """
+    table = _band_table(ranges)
+    evals = []
+    for name, pct_dev in zip(constraint_names, pct_devs):
+        entry = table.get(name)
+        if entry is None:
+            evals.append(pick_band_and_distance(name, pct_dev, ranges))
+            continue
+        kind, bands = entry
+        if kind == 0:  # max-type
+            direction = "over" if pct_dev > 0 else "within"
+            magnitude = max(0.0, pct_dev)
+        elif kind == 1:
+            direction = "under" if pct_dev < 0 else "within"
+            magnitude = max(0.0, -pct_dev)
+        else:
+            direction = "over" if pct_dev > 0 else ("under" if pct_dev < 0 else "within")
+            magnitude = abs(pct_dev)
+        for band, lo, hi, span in bands:
+            if lo <= magnitude < hi:
+                evals.append(ConstraintEval(band, direction, float((magnitude - lo) / span), float(pct_dev)))
+                break
+        else:
+            # Edge-case: very large → infeasible cap
+            _, lo, hi, span = bands[-1]
+            evals.append(ConstraintEval("infeasible", direction, float(min(1.0, (magnitude - lo) / span)), float(pct_dev)))
+    return evals
+
+
 def extract_constraint_deviations(diet_summary_values, intermediate_results_values, animal_requirements, f_nd, best_q=None, categories=None):
     """
     Extract signed percent deviations from existing adequacy evaluation system.
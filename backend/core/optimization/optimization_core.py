@@ -11,26 +11,35 @@ This module contains the core optimization engine for diet formulation:
 
 import numpy as np
 import logging
+import os
 import time
+from concurrent.futures import ProcessPoolExecutor
 from pymoo.core.problem import Problem
 from pymoo.algorithms.moo.nsga2 import NSGA2
 from pymoo.optimize import minimize
 from pymoo.termination import get_termination
+from pymoo.termination.collection import TerminationCollection
+from pymoo.termination.ftol import MultiObjectiveSpaceTermination
+from pymoo.termination.robust import RobustTermination
 from pymoo.operators.crossover.sbx import SimulatedBinaryCrossover
 from pymoo.operators.mutation.pm import PolynomialMutation
 from pymoo.core.sampling import Sampling
 from pymoo.core.repair import Repair
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import multiprocessing
+from pymoo.core.duplicate import DuplicateElimination
 
 # Import configuration
 from .config import Constraints
 
 # Import utilities
-from .utilities import safe_divide, safe_sum
+from .utilities import safe_divide
 
 # Import constraint evaluation
-from .constraints import evaluate_constraints, build_conditional_constraints
+from .constraints import build_and_evaluate_constraints_batch, build_conditional_constraints_batch, category_matrix
+
+logger = logging.getLogger(__name__)
+
+# Objective and constraint value given to a diet whose evaluation failed
+_EVAL_PENALTY = 1e9
 
 def rsm_bounds_xlxu(f_nd, animal_requirements, dmi_lo=0.90, dmi_hi=1.05):
     # Attribute lower (xl) and upper (xu) bounds for the decision variables
@@ -50,18 +59,13 @@ def rsm_bounds_xlxu(f_nd, animal_requirements, dmi_lo=0.90, dmi_hi=1.05):
     
     # === FEED CATEGORIZATION  ===
     feed_names = f_nd.get("Fd_Name", [])
-    feed_types = f_nd.get("Feed_Type", f_nd.get("Fd_Type", []))
     feed_categories = f_nd.get("Fd_Category", f_nd.get("Category", []))
-    dm_values = f_nd.get("Fd_DM", f_nd.get("DM_Percent", []))
-    
-    minerals = []
-    urea_feeds = []
     
-    for i, (name, ftype, category, dm) in enumerate(zip(feed_names, feed_types, feed_categories, dm_values)):
-        if str(category).strip() == "Minerals":
-            minerals.append(i)
-        elif 'urea' in str(name).lower():
-            urea_feeds.append(i)
+    names = np.asarray(feed_names, dtype=str)
+    mineral_mask = np.zeros(n, dtype=bool)
+    if len(feed_categories) == n:
+        mineral_mask = np.char.strip(np.asarray(feed_categories, dtype=str)) == "Minerals"
+    urea_mask = ~mineral_mask & (np.char.find(np.char.lower(names), 'urea') >= 0)
     
     # Mineral minimum bounds and cap (kg → proportion conversion)
     # Read from Constraints configuration 
@@ -72,21 +76,24 @@ def rsm_bounds_xlxu(f_nd, animal_requirements, dmi_lo=0.90, dmi_hi=1.05):
     mineral_min_proportion = mineral_min_kg / trg
     mineral_max_proportion = mineral_max_kg / trg
     
-    for idx in minerals:
-        xu[idx] = min(xu[idx], mineral_max_proportion)
-        xl[idx] = max(xl[idx], mineral_min_proportion)
+    if np.any(mineral_mask):
+        xu[:n] = np.where(mineral_mask, np.minimum(xu[:n], mineral_max_proportion), xu[:n])
+        xl[:n] = np.where(mineral_mask, np.maximum(xl[:n], mineral_min_proportion), xl[:n])
         # Fix inconsistent mineral bounds
-        if xl[idx] > xu[idx]:
-            print(f"   WARNING: Mineral bound conflict for {feed_names[idx]}, adjusting min to max")
-            xl[idx] = xu[idx]
-        print(f"   Mineral bounds: {feed_names[idx]} {xl[idx]*100:.1f}% - {xu[idx]*100:.1f}%")
+        conflict = mineral_mask & (xl[:n] > xu[:n])
+        if np.any(conflict):
+            logger.warning("Mineral bound conflict for %s, adjusting min to max", ", ".join(names[conflict]))
+            xl[:n][conflict] = xu[:n][conflict]
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Mineral bounds: %s %.1f%% - %.1f%%", ", ".join(names[mineral_mask]),
+                         xl[:n][mineral_mask].min() * 100, xu[:n][mineral_mask].max() * 100)
     
     # Urea cap
-    if "urea_max" in thr:
+    if "urea_max" in thr and np.any(urea_mask):
         urea_limit = thr["urea_max"]
-        for idx in urea_feeds:
-            xu[idx] = min(xu[idx], urea_limit)
-            print(f"   Urea cap: {feed_names[idx]} ≤ {urea_limit*100:.1f}%")
+        xu[:n] = np.where(urea_mask, np.minimum(xu[:n], urea_limit), xu[:n])
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Urea cap: %s <= %.1f%%", ", ".join(names[urea_mask]), urea_limit * 100)
     
     # Fix inconsistent bounds
     inconsistent = xl > xu
@@ -98,7 +105,7 @@ def rsm_bounds_xlxu(f_nd, animal_requirements, dmi_lo=0.90, dmi_hi=1.05):
     if total_xl > 1.0:
         scale_factor = 0.95 / total_xl
         xl[:n] *= scale_factor
-        print(f"   Scaled bounds by {scale_factor:.3f}")
+        logger.debug("Scaled lower bounds by %.3f", scale_factor)
     
     final_total = np.sum(xl[:n])
 
@@ -112,7 +119,9 @@ def _project_to_simplex(v):
         return np.full_like(v, 1.0 / len(v))
     u = np.sort(v)[::-1]
     cssv = np.cumsum(u)
-    rho = np.nonzero(u * (np.arange(1, len(v) + 1)) > (cssv - 1))[0][-1]
+    # diff > 0 holds on a prefix of the sorted u, so the last positive index is a binary search
+    diff = u - (cssv - 1) / np.arange(1, len(v) + 1)
+    rho = np.searchsorted(-diff, 0.0) - 1
     theta = (cssv[rho] - 1) / (rho + 1)
     w = np.maximum(v - theta, 0.0)
 
@@ -124,6 +133,23 @@ def _project_to_simplex(v):
     return w
 
 
+def _project_to_simplex_box(V, xl, xu, s=1.0, n_iter=50):
+    # Euclidean projection of each row of V onto {w : xl <= w <= xu, sum(w) = s}.
+    # w = clip(v - lam, xl, xu) where lam solves sum(w) = s; the sum is monotone
+    # decreasing in lam, so bisect on lam for all rows at once.
+    V = np.atleast_2d(np.asarray(V, dtype=float))
+    lo = (V - xu).min(axis=1, keepdims=True)   # sum(w) = sum(xu) >= s
+    hi = (V - xl).max(axis=1, keepdims=True)   # sum(w) = sum(xl) <= s
+    for _ in range(n_iter):
+        lam = 0.5 * (lo + hi)
+        above = np.clip(V - lam, xl, xu).sum(axis=1, keepdims=True) > s
+        lo = np.where(above, lam, lo)
+        hi = np.where(above, hi, lam)
+    W = np.clip(V - 0.5 * (lo + hi), xl, xu)
+    # Removes the residual bisection error (and rescales if the box cannot reach s)
+    return W * (s / W.sum(axis=1, keepdims=True))
+
+
 class SimplexPlusDmiRepair(Repair):
     def __init__(self, xl, xu):
         super().__init__()
@@ -138,51 +164,67 @@ class SimplexPlusDmiRepair(Repair):
         # clamp t (DMI)
         Y[:, -1] = np.clip(Y[:, -1], self.xl[-1], self.xu[-1])
 
-        # Project to simplex and enforce bounds
-        P = Y[:, :n]
-        P[P < 0.0] = 0.0
-        
-        for i in range(P.shape[0]):
-            P[i, :] = _project_to_simplex(P[i, :])     # Standard projection
-            P[i, :] = np.maximum(P[i, :], self.xl[:n]) # Lower bounds
-            P[i, :] = np.minimum(P[i, :], self.xu[:n]) # Upper bounds
-            P[i, :] = P[i, :] / P[i, :].sum()          # Renormalize to simplex
-        Y[:, :n] = P
+        # Project onto the simplex intersected with the [xl, xu] box in one step
+        Y[:, :n] = _project_to_simplex_box(Y[:, :n], self.xl[:n], self.xu[:n])
         return Y
 
 
 class SimplexPlusDmiSampling(Sampling):
     # Sampling in simplex
-    def __init__(self, xl, xu):
+    def __init__(self, xl, xu, seed=None):
         super().__init__()
         self.xl = np.asarray(xl, dtype=float)
         self.xu = np.asarray(xu, dtype=float)
+        self._rng = np.random.default_rng(seed)  # own PCG64 stream, reproducible with cfg["seed"]
 
     def _do(self, problem, n_samples, **kwargs):
         n_var = problem.n_var
         n = n_var - 1  # Last pos is t
 
-        # Generate samples that respect bounds
-        P = np.zeros((n_samples, n))
-        
-        for i in range(n_samples):
-            # Start with Dirichlet sampling
-            sample = np.random.dirichlet(np.ones(n))
-            
-            # Enforce bounds and renormalize
-            sample = np.maximum(sample, self.xl[:n])  # Lower bounds
-            sample = np.minimum(sample, self.xu[:n])  # Upper bounds
-            sample = sample / sample.sum()           # Renormalize to simplex
-            P[i, :] = sample
+        # Dirichlet samples on the simplex, projected onto the [xl, xu] box
+        P = self._rng.dirichlet(np.ones(n), size=n_samples)
+        P = _project_to_simplex_box(P, self.xl[:n], self.xu[:n])
 
         # t uniform in interval
         t_lo, t_hi = self.xl[-1], self.xu[-1]
-        T = np.random.uniform(t_lo, t_hi, size=(n_samples, 1))
+        T = self._rng.uniform(t_lo, t_hi, size=(n_samples, 1))
 
         X = np.hstack([P, T])
         return X
     
 
+class RoundedHashDuplicateElimination(DuplicateElimination):
+    # O(pop) duplicate filter: rows are duplicates when they match after rounding to `decimals`
+    # (replaces the O(pop^2) pairwise-distance check of eliminate_duplicates=True)
+    def __init__(self, decimals=4):
+        super().__init__()
+        self.decimals = decimals
+
+    def _keys(self, pop):
+        X = np.round(np.asarray(pop.get("X"), dtype=float), self.decimals) + 0.0  # fold -0.0 into 0.0
+        return [row.tobytes() for row in X]
+
+    def _do(self, pop, other, is_duplicate):
+        seen = set() if other is None else set(self._keys(other))
+        for i, key in enumerate(self._keys(pop)):
+            if key in seen:
+                is_duplicate[i] = True
+            else:
+                seen.add(key)
+        return is_duplicate
+
+
+def _decode_fast(x, n_ing, t_lo=-np.inf, t_hi=np.inf):
+    # Branch-free proportion-mode decode for the optimizer hot path: x is (n_var,) or (pop, n_var).
+    # No validation or info dict; external callers should use rsm_decode_solution_to_q.
+    x = np.asarray(x, dtype=float)
+    p_raw = np.clip(x[..., :n_ing], 0.0, None)
+    s = p_raw.sum(axis=-1, keepdims=True)
+    p = np.where(s > 0.0, p_raw / np.maximum(s, 1e-300), 1.0 / n_ing)
+    t = np.clip(x[..., -1], t_lo, t_hi)
+    return p * t[..., None], p, t
+
+
 def rsm_decode_solution_to_q(
     best_x,
     decision_mode,
@@ -293,25 +335,158 @@ def calculate_discount(TotalTDN, DMI, An_MBW):
     return (TDNconc - ((0.18 * TDNconc - 10.3) * (DMI_to_maint - 1))) / TDNconc
 
 
-def calculate_MEact(f_nd):     # As NRC ... NASEM eq ME = DE - UE - GAS_E (I do not have all parameters to calculate UE currently)
-    """Calculate the actual ME based on DE and other parameters."""
-    Fd_DEact = np.nan_to_num(f_nd["Fd_DEact"], nan=0.0)
+def _meact_terms(f_nd):
+    """Discount-independent parts of calculate_MEact; computed once per feed library."""
+    Fd_DE = np.nan_to_num(f_nd["Fd_DE"], nan=0.0)
     Fd_EE = np.nan_to_num(f_nd["Fd_EE"], nan=0.0)
-    Fd_isFat = f_nd["Fd_isFat"]
-    Fd_isMi = f_nd["Fd_isMi"]
+    ee_delta = np.where(Fd_EE >= 3, 0.0046 * (Fd_EE - 3), 0.0)
+    fat_idx = np.flatnonzero(f_nd["Fd_isFat"] == 1)
+    mi_idx = np.flatnonzero(f_nd["Fd_isMi"] == 1)
+    return Fd_DE, ee_delta, fat_idx, mi_idx
+
+
+def calculate_MEact(f_nd, discount=None, terms=None):     # As NRC ... NASEM eq ME = DE - UE - GAS_E (I do not have all parameters to calculate UE currently)
+    """
+    Calculate the actual ME based on DE and other parameters.
+
+    Without a discount, Fd_DEact is read from f_nd. With a discount (scalar, or a
+    (pop, 1) column for a population), DEact = Fd_DE * discount and the result has
+    one row per diet. terms can pass precomputed _meact_terms(f_nd).
+    """
+    Fd_DE, ee_delta, fat_idx, mi_idx = terms or _meact_terms(f_nd)
+    if discount is None:
+        Fd_DEact = np.nan_to_num(f_nd["Fd_DEact"], nan=0.0)
+    else:
+        Fd_DEact = Fd_DE * discount
 
-    MEact = 1.01 * Fd_DEact - 0.45
+    MEact = 1.01 * Fd_DEact - 0.45 + ee_delta
+    MEact[..., fat_idx] = Fd_DEact[..., fat_idx]
+    MEact[..., mi_idx] = 0
 
-    mask_EE = Fd_EE >= 3
-    MEact[mask_EE] += 0.0046 * (Fd_EE[mask_EE] - 3)
+    return np.clip(MEact, 0, None, out=MEact)
 
-    MEact[Fd_isFat == 1] = Fd_DEact[Fd_isFat == 1]
-    MEact[Fd_isMi == 1] = 0
 
-    return np.clip(MEact, a_min=0, a_max=None)
+def calculate_discount_vec(TotalTDN, DMI, An_MBW):
+    """Branchless calculate_discount over a population of diets (one value per row)."""
+    TotalTDN = np.asarray(TotalTDN, dtype=float)
+    DMI = np.asarray(DMI, dtype=float)
+    maint_TDN = 0.035 * An_MBW
+    TDNconc = 100 * TotalTDN / np.maximum(DMI, 1e-6)  # % of DM
+    DMI_to_maint = np.where(TotalTDN >= maint_TDN, TotalTDN / maint_TDN, 1.0)
+    disc_raw = (TDNconc - (0.18 * TDNconc - 10.3) * (DMI_to_maint - 1)) / np.maximum(TDNconc, 1e-6)
+    return np.where((DMI < 1e-6) | (TotalTDN < 0) | (TDNconc < 60), 1.0, disc_raw)
 
 
-def rsm_diet_supply(x, f_nd, animal_requirements):
+# Feed columns stacked into the supply matrix; Ca..EE are contiguous so they slice in order
+_SUPPLY_COLS = ("Fd_TDN", "Fd_DE", "Fd_NDF", "Fd_CP",
+                "Fd_Ca_kg", "Fd_P_kg", "Fd_NDF_kg", "Fd_ForNDF_kg", "Fd_St_kg", "Fd_EE_kg")
+_TDN, _DE, _NDF, _CP = range(4)
+_MINERAL_FIBER = slice(4, 10)
+
+
+def _supply_matrix(f_nd):
+    """Stack the linear supply columns of f_nd into an (n_feeds, len(_SUPPLY_COLS)) matrix."""
+    return np.column_stack([np.nan_to_num(np.asarray(f_nd[c], dtype=float), nan=0.0) for c in _SUPPLY_COLS])
+
+
+def _supply_constants(animal_requirements):
+    """Animal-level values used by the supply calculation; fixed for a whole optimization run."""
+    An_BW = animal_requirements["An_BW"]
+    An_NEL = animal_requirements["An_NEL"]
+    is_heifer = animal_requirements["An_StatePhys"].strip().lower() == "heifer"
+    return {
+        "is_heifer": is_heifer,
+        "An_MBW": animal_requirements["An_MBW"],
+        "An_BW": An_BW,
+        "An_NEL": An_NEL,
+        "An_ME": animal_requirements["An_ME"],
+        # growth + pregnancy + lactation MP, g/d (maintenance is diet dependent)
+        "MP_other": animal_requirements["An_MPg"] + animal_requirements["An_MPp"] + animal_requirements["An_MPl"],
+        # NASEM 2021 MP floor for heifers, g/d
+        "MP_min": (53 - 25 * (An_BW / animal_requirements["An_BW_mature"])) * (An_NEL / 0.66) if is_heifer else None,
+        # BW-only part of maintenance NP, g/d: scurf (0.20 * BW^0.6 CP * 0.86 Body_NP_CP) + urinary endogenous
+        "NPm_fixed": 0.20 * An_BW**0.60 * 0.86 + 0.053 * An_BW * 6.25,
+    }
+
+
+def rsm_diet_supply_batch(Q, f_nd, animal_requirements, meact_terms=None, F_kg=None, consts=None, out=None):
+    """
+    Batched rsm_diet_supply for a whole population.
+
+    Q is a (pop, n_feeds) matrix of feed amounts in kg/d. Returns the same three
+    outputs as rsm_diet_supply, stacked per row: diet_summary_values (pop, 11),
+    intermediate_results_values (pop, 5) and An_MPm (pop,). Rows with a total DMI
+    below 1e-6 get NaN supplies, as rsm_diet_supply does. meact_terms, F_kg and
+    consts can pass a cached _meact_terms(f_nd), _supply_matrix(f_nd) and
+    _supply_constants(animal_requirements). out can pass preallocated
+    ((pop, 11), (pop, 5)) buffers that are filled in place and returned.
+    """
+    Q = np.asarray(Q, dtype=float)
+    c = consts or _supply_constants(animal_requirements)
+    An_NEL = c["An_NEL"]
+    is_heifer = c["is_heifer"]
+
+    if meact_terms is None:
+        meact_terms = _meact_terms(f_nd)
+    if F_kg is None:
+        F_kg = _supply_matrix(f_nd)
+
+    # All linear supplies in one GEMM: Y[:, j] = sum_i Q[:, i] * F_kg[i, j]
+    # (runs in F_kg's dtype, so a float32 matrix halves the traffic; results continue in float64)
+    Y = (Q.astype(F_kg.dtype, copy=False) @ F_kg).astype(float, copy=False)
+    DMI = Q.sum(axis=1)
+    TotalTDN = Y[:, _TDN] / 100
+    discount = calculate_discount_vec(TotalTDN, DMI, c["An_MBW"])
+
+    # MEact depends on the per-diet discount, so build it per row
+    MEact = calculate_MEact(f_nd, discount[:, None], terms=meact_terms)
+
+    ME_Mcal = np.einsum("ij,ij->i", Q, MEact)
+    DE_Mcal = discount * Y[:, _DE]
+    NEl_diet = ME_Mcal * 0.66
+
+    # Maintenance protein (dynamic fecal part)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        NDF_diet = np.where(DMI != 0, Y[:, _NDF] / DMI, 0.0)
+    Fe_NPend_g = ((12 + 0.12 * NDF_diet) * DMI) * 0.73
+    An_MPm = (c["NPm_fixed"] + Fe_NPend_g) / 0.65
+    Total_MP_Req = An_MPm + c["MP_other"]
+
+    Energy = DE_Mcal * 0.82 if is_heifer else NEl_diet
+    if is_heifer:
+        Total_MP_Req = np.maximum(Total_MP_Req, c["MP_min"])
+    Total_MP_Requirement = Total_MP_Req / 1000
+
+    total_CP_g_d = Y[:, _CP] * 10  # CP% / 100 * 1000
+    Util_CP = 8.76 * (ME_Mcal * 4.184) + 0.36 * total_CP_g_d
+    MP_GER = (Util_CP * 0.73 * 0.85) / 1000
+
+    Supply_ME = DE_Mcal * 0.82
+    if out is None:
+        out = (np.empty((len(Q), 11)), np.empty((len(Q), 5)))
+    diet_summary_values, intermediate_results_values = out
+    diet_summary_values[:, 0] = DMI
+    diet_summary_values[:, 1] = Energy
+    diet_summary_values[:, 2] = total_CP_g_d * 0.67 / 1000
+    diet_summary_values[:, 3:9] = Y[:, _MINERAL_FIBER]  # Ca, P, NDF, NDFfor, St, EE
+    diet_summary_values[:, 9] = NEl_diet
+    diet_summary_values[:, 10] = Supply_ME
+    intermediate_results_values[:, 0] = DMI
+    intermediate_results_values[:, 1] = NEl_diet - An_NEL
+    intermediate_results_values[:, 2] = Total_MP_Requirement
+    intermediate_results_values[:, 3] = MP_GER - Total_MP_Requirement
+    intermediate_results_values[:, 4] = Supply_ME - c["An_ME"]
+
+    bad = DMI < 1e-6
+    if np.any(bad):
+        diet_summary_values[bad] = np.nan
+        intermediate_results_values[bad] = np.nan
+        An_MPm = np.where(bad, 0.0, An_MPm)
+
+    return diet_summary_values, intermediate_results_values, An_MPm
+
+
+def rsm_diet_supply(x, f_nd, animal_requirements, F_kg=None, consts=None):
     """
     Calculate the diet supply based on the input vector x and feed data.
     
@@ -330,88 +505,71 @@ def rsm_diet_supply(x, f_nd, animal_requirements):
         diet_summary_values : array - Supply values for optimization
         intermediate_results_values : array - Balance calculations
         An_MPm : float - Maintenance protein requirement
+
+    F_kg and consts can pass a cached _supply_matrix(f_nd) and
+    _supply_constants(animal_requirements) for repeated calls.
     """
     try:
-        # Extract required values from animal requirements
-        Trg_Dt_DMIn = animal_requirements["Trg_Dt_DMIn"]
-        An_MBW = animal_requirements["An_MBW"]
-        An_BW = animal_requirements["An_BW"]
-        Body_NP_CP = 0.86  
-        An_MPg = animal_requirements["An_MPg"]
-        An_MPp = animal_requirements["An_MPp"]
-        An_MPl = animal_requirements["An_MPl"]
-        An_ME = animal_requirements["An_ME"]
-        An_NEL = animal_requirements["An_NEL"]
-        An_StatePhys = animal_requirements["An_StatePhys"]
-        An_BW_mature = animal_requirements["An_BW_mature"]
+        # Animal-level constants (folded once per animal when consts is cached)
+        c = consts or _supply_constants(animal_requirements)
+        An_ME = c["An_ME"]
+        An_NEL = c["An_NEL"]
         
+        x = np.asarray(x, dtype=float)
         if len(x) != len(f_nd["Fd_Name"]):
            raise ValueError(f"Input vector length {len(x)} doesn't match feed count {len(f_nd['Fd_Name'])}")
         if np.any(x < 0):
                 raise ValueError("Negative feed amounts not allowed")
 
-        # Work on a local copy so we don't mutate the original structure during optimization
-        local_f = {k: v.copy() for k, v in f_nd.items()}
-
-        DMI = sum(x) # sum of ingredient amounts in kg/d
+        DMI = float(x.sum()) # sum of ingredient amounts in kg/d
         if DMI < 1e-6:
             raise ValueError("Total DMI is too small or zero")
 
-        # Calculate nutitional discount at a diet level
-        TotalTDN = safe_sum(x * (local_f["Fd_TDN"]/100))  # kg of TDN
-        discount = calculate_discount(TotalTDN, DMI, An_MBW)
+        # All linear nutrient sums in one GEMV (f_nd is never mutated, so no local copy is needed)
+        y = x @ (_supply_matrix(f_nd) if F_kg is None else F_kg)
 
-        local_f["Fd_TDNact"] = local_f["Fd_TDN"] * discount
-        local_f["Fd_DEact"] = local_f["Fd_DE"] * discount
+        # Calculate nutitional discount at a diet level
+        TotalTDN = y[_TDN] / 100  # kg of TDN
+        discount = calculate_discount(TotalTDN, DMI, c["An_MBW"])
     
         # Energy values for Cows 
-        local_f["Fd_MEact"] = calculate_MEact(local_f)
-        NEl_diet = safe_sum(x * local_f["Fd_MEact"]) * 0.66    # Mcal/d - NEL according to NASEM 2021 for Lactating and Dry cows
+        Fd_MEact = calculate_MEact(f_nd, discount)
+        ME_Mcal = float(np.dot(x, Fd_MEact))  # Fd_MEact is NaN-free (nan_to_num + clip)
+        NEl_diet = ME_Mcal * 0.66    # Mcal/d - NEL according to NASEM 2021 for Lactating and Dry cows
+        DE_Mcal = y[_DE] * discount
 
         # Maintenance protein dynamic equation
 
-        NDF_diet = safe_divide(safe_sum((f_nd["Fd_NDF"]) * x), DMI, default_value=0) # % of NDF in diet
+        NDF_diet = safe_divide(y[_NDF], DMI, default_value=0) # % of NDF in diet
 
-        # Scurf
         Km_MP_NP = 0.65 
-        Scrf_CP_g = 0.20 * An_BW**0.60 
-        Scrf_NP_g = Scrf_CP_g * Body_NP_CP
         # Fecal                                                #dynamic part of protein requirement 
         Fe_CPend_g = ((12 + 0.12 * NDF_diet) * DMI) 
         Fe_NPend_g = Fe_CPend_g * 0.73 
-        # Urinary endogenous protein
-        Ur_NPend_g  = 0.053 * An_BW
-        Ur_NPend_g = Ur_NPend_g * 6.25
 
-        # Total maintenance NP and CP use
-        An_NPm_Use = Scrf_NP_g + Ur_NPend_g + Fe_NPend_g 
-        An_CPm_Use = Scrf_CP_g + Ur_NPend_g + Fe_CPend_g  
+        # Total maintenance NP use: scurf + urinary endogenous (BW only, precomputed) + fecal
+        An_NPm_Use = c["NPm_fixed"] + Fe_NPend_g 
 
         An_MPm = An_NPm_Use / Km_MP_NP  # Maintenance MP, g/d #not with safe divide 
 
-        Total_MP_Req = An_MPm + An_MPg + An_MPp + An_MPl # g/d
+        Total_MP_Req = An_MPm + c["MP_other"] # g/d
 
-        state = An_StatePhys.strip().lower()
-        is_heifer = (state == "heifer")
+        is_heifer = c["is_heifer"]
 
         # ENERGY UNIT HANDLING:
         # - Cows: Use NEL (Net Energy Lactation) in Mcal/d
         # - Heifers: Use ME (Metabolizable Energy) converted to Mcal/d via DE * 0.82
         # Both are stored in nutritional_supply[1] and nutrient_targets[1] but represent different units
-        Energy = (safe_sum(x * local_f["Fd_DEact"]) * 0.82) if is_heifer else NEl_diet
+        Energy = (DE_Mcal * 0.82) if is_heifer else NEl_diet
 
         # Apply NASEM 2021 safety for heifers
-        if is_heifer:
-            MP_min = (53 - 25 * (An_BW / An_BW_mature)) * (An_NEL / 0.66)  # g/d
-            if Total_MP_Req < MP_min:
-                Total_MP_Req = MP_min
+        if is_heifer and Total_MP_Req < c["MP_min"]:
+            Total_MP_Req = c["MP_min"]  # g/d
 
         Total_MP_Requirement = Total_MP_Req/ 1000  # kg/d
 
-        local_f["Fd_CP_g_d"] = local_f["Fd_CP"] / 100 * x * 1000
-        local_f["Fd_ME_MJ"] = local_f["Fd_MEact"] * 4.184 * x
-        total_ME_MJ_d = safe_sum(local_f["Fd_ME_MJ"])
-        total_CP_g_d = safe_sum(local_f["Fd_CP_g_d"])
+        total_ME_MJ_d = ME_Mcal * 4.184
+        total_CP_g_d = y[_CP] * 10  # CP% / 100 * 1000
         Util_CP = 8.76 * total_ME_MJ_d + 0.36 * total_CP_g_d
         MP_GER = (Util_CP * 0.73 * 0.85) / 1000  # kg/d
         Protein_Balance = MP_GER - Total_MP_Requirement
@@ -419,14 +577,9 @@ def rsm_diet_supply(x, f_nd, animal_requirements):
         Supply_DMIn = DMI # kg/d
         Supply_Energy = Energy # Mcal/d - ME for heifers and NEL for cows
         Supply_MP = (total_CP_g_d * 0.67) / 1000 # kg/d
-        Supply_Ca = safe_sum(x * local_f["Fd_Ca_kg"])  # kg/d
-        Supply_P = safe_sum(x * local_f["Fd_P_kg"]) # kg/d
-        Supply_NDF = safe_sum(x * local_f["Fd_NDF_kg"])   # kg/d
-        Supply_NDFfor = safe_sum(x * local_f["Fd_ForNDF_kg"]) # kg/d
-        Supply_St = safe_sum(x * local_f["Fd_St_kg"]) # kg/d
-        Supply_EE = safe_sum(x * local_f["Fd_EE_kg"]) # kg/d
+        Supply_Ca, Supply_P, Supply_NDF, Supply_NDFfor, Supply_St, Supply_EE = y[_MINERAL_FIBER]  # kg/d
         Supply_NEl = NEl_diet
-        Supply_ME = safe_sum(x * local_f["Fd_DEact"]) * 0.82  # Mcal/d - ME for heifers
+        Supply_ME = DE_Mcal * 0.82  # Mcal/d - ME for heifers
         NEL_balance = Supply_NEl - An_NEL # Mcal/d
         ME_balance = Supply_ME - An_ME # kg/d # for heifers
     
@@ -439,13 +592,32 @@ def rsm_diet_supply(x, f_nd, animal_requirements):
         return (diet_summary_values, intermediate_results_values, An_MPm)
     
     except Exception as e:
-        print(f"Error in diet_supply: {e}")
+        logger.exception("Error in diet_supply: %s", e)
         # Return default values
         diet_summary_values = np.full(11, np.nan)
         intermediate_results_values = np.full(5, np.nan)
         return (diet_summary_values, intermediate_results_values, 0)
 
 
+def rsm_diet_supply_cached(x, f_nd, animal_requirements, memo=None):
+    """
+    rsm_diet_supply with a per-run memo for the post-optimization path, where the
+    selected diet is evaluated by solution selection and again by the analysis
+    after a cleaning step that is often a no-op. memo is the run's dict of results
+    keyed on the q bytes (for the same f_nd / animal_requirements); without one the
+    supply is computed directly. Returns fresh copies.
+    """
+    x = np.asarray(x, dtype=float)
+    if memo is None:
+        return rsm_diet_supply(x, f_nd, animal_requirements)
+    key = x.tobytes()
+    result = memo.get(key)
+    if result is None:
+        result = memo[key] = rsm_diet_supply(x, f_nd, animal_requirements)
+    diet_summary_values, intermediate_results_values, An_MPm = result
+    return diet_summary_values.copy(), intermediate_results_values.copy(), An_MPm
+
+
 def rsm_run_optimization(animal_requirements = None, f_nd = None, optimization_params=None, decision_mode=None, cfg=None):
     # Run ration optimization using NSGA-II algorithm.
     # Use config as single source of truth
@@ -453,7 +625,7 @@ def rsm_run_optimization(animal_requirements = None, f_nd = None, optimization_p
     # Debug: Log the cfg parameter
     print(f"🔍 DEBUG: cfg parameter received: {cfg is not None}")
     if cfg:
-        print(f"🔍 DEBUG: cfg values - generations: {cfg.get('generations')}, initial_epsilon: {cfg.get('initial_epsilon')}, n_workers: {cfg.get('n_workers')}")
+        print(f"🔍 DEBUG: cfg values - generations: {cfg.get('generations')}, initial_epsilon: {cfg.get('initial_epsilon')}")
     else:
         print("🔍 DEBUG: cfg is None - will use fallback values")
 
@@ -462,7 +634,7 @@ def rsm_run_optimization(animal_requirements = None, f_nd = None, optimization_p
         cfg = {
             "pop_size": 100, "generations": 200, "initial_epsilon": 3.00, "final_epsilon": 0.05,
             "crossover_prob": 0.9, "crossover_eta": 5, "mutation_prob": 0.3, "mutation_eta": 5,
-            "seed": 42, "verbose": True, "n_workers": 7, "dmi_lo": 0.90, "dmi_hi": 1.05,
+            "seed": 42, "verbose": True, "dmi_lo": 0.90, "dmi_hi": 1.05,
             "energy_offset": 1.0, "mp_offset": 0.10, "decision_mode": "proportion"
         }
             
@@ -482,8 +654,7 @@ def rsm_run_optimization(animal_requirements = None, f_nd = None, optimization_p
         "mutation_prob": cfg.get("mutation_prob", 0.3),
         "mutation_eta": cfg.get("mutation_eta", 5),
         "seed": cfg.get("seed", 42),
-        "verbose": cfg.get("verbose", True),
-        "n_workers": cfg.get("n_workers", 1)
+        "verbose": cfg.get("verbose", True)
     }
     
     # Legacy support: optimization_params can still override config
@@ -515,7 +686,7 @@ def rsm_run_optimization(animal_requirements = None, f_nd = None, optimization_p
     if decision_mode == "proportion":
         # Calculate bounds with automatic constraint enforcement
         xl, xu = rsm_bounds_xlxu(f_nd, animal_requirements, dmi_lo=dmi_lo, dmi_hi=dmi_hi)
-        sampling_op = SimplexPlusDmiSampling(xl, xu)
+        sampling_op = SimplexPlusDmiSampling(xl, xu, seed=params["seed"])
         repair_op   = SimplexPlusDmiRepair(xl, xu)
     else:
         # Legacy kg mode - create simple bounds (0 to DMI for each ingredient)
@@ -540,7 +711,6 @@ def rsm_run_optimization(animal_requirements = None, f_nd = None, optimization_p
         max_generations=params["generations"],
         xl=xl,
         xu=xu,
-        n_workers=params["n_workers"],  # Add ThreadPool workers
         diet_supply=rsm_diet_supply,
         decision_mode=decision_mode,
         energy_offset=cfg.get("energy_offset", 1.0),
@@ -557,7 +727,7 @@ def rsm_run_optimization(animal_requirements = None, f_nd = None, optimization_p
         sampling=sampling_op, 
         crossover=SimulatedBinaryCrossover(prob=params["crossover_prob"], eta=params["crossover_eta"]),  
         mutation=PolynomialMutation(prob=params["mutation_prob"], eta=params["mutation_eta"]),
-        eliminate_duplicates=True,
+        eliminate_duplicates=RoundedHashDuplicateElimination(cfg.get("duplicate_decimals", 4)),
         repair=repair_op,
         save_history=True
     )
@@ -565,10 +735,19 @@ def rsm_run_optimization(animal_requirements = None, f_nd = None, optimization_p
     callback = EpsilonUpdateCallback(problem)
     start_time = time.time()
     stop_criteria = get_termination("n_gen", params["generations"])
+    if cfg.get("early_convergence_check", False):
+        # Also stop once the feasible front has stagnated for early_gen_limit generations
+        stop_criteria = TerminationCollection(
+            stop_criteria,
+            RobustTermination(
+                MultiObjectiveSpaceTermination(tol=cfg.get("early_ftol", 0.005), only_feas=True),
+                period=cfg.get("early_gen_limit", 30),
+            ),
+        )
 
     print(f"[run_opt] mode={decision_mode}  n_var={len(xl)}  pop={params['pop_size']}  gen={params['generations']}")
     
-    # Optimize with ThreadPool multiprocessing 
+    # Optimize (population is evaluated in a single vectorized pass per generation)
     try:
         res = minimize(
             problem,
@@ -578,9 +757,16 @@ def rsm_run_optimization(animal_requirements = None, f_nd = None, optimization_p
             verbose=params["verbose"],
             callback=callback,
             save_history=True
-            # Note: No 'workers' parameter - ThreadPool is handled inside the problem class
         )
         
+        if cfg.get("early_convergence_check", False) and res.algorithm.n_gen < params["generations"] and res.X is not None:
+            print(f"Early convergence at generation {res.algorithm.n_gen}/{params['generations']}")
+            # Re-score the final front at the end-of-schedule epsilon so flags match a full run
+            problem.advance_generation(problem.max_generations - 1)
+            out = problem.evaluate(np.atleast_2d(res.X), return_as_dictionary=True)
+            res.F, res.G = out["F"], out["G"]
+            res.CV = np.maximum(res.G, 0.0).sum(axis=1, keepdims=True)
+
         end_time = time.time()
         
         # Results
@@ -595,6 +781,8 @@ def rsm_run_optimization(animal_requirements = None, f_nd = None, optimization_p
     except Exception as e:
         print(f"Optimization failed: {e}")
         return None
+    finally:
+        problem.close_pool()
 
 
 def rsm_detect_present_categories(f_nd):
@@ -646,7 +834,7 @@ def rsm_detect_present_categories(f_nd):
 class DietOptimizationProblem(Problem):
     def __init__(self, f_nd, animal_requirements, thr, An_NDF_req, An_NDFfor_req, An_St_req, An_EE_req,
                  initial_epsilon=0.3, final_epsilon=0.01, max_generations=1000, xl=None, xu=None, 
-                 n_workers=None, diet_supply=None, decision_mode="kg", energy_offset=1.0, mp_offset=0.10,
+                 diet_supply=None, decision_mode="kg", energy_offset=1.0, mp_offset=0.10,
                  dmi_lo=0.90, dmi_hi=1.05, cfg=None):
     
         self.initial_epsilon = initial_epsilon
@@ -655,7 +843,6 @@ class DietOptimizationProblem(Problem):
         self.current_gen = 0
         self.thr = thr  # Store constraint thresholds
         self.diet_supply = diet_supply  # Store diet_supply function
-        self.n_workers = n_workers  # ThreadPool workers
         self.decision_mode = decision_mode
         
         # Store energy and protein offsets from config
@@ -672,6 +859,9 @@ class DietOptimizationProblem(Problem):
         self.epsilon_history = []             
         self.last_satisfaction_flags = []       
         self.last_constraint_maps = []         
+        self.last_g_normalized = None           # (pop, max_constraints) normalized G of the last evaluation
+        self.last_violation_masks = None        # (pop, max_constraints) bool, G > 0
+        self.last_constraint_names = ()
         self.final_epsilon = float(getattr(self, "final_epsilon", 0.01))
         
         self.animal_requirements = animal_requirements
@@ -682,15 +872,36 @@ class DietOptimizationProblem(Problem):
         self.An_Ca_req = animal_requirements["An_Ca_req"]
         self.An_P_req = animal_requirements["An_P_req"]
         self.An_StatePhys = animal_requirements["An_StatePhys"]
+        self._is_heifer = "heifer" in self.An_StatePhys.strip().lower()
         
         # Store nutrient requirements
         self.An_NDF_req = An_NDF_req
         self.An_NDFfor_req = An_NDFfor_req
         self.An_St_req = An_St_req
         self.An_EE_req = An_EE_req
+
+        # Per-run targets: ME (heifers) or NEL (cows), and the base target vector of the
+        # constraint builder (only the MP slot depends on the diet and is filled per evaluation)
+        self._energy_target = self.An_ME if self._is_heifer else self.An_NEL
+        self._nutrient_targets_base = np.array([
+            self.Trg_Dt_DMIn,                # DMI
+            self._energy_target,             # Energy (base target - offset added in the constraint builder)
+            0.0,                             # MP (per-diet requirement)
+            self.An_Ca_req,                  # Ca
+            self.An_P_req,                   # P
+            self.An_NDF_req,                 # NDF max
+            self.An_NDFfor_req,              # NDF forage min
+            self.An_St_req,                  # Starch max
+            self.An_EE_req                   # EE max
+        ], dtype=float)
+        # Linear epsilon decay per generation (constant for the run)
+        self._epsilon_slope = (self.initial_epsilon - self.final_epsilon) / max(self.max_generations - 1, 1)
+        self._epsilon = self._current_epsilon()
     
         # Detect present categories for conditional constraints
         self.categories = rsm_detect_present_categories(f_nd)
+        # Category membership of the fixed feed library: category amounts become one product
+        self._category_matrix = category_matrix(self.categories, f_nd)
 
         # Exact constraint count = 12 core + conditionals + user-first
         base_constraints = 12  # DMI(2), Energy(2), MP(2), Ca(1), P(1), NDF(1), NDFfor(1), Starch(1), EE(1)
@@ -716,6 +927,41 @@ class DietOptimizationProblem(Problem):
 
         # Store feed data
         self.f_nd = f_nd
+        # Fd_DE / Fd_EE / Fd_isFat / Fd_isMi are fixed for the run: cache the MEact pieces once
+        self._meact_terms = _meact_terms(f_nd)
+        # Stacked nutrient columns so the population supplies are a single matrix product
+        # cfg["supply_dtype"] = "float32" stores it in single precision (nutrient data has ~3 significant digits)
+        supply_dtype = np.dtype((cfg or {}).get("supply_dtype", "float64"))
+        self.F_kg = np.ascontiguousarray(_supply_matrix(f_nd), dtype=supply_dtype)
+        # Animal-derived constants (heifer flag, MP floor, non-maintenance MP) are fixed too
+        self._supply_consts = _supply_constants(animal_requirements)
+        # Cost objective: feed prices and the normalizing diet cost are fixed for the run
+        # (prices follow supply_dtype as well; the scale stays a float64 scalar)
+        cost_dm = np.asarray(f_nd["Fd_CostDM"], dtype=np.float64)
+        self._cost_vec = cost_dm.astype(supply_dtype)
+        self._cost_scale = max(float(cost_dm.mean()) * self.Trg_Dt_DMIn, 1e-3)
+        self._diet_buf = None
+        self._inter_buf = None
+        # Evaluation backend: "vector" evaluates the whole population in-process; "process" splits
+        # populations of at least parallel_min_rows diets across n_workers processes (only pays off
+        # for very large populations or feed libraries)
+        cfg_ = cfg or {}
+        self.parallel_backend = cfg_.get("parallel_backend", "vector")
+        self.n_workers = cfg_.get("n_workers", os.cpu_count() or 1)
+        self.parallel_min_rows = cfg_.get("parallel_min_rows", 2000)
+        self._pool = None
+        # The constraint list only depends on (thr, categories, cfg): build it once from a
+        # representative all-zero diet and reuse the names for every evaluation
+        _, _, names = build_conditional_constraints_batch(
+            np.zeros((1, len(f_nd["Fd_Name"]))), np.zeros((1, 9)), np.zeros((1, 9)), 0.0,
+            f_nd, self.Trg_Dt_DMIn, thr, self.categories,
+            energy_offset=energy_offset, mp_offset=mp_offset, apply_offset_on_max=True,
+            dmi_lo=dmi_lo, dmi_hi=dmi_hi
+        )
+        self._built_constraint_names = tuple(names)
+        self._constraint_names = self._built_constraint_names[:self.max_constraints]
+        self._constraint_index = {name: j for j, name in enumerate(self._constraint_names)}
+        self._constraint_names_arr = np.asarray(self._constraint_names, dtype=object)
         
         # Print detected categories 
         category_labels = {
@@ -735,239 +981,215 @@ class DietOptimizationProblem(Problem):
     def _decode_x_to_qpt(self, x):     
         #Decode the solution vector x to q, p, t (kg/d, proportions, kg/d)
         #light simplification of decode_solution_to_q.  Necessary here for optimization (Called several times)
-        x = np.asarray(x, dtype=float)
         if self.decision_mode == "proportion":
-            n_ing = self.n_var - 1
-            p = np.clip(x[:n_ing], 0.0, None)
-            s = p.sum()
-            if s <= 0.0:
-                p = np.full(n_ing, 1.0 / n_ing)
-            else:
-                p = p / s
-            t = float(x[-1])
-            q = p * t
-        else:
-            # legacy "kg" mode
-            q = np.clip(x, 0.0, None)
-            t = float(q.sum())
-            if t <= 0.0:
-                t = float(self.Trg_Dt_DMIn)
-                p = np.full_like(q, 1.0 / len(q))
-            else:
-                p = q / t
-
-        return q, p, t
+            q, p, t = _decode_fast(x, self.n_var - 1)
+            return q, p, float(t)
+        Q, P, t = self._decode_batch(np.atleast_2d(x))
+        return Q[0], P[0], float(t[0])
+
+    def _decode_batch(self, X):
+        # Vectorized _decode_x_to_qpt over the whole population: returns Q (pop, n), P (pop, n), t (pop,)
+        X = np.asarray(X, dtype=float)
+        if self.decision_mode == "proportion":
+            return _decode_fast(X, self.n_var - 1)
+        # legacy "kg" mode
+        Q = np.clip(X, 0.0, None)
+        t = Q.sum(axis=1)
+        zero = t <= 0.0
+        P = np.divide(Q, t[:, None], out=np.full_like(Q, 1.0 / Q.shape[1]), where=~zero[:, None])
+        t[zero] = float(self.Trg_Dt_DMIn)
+        return Q, P, t
 
     def advance_generation(self, n_gen):
         self.current_gen = n_gen
+        # epsilon is constant within a generation: compute it once here, not per evaluation
+        self._epsilon = self._current_epsilon()
     
-    def _evaluate_single(self, x):
-        try:
-            # decode x -> q,p,t (q is kg/d)
-            q, p, t = self._decode_x_to_qpt(x)
-
-            diet_summary_values, intermediate_results_values, An_MPm = rsm_diet_supply(
-                q, self.f_nd, self.animal_requirements
-            )
-            # unpack
-            DMI = diet_summary_values[0]
-            Energy = diet_summary_values[1]
-            MP = diet_summary_values[2]
-            Ca, P, NDF, NDFfor, St, EE = diet_summary_values[3:9]
-
-            # Select the appropriate energy value for optimization ME (heifers) or NEL (cows)
-            state = self.An_StatePhys.strip().lower()
-            is_heifer = "heifer" in state
-            energy_supply = Energy
-            energy_target = self.An_ME if is_heifer else self.An_NEL
-
-            An_MP_req = intermediate_results_values[2]
-            # Check if the diet summary values are not None
-            if diet_summary_values is None:
-                 raise ValueError(f"Error in diet_supply: Returned None")
-
-            # Get offsets from config (align with Pre_optimization.py)
-            energy_offset = getattr(self, 'energy_offset', 1.0)  # Default 1.0 to match Pre_optimization
-            mp_offset = getattr(self, 'mp_offset', 0.10)
-
-            # energy_target_with_margin = energy_target + energy_offset  # Same as constraint
-            # protein_target_with_margin = An_MP_req + mp_offset   # Same as constraint
-
-            # Use base targets (no margins) - build_conditional_constraints adds offsets internally
-            nutrient_targets = np.array([self.Trg_Dt_DMIn, energy_target, An_MP_req, 
-                self.An_Ca_req, self.An_P_req, self.An_NDF_req, self.An_NDFfor_req,
-                self.An_St_req, self.An_EE_req   
-            ])
-        
-            nutritional_supply = np.array([DMI, energy_supply, MP, Ca, P, NDF, NDFfor, St, EE])
+    def _supply_buffers(self, n_rows):
+        # Reusable (n_rows, 11) / (n_rows, 5) outputs for rsm_diet_supply_batch; only reallocated
+        # when the batch size changes (initial population vs. offspring vs. final re-scoring)
+        if self._diet_buf is None or self._diet_buf.shape[0] != n_rows:
+            self._diet_buf = np.empty((n_rows, 11), dtype=np.float64)
+            self._inter_buf = np.empty((n_rows, 5), dtype=np.float64)
+        return self._diet_buf, self._inter_buf
+
+    def _current_epsilon(self):
+        # Linear epsilon decay
+        if self.max_generations > 1:
+            return self.initial_epsilon - self._epsilon_slope * self.current_gen
+        return self.final_epsilon
+
+    def __getstate__(self):
+        # Worker processes get the problem without the pool or the scratch buffers
+        state = self.__dict__.copy()
+        state["_pool"] = None
+        state["_diet_buf"] = state["_inter_buf"] = None
+        return state
+
+    def _process_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.n_workers, initializer=_init_eval_worker, initargs=(self,))
+        return self._pool
+
+    def close_pool(self):
+        # Shut down the "process" backend workers, if any were started
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
 
-            # Normilize objectives
-
-            #Objective 1
-            eps = 1e-3
-            total_cost = float((q * self.f_nd["Fd_CostDM"]).sum())
-            mean_cost_dm = float(np.mean(self.f_nd["Fd_CostDM"]))
-            cost_scale = max(mean_cost_dm * self.Trg_Dt_DMIn, eps)
-            total_cost = (total_cost / cost_scale) * 0.1
+    def _evaluate(self, X, out, *args, **kwargs):
+        if self.parallel_backend == "process" and len(X) >= self.parallel_min_rows:
+            # Split the population across the worker processes; each worker holds its own copy of
+            # the problem, so only the X chunk and the generation number are sent per call
+            chunks = np.array_split(np.asarray(X, dtype=float), self.n_workers)
+            F = np.empty((len(X), 3))
+            G_n = np.empty((len(X), self.max_constraints))
+            satisfaction_flags, constraint_maps_list = [], []
+            start = 0
+            for F_c, G_c, flags_c, maps_c in self._process_pool().map(_evaluate_chunk, chunks, [self.current_gen] * len(chunks)):
+                F[start:start + len(F_c)] = F_c
+                G_n[start:start + len(G_c)] = G_c
+                satisfaction_flags.extend(flags_c)
+                constraint_maps_list.extend(maps_c)
+                start += len(F_c)
+        else:
+            F, G_n, satisfaction_flags, constraint_maps_list = self._evaluate_rows(X)
 
-            #Objective 2
-            total_intake_dev = abs(self.Trg_Dt_DMIn - DMI) / max(self.Trg_Dt_DMIn, eps)
+        # Output
+        out["F"] = F  # Objective values
+        out["G"] = G_n
 
-            #Objective 3
-            #dev_dmi = abs(DMI - self.Trg_Dt_DMIn) / max(self.Trg_Dt_DMIn, eps)
-            dev_energy = abs(energy_supply - energy_target) / max(energy_target, eps)  
-            dev_mp = abs(MP - An_MP_req) / max(An_MP_req, eps)
-            total_dev = dev_energy + dev_mp       
-            
-            # Restrictions (G <= 0) - Using conditional constraints
-            current_gen = self.current_gen
-            # Linear epsilon decay
-            if self.max_generations > 1:
-                epsilon = self.initial_epsilon - (self.initial_epsilon - self.final_epsilon) * (current_gen / (self.max_generations - 1))
-            else:
-                epsilon = self.final_epsilon
-            
-            nutrient_targets = np.array([
-                self.Trg_Dt_DMIn,                # DMI
-                energy_target,                   # Energy (base target - offset added in build_conditional_constraints)
-                An_MP_req,                       # MP (base target - offset added in build_conditional_constraints)
-                self.An_Ca_req,                  # Ca
-                self.An_P_req,                   # P
-                self.An_NDF_req,                 # NDF max
-                self.An_NDFfor_req,              # NDF forage min
-                self.An_St_req,                  # Starch max
-                self.An_EE_req                   # EE max
-            ], dtype=float)
-
-            nutritional_supply = np.array([DMI, Energy, MP, Ca, P, NDF, NDFfor, St, EE], dtype=float)
-
-            # Build conditional constraints (no classification here)
-            G, scales, constraint_names = build_conditional_constraints(
-                q, nutritional_supply, nutrient_targets, epsilon, 
-                self.f_nd, self.Trg_Dt_DMIn, self.thr, self.categories, self.animal_requirements, 
-                energy_offset=energy_offset, mp_offset=mp_offset, apply_offset_on_max=True,
-                dmi_lo=self.dmi_lo, dmi_hi=self.dmi_hi, cfg=self.cfg
-            )
-
-            violated_constraints = {}
-            for i, g_val in enumerate(G):
-                if g_val > 0: # A constraint is violated if its value is > 0
-                    # Store the name and how much it was violated by (after normalization)
-                    violated_constraints[constraint_names[i]] = g_val / scales[i]
-            
-            # Normalize the restrictions
-            scales = np.maximum(np.abs(np.array(scales, dtype=float)), 1e-3)
-            G_n = np.array(G, dtype=float) / scales
-            
-            # Evaluate severities and final satisfaction flag centrally
-            constraint_map, satisfaction_flag = evaluate_constraints(
-                q,
-                nutritional_supply,
-                nutrient_targets,
-                epsilon,
-                self.f_nd,
-                self.Trg_Dt_DMIn,
-                self.thr,
-                self.categories,
-                self.animal_requirements,
-                energy_offset=energy_offset,
-                mp_offset=mp_offset,
-                dmi_lo=self.dmi_lo,
-                dmi_hi=self.dmi_hi,
-                cfg=self.cfg,
-                constraint_names=constraint_names,
-            )
-
-            # Pad constraints to match maximum constraint count for pymoo
-            if len(G_n) < self.max_constraints:
-                G_n = np.pad(G_n, (0, self.max_constraints - len(G_n)))
-            elif len(G_n) > self.max_constraints:
-                G_n = G_n[:self.max_constraints]
-
-            return total_cost, total_intake_dev, total_dev,  G_n, satisfaction_flag, violated_constraints, constraint_map
+        self.last_satisfaction_flags = satisfaction_flags  
+        self.last_constraint_maps = constraint_maps_list
+        # Violation bookkeeping is kept as population matrices; per-diet details are only
+        # built on request through violation_details()
+        self.last_g_normalized = G_n
+        self.last_violation_masks = G_n > 0
+        self.last_constraint_names = self._constraint_names
+
+    def violation_details(self, i):
+        """Violated constraints of diet i in the last evaluated population, as {name: normalized G}."""
+        if self.last_violation_masks is None:
+            return {}
+        k = len(self._constraint_names_arr)
+        mask = self.last_violation_masks[i, :k]
+        if not mask.any():
+            return {}
+        return dict(zip(self._constraint_names_arr[mask].tolist(), self.last_g_normalized[i, :k][mask].tolist()))
+
+    def _evaluate_rows(self, X):
+        # Evaluate the population: supplies, objectives, constraint values and severities are all
+        # array operations over axis 0.
+        Q, P, t = self._decode_batch(X)
+        diet_summary, intermediates, _ = rsm_diet_supply_batch(
+            Q, self.f_nd, self.animal_requirements, meact_terms=self._meact_terms, F_kg=self.F_kg,
+            consts=self._supply_consts, out=self._supply_buffers(len(Q))
+        )
 
+        # Supplies in constraint order (DMI, Energy, MP, Ca, P, NDF, NDFfor, St, EE), shared by the
+        # objectives and the constraints. Column 1 is already the heifer-switched energy
+        # (ME for heifers, NEL for cows), matching _energy_target.
+        nutritional_supply = diet_summary[:, :9]
+        DMI, energy_supply, MP = nutritional_supply[:, 0], nutritional_supply[:, 1], nutritional_supply[:, 2]
+        An_MP_req = intermediates[:, 2]
+        energy_target = self._energy_target
+
+        # Objectives are written straight into the (pop, 3) output matrix; the names are column views
+        F = np.empty((len(Q), 3))
+        cost, total_intake_dev, total_deviation = F[:, 0], F[:, 1], F[:, 2]
+
+        # Normilize objectives
+        eps = 1e-3
+        #Objective 1
+        cost[:] = (Q.astype(self._cost_vec.dtype, copy=False) @ self._cost_vec / self._cost_scale) * 0.1
+        #Objective 2
+        total_intake_dev[:] = np.abs(self.Trg_Dt_DMIn - DMI) / max(self.Trg_Dt_DMIn, eps)
+        #Objective 3
+        dev_energy = np.abs(energy_supply - energy_target) / max(energy_target, eps)
+        dev_mp = np.abs(MP - An_MP_req) / np.maximum(An_MP_req, eps)
+        np.add(dev_energy, dev_mp, out=total_deviation)
+
+        epsilon = self._epsilon
+
+        # Use base targets (no margins) - the constraint builder adds offsets internally
+        nutrient_targets = np.empty((len(Q), 9))
+        nutrient_targets[:] = self._nutrient_targets_base
+        nutrient_targets[:, 2] = An_MP_req
+
+        # One fused constraint pass: G / scales for every diet, severities and satisfaction flags
+        # for the diets with a finite supply
+        finite = np.isfinite(diet_summary).all(axis=1)
+        ok = np.flatnonzero(finite)
+        failed = ~finite
+        satisfaction_flags = constraint_maps_list = None
+        G_n = np.empty((len(Q), self.max_constraints))
+        try:
+            with np.errstate(invalid="ignore"):
+                G, scales, _, maps_ok, flags_ok = build_and_evaluate_constraints_batch(
+                    Q, nutritional_supply, nutrient_targets, epsilon,
+                    self.f_nd, self.Trg_Dt_DMIn, self.thr, self.categories, self.animal_requirements,
+                    energy_offset=self.energy_offset, mp_offset=self.mp_offset, apply_offset_on_max=True,
+                    dmi_lo=self.dmi_lo, dmi_hi=self.dmi_hi, cfg=self.cfg, rows=ok,
+                    category_matrix=self._category_matrix, constraint_names=self._built_constraint_names
+                )
+                # Normalize the restrictions straight into the (pop, max_constraints) matrix; the
+                # columns past the built constraints are the zero padding pymoo expects
+                n_con = min(G.shape[1], self.max_constraints)
+                np.divide(G[:, :n_con], np.maximum(np.abs(scales[:, :n_con]), 1e-3), out=G_n[:, :n_con])
+            if n_con < self.max_constraints:
+                G_n[:, n_con:] = 0.0
+            if len(ok) == len(X):
+                # Common case: every diet evaluated, the batch results are the outputs as-is
+                satisfaction_flags, constraint_maps_list = flags_ok, maps_ok
         except Exception as e:
-            # LOG the actual error for debugging
-            logging.error(f"Solution evaluation failed for x={x}: {e}")
-            # MARK as invalid rather than fake data
-            return None  # Or raise EvaluationFailedException
-    
-    def _evaluate(self, X, out, *args, **kwargs):
-        # Evaluate population using safe ThreadPoolExecutor.
-        cost = []
-        total_intake_dev = []
-        total_deviation = []
-        restr = []
-        satisfaction_flags = []
-        violation_details_list = []
-        constraint_maps_list = []
-        
-        failed_evaluations = 0
-        
-        # Use ThreadPoolExecutor for safe parallel evaluation
-        with ThreadPoolExecutor(max_workers=self.n_workers) as executor:
-            # Submit all evaluations
-            future_to_index = {executor.submit(self._evaluate_single, x): i for i, x in enumerate(X)}
-            
-            # Collect results in order
-            results = [None] * len(X)
-            for future in as_completed(future_to_index):
-                index = future_to_index[future]
-                try:
-                    results[index] = future.result()
-                except Exception as e:
-                    print(f"\n❌ Evaluation failed for solution {index}: {e}")
-                    # Keep the same arity as _evaluate_single success path:
-                    # (total_cost, total_intake_dev, total_dev, G_n, satisfaction_flag, violated_constraints, constraint_map)
-                    results[index] = (
-                        1e9,                      # total_cost
-                        1e9,                      # total_intake_dev
-                        1e9,                      # total_dev
-                        np.full(self.max_constraints, 1e9),  # G_n
-                        "INFEASIBLE",             # satisfaction_flag
-                        {},                       # violated_constraints
-                        {}                        # constraint_map
-                    )
-                    failed_evaluations += 1
-        
-        # Extract results
-        for result in results:
-            cost.append(result[0])
-            total_intake_dev.append(result[1])
-            total_deviation.append(result[2])
-            restr.append(result[3])
-            satisfaction_flags.append(result[4])
-            violation_details_list.append(result[5])
-            constraint_maps_list.append(result[6] if (result is not None and len(result) > 6) else {})
-        
+            logger.warning("Constraint evaluation failed for the population: %s", e)
+            failed[:] = True
+            ok = ok[:0]
+
+        failed_evaluations = int(np.count_nonzero(failed))
         if failed_evaluations > 0:
-            print(f"{failed_evaluations}/{len(X)} evaluations failed and received penalty values")
+            # Penalty values for a failed evaluation, broadcast in place (no per-row penalty arrays)
+            F[failed] = _EVAL_PENALTY
+            G_n[failed] = _EVAL_PENALTY
+            satisfaction_flags = ["INFEASIBLE"] * len(X)
+            constraint_maps_list = [None] * len(X)
+            for j, i in enumerate(ok):
+                satisfaction_flags[i] = flags_ok[j]
+                constraint_maps_list[i] = maps_ok[j]
+            for i in np.flatnonzero(failed):
+                constraint_maps_list[i] = {}
+            logger.warning("%d/%d evaluations failed and received penalty values", failed_evaluations, len(X))
 
-        # Output
-        out["F"] = np.column_stack([cost, total_intake_dev, total_deviation])  # Objective values
-        out["G"] = np.array(restr)
+        return F, G_n, satisfaction_flags, constraint_maps_list
 
-        self.last_satisfaction_flags = satisfaction_flags  
-        self.last_constraint_maps = constraint_maps_list
+
+# Problem instance of a "process" backend worker, set once by the pool initializer
+_WORKER_PROBLEM = None
+
+
+def _init_eval_worker(problem):
+    global _WORKER_PROBLEM
+    _WORKER_PROBLEM = problem
+
+
+def _evaluate_chunk(X, n_gen):
+    _WORKER_PROBLEM.advance_generation(n_gen)
+    return _WORKER_PROBLEM._evaluate_rows(X)
 
 
 class EpsilonUpdateCallback:
     def __init__(self, problem):
         self.problem = problem  # Store a reference to the optimization problem
+        problem.epsilon_history = []
 
     def __call__(self, algorithm):
         """ This makes the class callable, updating the generation count dynamically """
-        self.problem.advance_generation(algorithm.n_gen)
-        if self.problem.max_generations > 1:
-            eps = self.problem.initial_epsilon - \
-                  (self.problem.initial_epsilon - self.problem.final_epsilon) * \
-                  (self.problem.current_gen / (self.problem.max_generations - 1))
-        else:
-            eps = self.problem.final_epsilon
+        problem = self.problem
+        problem.advance_generation(algorithm.n_gen)
+        # advance_generation already applied the linear decay for this generation
+        eps = problem._epsilon
         # Save
-        if not hasattr(self.problem, "epsilon_history") or self.problem.epsilon_history is None:
-            self.problem.epsilon_history = []
-        self.problem.epsilon_history.append(eps)
-        self.problem.current_epsilon = eps
+        problem.epsilon_history.append(eps)
+        problem.current_epsilon = eps
 
 
@@ -12,6 +12,7 @@ This module contains post-optimization analysis and validation:
 import numpy as np
 import pandas as pd
 from dataclasses import dataclass
+from functools import lru_cache
 
 # Import from config
 from .config import Constraints, CONSTRAINT_TOLERANCE_RANGES
@@ -22,14 +23,14 @@ from .utilities import _msg
 # Import from optimization_core
 from .optimization_core import (
     rsm_decode_solution_to_q,
-    rsm_diet_supply,
+    rsm_diet_supply_cached,
     rsm_detect_present_categories
 )
 
 # Import from constraints
 from .constraints import (
     extract_constraint_deviations,
-    pick_band_and_distance,
+    pick_bands_batch,
     ca_constraint_name,
     _counts_as_marginal,
     _counts_as_infeasible,
@@ -64,9 +65,7 @@ def rsm_clean_solution(best_q, f_nd,
     if best_q is None:
         return None, f_nd, messages, []
 
-    f_df = pd.DataFrame(f_nd)
     q = np.asarray(best_q, dtype=float).copy()
-    cleaning_log = []
 
     # Basic shape guard
     n = len(q)
@@ -78,35 +77,52 @@ def rsm_clean_solution(best_q, f_nd,
         n = min(n, len(f_nd.get("Fd_Name", [])))
         q = q[:n]
 
-    for i, amt in enumerate(q):
-        nm = str(f_df.iloc[i].get('Fd_Name', f'idx-{i}'))
-        t  = str(f_df.iloc[i].get('Fd_Type', ''))
-        c  = str(f_df.iloc[i].get('Fd_Category', ''))
-        if np.isnan(amt) or amt < 0:
-            messages.append(_msg("WARN","RFT-INP-002","clean_solution",
-                                 f"Invalid amount for {nm} set to 0.",
-                                 detail=f"amt={amt}"))
-            amt = 0.0
-            q[i] = 0.0
-
-        # Determine threshold and label based on feed type/category
-        if (t in ['Minerals','Additive'] or c in ['Minerals','Additive']
-              or 'urea' in nm.lower() or 'premix' in nm.lower()):
-            th = mineral_add_th; label = "Mineral/Additive"
-        else:
-            th = forage_conc_th; label = "Forage/Concentrate"
-
-        if amt < th:
-            cleaning_log.append(f"{nm} ({label}) {amt:.3f} → 0.000")
-            q[i] = 0.0
+    # Feed columns as string arrays (str() of each entry, as the row-wise version used)
+    def _col(key, default):
+        col = f_nd.get(key)
+        if col is None:
+            return np.array([default(i) for i in range(n)], dtype=str)
+        return np.array([str(v) for v in col[:n]], dtype=str)
+    names = _col('Fd_Name', lambda i: f'idx-{i}')
+    types = _col('Fd_Type', lambda i: '')
+    cats = _col('Fd_Category', lambda i: '')
+
+    invalid = np.isnan(q) | (q < 0)
+    for i in np.flatnonzero(invalid):
+        messages.append(_msg("WARN","RFT-INP-002","clean_solution",
+                             f"Invalid amount for {names[i]} set to 0.",
+                             detail=f"amt={q[i]}"))
+    q[invalid] = 0.0
+
+    # Determine threshold and label based on feed type/category
+    names_l = np.char.lower(names)
+    is_mineral = (np.isin(types, ['Minerals','Additive']) | np.isin(cats, ['Minerals','Additive'])
+                  | (np.char.find(names_l, 'urea') >= 0) | (np.char.find(names_l, 'premix') >= 0))
+    below = q < np.where(is_mineral, mineral_add_th, forage_conc_th)
+    cleaning_log = [
+        f"{names[i]} ({'Mineral/Additive' if is_mineral[i] else 'Forage/Concentrate'}) {q[i]:.3f} → 0.000"
+        for i in np.flatnonzero(below)
+    ]
+    q[below] = 0.0
 
     return q, f_nd, messages, cleaning_log
 
+def _present_categories(res, f_nd):
+    # The optimization problem already detected the categories of this feed library; reuse them
+    problem = getattr(res, "problem", None)
+    if getattr(problem, "f_nd", None) is f_nd and getattr(problem, "categories", None) is not None:
+        return problem.categories
+    return rsm_detect_present_categories(f_nd)
+
 def rsm_run_post_optimization_analysis(res, f_nd, animal_requirements):
     messages = []
+    categories = _present_categories(res, f_nd)
+    # Diet supplies of this run, shared by the selection and the analysis below (keyed on the q bytes)
+    supply_memo = {}
 
     # 1) Selection 
-    best_q, best_metrics_result, status = rsm_solution_selection(res, f_nd, animal_requirements, use_cv_ranking=True)
+    best_q, best_metrics_result, status = rsm_solution_selection(res, f_nd, animal_requirements, use_cv_ranking=True,
+                                                                 supply_memo=supply_memo)
 
     if best_q is None or status == "INFEASIBLE":
         # Run full constraint analysis to provide detailed guidance for infeasible solutions
@@ -163,7 +179,7 @@ def rsm_run_post_optimization_analysis(res, f_nd, animal_requirements):
                 f_nd=f_nd,
                 best_q=None,
                 debug=False, 
-                categories=None,  # Let user_warnings compute lazily
+                categories=categories,
                 reason=reason   
             )
             
@@ -184,12 +200,12 @@ def rsm_run_post_optimization_analysis(res, f_nd, animal_requirements):
             analysis_q = rsm_decode_solution_to_q(analysis_solution, decision_mode, trg_dmi)[0]
             
             # Calculate what the analysis solution would provide
-            diet_summary_values, intermediate_results_values, _ = rsm_diet_supply(analysis_q, f_nd, animal_requirements)
+            diet_summary_values, intermediate_results_values, _ = rsm_diet_supply_cached(analysis_q, f_nd, animal_requirements, supply_memo)
             
             # Run full constraint violation analysis to get integrated guidance
             violation_report = user_warnings(
                 diet_summary_values, intermediate_results_values, animal_requirements, f_nd, 
-                analysis_q, debug=False, categories=None  # Let user_warnings compute lazily
+                analysis_q, debug=False, categories=categories
             )
             
             # Policy engine in user_warnings now handles all messaging
@@ -206,7 +222,7 @@ def rsm_run_post_optimization_analysis(res, f_nd, animal_requirements):
                 f_nd=f_nd,
                 best_q=None,
                 debug=False,
-                categories=None,  # Let user_warnings compute lazily
+                categories=categories,
                 reason="ANALYSIS_FAILED"   
             )
             
@@ -249,7 +265,7 @@ def rsm_run_post_optimization_analysis(res, f_nd, animal_requirements):
 
     # 3) Recalculate nutritional values after cleaning
     try:
-        diet_summary, intermediates, An_MPm = rsm_diet_supply(best_q, f_nd, animal_requirements)
+        diet_summary, intermediates, An_MPm = rsm_diet_supply_cached(best_q, f_nd, animal_requirements, supply_memo)
     except Exception as e:
         messages.append(_msg("BLOCKER", "RFT-ANL-001", "diet_supply",
                              "Failed to recalculate the diet after cleaning.",
@@ -271,8 +287,6 @@ def rsm_run_post_optimization_analysis(res, f_nd, animal_requirements):
         best_metrics_result[metric] = 100.0 * supply / max(req, 1e-9)
 
     # 5) Constraint analysis
-    categories = rsm_detect_present_categories(f_nd)
-    
     #For manual constraint deviation input
     constraint_deviations = extract_constraint_deviations(
         diet_summary, intermediates, animal_requirements, f_nd, best_q, categories
@@ -335,155 +349,241 @@ def rsm_run_post_optimization_analysis(res, f_nd, animal_requirements):
 # WARNINGS
 # ==================================================================
 
-def _should_flip(constraint: str, ce) -> bool:
-    band = ce.status_band
-    dirn = ce.direction  # "over" | "under" | "within"
+_MARG_INF = frozenset(("marginal", "infeasible"))
+_GOOD_BANDS = frozenset(("perfect", "good"))
+
+
+def _flip_infeasible_under(band, dirn):
+    return band == "infeasible" and dirn == "under"
+
+
+def _flip_infeasible_over(band, dirn):
+    return band == "infeasible" and dirn == "over"
 
-    if constraint == "dmi":
-        return band in ("marginal", "infeasible")
 
-    if constraint in ("energy", "protein"):
-        return (band == "marginal" and dirn == "under") or (band == "infeasible")
+def _flip_energy_protein(band, dirn):
+    return (band == "marginal" and dirn == "under") or band == "infeasible"
 
-    if constraint in ("ca", "p"):
-        return band == "infeasible" and dirn == "under"
 
-    if constraint == "ndf_for":
-        return band == "infeasible" and dirn == "under"
+# Table-flip rule per constraint: (status_band, direction) -> bool
+_FLIP_RULES = {
+    "dmi": lambda band, dirn: band in _MARG_INF,
+    "energy": _flip_energy_protein,
+    "protein": _flip_energy_protein,
+    "ca": _flip_infeasible_under,
+    "p": _flip_infeasible_under,
+    "ndf_for": _flip_infeasible_under,
+    "moist_forage_min": _flip_infeasible_under,
+    **dict.fromkeys(("ndf", "starch", "fat", "conc_max", "conc_byprod_max",
+                     "other_wet_ingr_max", "forage_straw_max", "forage_fibrous_max"), _flip_infeasible_over),
+}
 
-    if constraint in ("ndf", "starch", "fat", "conc_max", "conc_byprod_max",
-                      "other_wet_ingr_max", "forage_straw_max", "forage_fibrous_max"):
-        return band == "infeasible" and dirn == "over"
 
-    if constraint == "moist_forage_min":
-        return band == "infeasible" and dirn == "under"
+def _should_flip(constraint: str, ce) -> bool:
+    rule = _FLIP_RULES.get(constraint)
+    return bool(rule and rule(ce.status_band, ce.direction))
+
+@lru_cache(maxsize=32)
+def _normalize_cow_class(state):
+    # Any lactating state maps to the "Lactating Cow" tolerance class
+    return "Lactating Cow" if "lact" in state.lower() else state
+
+
+_OVER_TMPL = "~+%.0f%% over target"
+_UNDER_TMPL = "~%.0f%% short of target"
 
-    return False
 
 def _dev_text(ce, constraint_type: str):
     # Generate human-readable deviation text like '+31% over target' or 'short by 30%'
+    # (%.0f rounds exactly like the f-string {:.0f} format it replaces)
     dev = abs(ce.raw_deviation)
     if ce.direction == "over":
-        return f"~+{dev:.0f}% over target"
+        return _OVER_TMPL % dev
     if ce.direction == "under" and constraint_type in ("min", "both"):
-        return f"~{dev:.0f}% short of target"
+        return _UNDER_TMPL % dev
     # fallback
-    sign = "+" if ce.raw_deviation >= 0 else ""
-    return f"{sign}{ce.raw_deviation:.0f}%"
+    return ("+%.0f%%" if ce.raw_deviation >= 0 else "%.0f%%") % ce.raw_deviation
 
 # Short, category-level actions keyed by constraint + direction
 
-def build_tech_note_messages(evals):
+# Presentation order of the tech-note constraints, with their type and display name resolved once
+_CONSTRAINT_ORDER = ("dmi", "energy", "protein", "ndf_for", "conc_max", "starch", "fat", "ndf",
+                     "moist_forage_min", "ca", "p", "forage_straw_max", "forage_fibrous_max",
+                     "conc_byprod_max", "other_wet_ingr_max", "urea_max")
+_CONSTRAINT_TYPES = {c: CONSTRAINT_META.get(c, {}).get("type", "both") for c in _CONSTRAINT_ORDER}
+_CONSTRAINT_DISPLAY = {c: ca_constraint_name(c, "clean_display") for c in _CONSTRAINT_ORDER}
+_MAX_CRIT = PRESENTATION.get("max_crit", 3)
+_MAX_ACTIONS = PRESENTATION.get("max_actions", 3)
+
+
+def build_tech_note_messages(evals, counted=None):
     """
     Returns a list[str] with two compact sections only:
     1) Critical violations (table-flip items)
     2) Brief action needed (constraint-aware, direction-specific guidance)
+    counted can pass the {constraint: (counts_as_marginal, counts_as_infeasible)}
+    flags already computed by user_warnings.
     """
     lines = []
-    max_crit = PRESENTATION.get("max_crit", 3)
-    max_actions = PRESENTATION.get("max_actions", 3)
-
-    # ---------- 1) Critical violations ----------
-    crit = []
-    order = ["dmi", "energy", "protein", "ndf_for", "conc_max", "starch", "fat", "ndf",
-             "moist_forage_min", "ca", "p", "forage_straw_max", "forage_fibrous_max",
-             "conc_byprod_max", "other_wet_ingr_max", "urea_max"]
-    for c in order:
+
+    # One pass over the constraints fills both sections:
+    # 1) critical violations (table-flip items), capped at _MAX_CRIT
+    # 2) actions for the constraints that count toward the decision (warn-only ones are skipped)
+    crit, actions = [], []
+    for c in _CONSTRAINT_ORDER:
         ce = evals.get(c)
         if not ce: 
             continue
-        if _should_flip(c, ce):
-            disp = ca_constraint_name(c, "clean_display")
-            ctype = CONSTRAINT_META.get(c, {}).get("type", "both")
-            crit.append(f"• {disp}: {_dev_text(ce, ctype)}")
-    crit = crit[:max_crit]
+        if len(crit) < _MAX_CRIT and _should_flip(c, ce):
+            crit.append(f"• {_CONSTRAINT_DISPLAY[c]}: {_dev_text(ce, _CONSTRAINT_TYPES[c])}")
+        if ce.status_band not in _MARG_INF:
+            continue
+        if counted is not None:
+            counts = any(counted[c])
+        else:
+            counts = _counts_as_marginal(c, ce) or _counts_as_infeasible(c, ce)
+        if counts:
+            _append_actions_for_constraint(actions, c, ce, evals)
     if crit:
         lines.append("Critical violations:")
         lines.extend(crit)
 
-    # ---------- 2) Brief action needed ----------
-    actions = []
-
-    # Add specific actions driven by the actual violated constraints
-    # Only show actions for constraints that count toward decision (filter out warn-only)
-    for c in order:
-        ce = evals.get(c)
-        if ce and ce.status_band in ("marginal", "infeasible") and (
-            _counts_as_marginal(c, ce) or _counts_as_infeasible(c, ce)
-        ):
-            _append_actions_for_constraint(actions, c, ce, evals)
-
     # De-dup → resolve → cap
-    seen, dedup = set(), []
-    for a in actions:
-        if a not in seen:
-            dedup.append(a); seen.add(a)
-    actions_clean = _resolve_action_conflicts(dedup, evals)[:max_actions]
+    dedup = list(dict.fromkeys(actions))
+    actions_clean = _resolve_action_conflicts(dedup, evals)[:_MAX_ACTIONS]
     if actions_clean:
         lines.append("Action needed:")
         lines.extend([f"• {a}" for a in actions_clean])
 
     return lines
 
+def _type1_result(primary_message, dev_context):
+    return {
+        "has_violations": True,
+        "violations": [],
+        "summary": "Critical foundation issue: Ingredient combination insufficient",
+        "recommended_status": "INFEASIBLE",
+        "formatted_messages": [
+            primary_message,
+            "Critical violation: Insufficient nutrient density in available ingredients",
+            "What to change: Add nutrient-dense forages and concentrates",
+            "Verification: Check animal inputs and ingredient selection"
+        ],
+        "console_output": f"{primary_message}\nWhat to change: Add nutrient-dense forages and concentrates",
+        "policy": {
+            "type": "TYPE_1_OPTIMIZATION_BLANK",
+            "code": "RFT-POL-001",
+            "title": "RationSmart Analysis: Critical foundation issue",
+            "summary": "Ingredient combination insufficient",
+            "user_messages": [
+                primary_message,
+                "Critical violation: Insufficient nutrient density in available ingredients",
+                "What to change: Add nutrient-dense forages and concentrates", 
+                "Verification: Check animal inputs and ingredient selection"
+            ],
+            "dev_notes": [
+                dev_context,
+                "No solution population generated or all solutions infeasible",
+                "Requires fundamental ingredient addition, not parameter adjustment"
+            ]
+        },
+        "pattern_overlays": []
+    }
+
+
+# TYPE-1 (critical failure) results, built once per reason: (primary message, dev context)
+_TYPE1_TEMPLATES = {
+    reason: _type1_result(primary_message, dev_context)
+    for reason, (primary_message, dev_context) in {
+        "NO_POPULATION": (
+            "Current ingredients cannot meet animal requirements",
+            "Complete optimization failure. No population generated"),
+        "POPULATION_ALL_INFEASIBLE": (
+            "Current ingredients cannot satisfy animal requirements",
+            "Population generated but all solutions infeasible. Ingredient combination insufficient or excessive"),
+        "ANALYSIS_FAILED": (
+            "Unable to evaluate diet constraints",
+            "Diet analysis system error during constraint evaluation"),
+    }.items()
+}
+
+@dataclass
+class UserWarningResult:
+    """
+    Result of user_warnings for an evaluated diet, returned as-is with
+    as_result=True. Slotted (no per-instance dict); to_dict() gives the plain
+    dict that user_warnings returns by default.
+    """
+    __slots__ = ("recommended_status", "block_report", "has_violations", "violation_count", "summary",
+                 "formatted_messages", "console_output", "policy", "marginal_count", "infeasible_count",
+                 "critical_infeasible")
+    recommended_status: str
+    block_report: bool          # UI to BLOCK the diet table/export
+    has_violations: bool
+    violation_count: int
+    summary: str
+    formatted_messages: list
+    console_output: str
+    policy: dict
+    marginal_count: int
+    infeasible_count: int
+    critical_infeasible: bool
+
+    def to_dict(self):
+        return {
+            "recommended_status": self.recommended_status,
+            "block_report": self.block_report,
+            "has_violations": self.has_violations,
+            "violation_count": self.violation_count,
+            "summary": self.summary,
+            "formatted_messages": self.formatted_messages,
+            "console_output": self.console_output,
+            "policy": self.policy,
+            "marginal_count": self.marginal_count,
+            "infeasible_count": self.infeasible_count,
+            "critical_infeasible": self.critical_infeasible,
+        }
+
+
+# Policy of the clean-pass (OPTIMAL) result
+_OPTIMAL_POLICY = {
+    "type": "DIRECT_CONSTRAINT_EVALUATION",
+    "title": "RationSmart Analysis — OPTIMAL",
+    "summary": "Diet meets animal requirements.",
+    "user_messages": None,
+}
+
+
+def _optimal_result():
+    formatted_messages = []
+    return UserWarningResult(
+        "OPTIMAL", False, False, 0, "Diet meets animal requirements.", formatted_messages, "",
+        dict(_OPTIMAL_POLICY, user_messages=formatted_messages), 0, 0, False
+    )
+
+
 def user_warnings(
     diet_summary_values, intermediate_results_values, animal_requirements, f_nd,
     best_q=None, debug=False, categories=None, reason=None,
     constraint_pct_devs: dict = None,
-    ranges_by_class: dict = None
+    ranges_by_class: dict = None,
+    as_result: bool = False
 ):
     # warning system that groups related constraints and provides actionable guidance
+    # (as_result=True returns evaluated diets as a UserWarningResult instead of a dict;
+    # the TYPE-1 failure passthrough is always a dict)
 
     # TYPE-1 passthrough (existing logic for critical failures)
-    if reason in {"NO_POPULATION", "POPULATION_ALL_INFEASIBLE", "ANALYSIS_FAILED"}:
-        # Determine specific message based on reason
-        if reason == "NO_POPULATION":
-            primary_message = "Current ingredients cannot meet animal requirements"
-            dev_context = "Complete optimization failure. No population generated"
-        elif reason == "POPULATION_ALL_INFEASIBLE":
-            primary_message = "Current ingredients cannot satisfy animal requirements"
-            dev_context = "Population generated but all solutions infeasible. Ingredient combination insufficient or excessive"
-        elif reason == "ANALYSIS_FAILED":
-            primary_message = "Unable to evaluate diet constraints"
-            dev_context = "Diet analysis system error during constraint evaluation"
-        else:
-            primary_message = "No viable diet solution found"
-            dev_context = "Unknown failure mode - requires investigation"
-        
-        return {
-            "has_violations": True,
-            "violations": [],
-            "summary": "Critical foundation issue: Ingredient combination insufficient",
-            "recommended_status": "INFEASIBLE",
-            "formatted_messages": [
-                primary_message,
-                "Critical violation: Insufficient nutrient density in available ingredients",
-                "What to change: Add nutrient-dense forages and concentrates",
-                "Verification: Check animal inputs and ingredient selection"
-            ],
-            "console_output": f"{primary_message}\nWhat to change: Add nutrient-dense forages and concentrates",
-            "policy": {
-                "type": "TYPE_1_OPTIMIZATION_BLANK",
-                "code": "RFT-POL-001",
-                "title": "RationSmart Analysis: Critical foundation issue",
-                "summary": "Ingredient combination insufficient",
-                "user_messages": [
-                    primary_message,
-                    "Critical violation: Insufficient nutrient density in available ingredients",
-                    "What to change: Add nutrient-dense forages and concentrates", 
-                    "Verification: Check animal inputs and ingredient selection"
-                ],
-                "dev_notes": [
-                    dev_context,
-                    "No solution population generated or all solutions infeasible",
-                    "Requires fundamental ingredient addition, not parameter adjustment"
-                ]
-            },
-            "pattern_overlays": []
-        }
+    tmpl = _TYPE1_TEMPLATES.get(reason)
+    if tmpl is not None:
+        # Copy of the prebuilt result with fresh lists, so callers can extend them safely
+        result = dict(tmpl, violations=[], formatted_messages=list(tmpl["formatted_messages"]), pattern_overlays=[])
+        result["policy"] = dict(tmpl["policy"], user_messages=list(tmpl["policy"]["user_messages"]),
+                                dev_notes=list(tmpl["policy"]["dev_notes"]))
+        return result
 
     # Solid fallback for tolerance ranges
-    cow_class = (animal_requirements.get("An_StatePhys") or "Lactating Cow")
-    cow_class = "Lactating Cow" if "lact" in cow_class.lower() else cow_class 
+    cow_class = _normalize_cow_class(animal_requirements.get("An_StatePhys") or "Lactating Cow")
     if ranges_by_class is None:
         ranges_by_class = {cow_class: CONSTRAINT_TOLERANCE_RANGES.get(cow_class, CONSTRAINT_TOLERANCE_RANGES.get("Lactating Cow", {}))}
     RANGES = ranges_by_class.get(cow_class, {})
@@ -495,72 +595,65 @@ def user_warnings(
         )
 
     # Build a canonicalized copy first
-    canon_devs = {}
-    for k, v in (constraint_pct_devs or {}).items():
-        canon_devs[ca_constraint_name(k)] = float(v)
+    canon_devs = {ca_constraint_name(k): float(v) for k, v in (constraint_pct_devs or {}).items()}
     
-    # Per-constraint evaluation using canonical names
-    evals = {}
+    # Per-constraint evaluation using canonical names: only the constraints known to both
+    # CONSTRAINT_META and this class's RANGES are evaluated (one set probe per key)
+    valid = CONSTRAINT_META.keys() & RANGES.keys()
+    names = [c for c in canon_devs if c in valid]
+    evals = dict(zip(names, pick_bands_batch(names, [canon_devs[c] for c in names], RANGES)))
+
+    # All diagnostics in one block, after the evaluation (band picking has no output)
     if debug:
         print(f"DEBUG: Available constraint deviations: {list((constraint_pct_devs or {}).keys())}")
         print(f"DEBUG: Canonicalized deviations: {list(canon_devs.keys())}")
         print(f"DEBUG: Expected constraints in CONSTRAINT_META: {list(CONSTRAINT_META.keys())}")
-    
-    for c, dev in canon_devs.items():
-        if c not in CONSTRAINT_META: 
-            if debug: 
+        for c in canon_devs:
+            if c not in CONSTRAINT_META:
                 print(f"DEBUG: skipping unknown constraint '{c}'")
-            continue
-        if c not in RANGES:
-            if debug: 
+            elif c not in RANGES:
                 print(f"DEBUG: '{c}' missing from RANGES for this class")
-            continue
-        evals[c] = pick_band_and_distance(c, dev, RANGES)
-    
-    if debug:
         print(f"DEBUG: Successfully evaluated constraints: {list(evals.keys())}")
         for c, eval_result in evals.items():
             print(f"DEBUG: {c}: {eval_result.status_band} (deviation: {eval_result.raw_deviation:.1f}%)")
 
     # ---------------- DECISION RULES ----------------
+    # Case 1: all constraints perfect/good → Feasible. Nothing counts as marginal/infeasible and
+    # there are no messages to build, so return the clean-pass result straight away.
+    # Guard against empty evals (all() returns True for empty sequences)
+    if reason is None and evals and all(ce.status_band in _GOOD_BANDS for ce in evals.values()):
+        result = _optimal_result()
+        return result if as_result else result.to_dict()
+
     # Count marginal and infeasible according to classification table.
-    marginal_count = sum(1 for c, ce in evals.items() if _counts_as_marginal(c, ce))
-    infeasible_count = sum(1 for c, ce in evals.items() if _counts_as_infeasible(c, ce))
+    # The two predicates are evaluated once per constraint and shared with the tech notes.
+    counted = {c: (_counts_as_marginal(c, ce), _counts_as_infeasible(c, ce)) for c, ce in evals.items()}
+    marginal_count = sum(1 for m, _ in counted.values() if m)
+    infeasible_count = sum(1 for _, i in counted.values() if i)
 
     # Critical override: if any of {protein, energy, dmi} is infeasible (in any direction that counts) → flip to infeasible
-    critical_infeasible = any(
-        c in CRITICAL_REQS and _counts_as_infeasible(c, ce)
-        for c, ce in evals.items()
-    )
-
-    # Case 1: all constraints perfect/good  → Feasible
-    # Guard against empty evals (all() returns True for empty sequences)
-    any_evaluated = bool(evals)
-    all_good_or_perfect = any_evaluated and all(ce.status_band in ("perfect","good") for ce in evals.values()) and (reason is None)
+    # (only the few critical constraints are visited, not every evaluated one)
+    critical_infeasible = any(counted[c][1] for c in CRITICAL_REQS if c in counted)
 
     # Decide overall
     overall = None
     block_report = False   # whether UI should block full diet report rendering
 
-    if all_good_or_perfect:
-        overall = "OPTIMAL"  
-
-    else:
-        # Your explicit count rules
-        if critical_infeasible:
+    # Your explicit count rules
+    if critical_infeasible:
+        overall = "INFEASIBLE"
+        block_report = True
+    elif infeasible_count > 2:
+        overall = "INFEASIBLE"
+        block_report = True
+    elif infeasible_count <= 2:
+        if marginal_count >= 4:
             overall = "INFEASIBLE"
             block_report = True
-        elif infeasible_count > 2:
-            overall = "INFEASIBLE"
-            block_report = True
-        elif infeasible_count <= 2:
-            if marginal_count >= 4:
-                overall = "INFEASIBLE"
-                block_report = True
-            else:
-                # Diet can be displayed with warnings
-                overall = "MARGINAL" if (marginal_count or infeasible_count) else "GOOD"
-                block_report = False
+        else:
+            # Diet can be displayed with warnings
+            overall = "MARGINAL" if (marginal_count or infeasible_count) else "GOOD"
+            block_report = False
 
     # Fallback if not set
     if overall is None:
@@ -572,19 +665,19 @@ def user_warnings(
     if overall in ("OPTIMAL", "GOOD"):
         formatted_messages = []  # clean pass
     else:
-        formatted_messages = build_tech_note_messages(evals)
-
-    result = {
-        "recommended_status": overall,
-        "block_report": block_report,   # UI to BLOCK the diet table/export
-        "has_violations": overall not in ("OPTIMAL", "GOOD"),
-        "violation_count": len([ce for ce in evals.values() if ce.status_band in ("marginal", "infeasible")]),
-        "summary": ("Diet meets animal requirements."
-                    if overall in ("OPTIMAL", "GOOD") else
-                    f"Diet has {overall.lower()} imbalances — see guidance."),
-        "formatted_messages": formatted_messages,
-        "console_output": "\n".join(formatted_messages),
-        "policy": {
+        formatted_messages = build_tech_note_messages(evals, counted)
+
+    result = UserWarningResult(
+        recommended_status=overall,
+        block_report=block_report,
+        has_violations=overall not in ("OPTIMAL", "GOOD"),
+        violation_count=len([ce for ce in evals.values() if ce.status_band in _MARG_INF]),
+        summary=("Diet meets animal requirements."
+                 if overall in ("OPTIMAL", "GOOD") else
+                 f"Diet has {overall.lower()} imbalances — see guidance."),
+        formatted_messages=formatted_messages,
+        console_output="\n".join(formatted_messages),
+        policy={
             "type": "DIRECT_CONSTRAINT_EVALUATION",
             "title": f"RationSmart Analysis — {'Action needed' if overall=='INFEASIBLE' else overall}",
             "summary": ("Diet meets animal requirements." 
@@ -592,12 +685,12 @@ def user_warnings(
                        f"Diet has {overall.lower()} imbalances requiring attention. Please review ingredient selection and adjust it as needed."),
             "user_messages": formatted_messages
         },
-        "marginal_count": marginal_count,
-        "infeasible_count": infeasible_count,
-        "critical_infeasible": critical_infeasible
-    }
+        marginal_count=marginal_count,
+        infeasible_count=infeasible_count,
+        critical_infeasible=critical_infeasible
+    )
     
-    return result
+    return result if as_result else result.to_dict()
 
 # ===================================================================
 # Report generation
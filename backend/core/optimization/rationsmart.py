@@ -2,33 +2,8 @@ import logging
 import pandas as pd
 import numpy as np
 import os
-import re
-import matplotlib.pyplot as plt
-import seaborn as sns
-from matplotlib.patches import Rectangle
 import warnings
 warnings.filterwarnings('ignore')
-import time
-import multiprocessing
-import random
-from itertools import combinations
-from pprint import pprint 
-from pathlib import Path
-from dataclasses import dataclass
-from pymoo.core.problem import Problem
-from pymoo.algorithms.moo.nsga2 import NSGA2
-from pymoo.problems import get_problem
-from pymoo.optimize import minimize
-from pymoo.core.evaluator import Evaluator
-from pymoo.visualization.scatter import Scatter
-from pymoo.termination import get_termination
-from pymoo.operators.sampling.rnd import FloatRandomSampling
-from pymoo.operators.crossover.sbx import SimulatedBinaryCrossover
-from pymoo.operators.mutation.pm import PolynomialMutation
-from pymoo.core.sampling import Sampling      
-from pymoo.core.repair import Repair        
-from pymoo.operators.sampling.rnd import FloatRandomSampling
-from concurrent.futures import ThreadPoolExecutor, as_completed
 #from tests import TestGenerator
 warnings.filterwarnings("ignore", category=UserWarning, module="openpyxl")
 
@@ -93,10 +68,12 @@ from .optimization_core import (
     _project_to_simplex,
     SimplexPlusDmiRepair,
     SimplexPlusDmiSampling,
+    RoundedHashDuplicateElimination,
     rsm_decode_solution_to_q,
     calculate_discount,
     calculate_MEact,
     rsm_diet_supply,
+    rsm_diet_supply_cached,
     rsm_run_optimization,
     rsm_detect_present_categories,
     DietOptimizationProblem,
@@ -140,7 +117,7 @@ from .diet_tables import (
 # MAIN ENTRY POINT
 # ===================================================================
 
-def rsm_main(animal_inputs, feed_data, simulation_id=None, user_id=None, report_id=None, **kwargs):
+def rsm_main(animal_inputs, feed_data, simulation_id=None, user_id=None, report_id=None, return_feed_records=False, **kwargs):
     # ===================================================================
     # 0. CONFIGURATION AND OPTIMIZATION PARAMETERS
     # ===================================================================
@@ -166,8 +143,9 @@ def rsm_main(animal_inputs, feed_data, simulation_id=None, user_id=None, report_
         "mp_offset": 0.10,      # kg above requirement
         # System parameters
         "seed": 42,
-        "n_workers": 7,
         "enable_sanity": True,
+        "parallel_backend": "vector",  # "process" splits very large populations across worker processes
+        "supply_dtype": "float64",  # "float32" runs the supply/cost products in single precision (large feed libraries)
         # Early convergence settings
         "early_convergence_check": True,
         "early_gen_limit": 30,
@@ -277,6 +255,8 @@ def rsm_main(animal_inputs, feed_data, simulation_id=None, user_id=None, report_
     # 6. GENERATE REPORT
     # ===================================================================
     print("📄 Generating HTML report...")
+    # Note that the report rounds the display frames of post_results (animal_inputs,
+    # proportions, ...) in place.
     try:
         rsm_generate_report(post_results, animal_requirements, output_file="ration_report.html")
         print("✅ Report generated: ration_report_3.html")
@@ -314,7 +294,9 @@ def rsm_main(animal_inputs, feed_data, simulation_id=None, user_id=None, report_
         "report_id": report_id,
         "animal_inputs": animal_inputs,
         "animal_requirements": animal_requirements,
-        "feed_data": feed_data.to_dict('records') if hasattr(feed_data, 'to_dict') else feed_data,
+        # The feed table is kept as passed; return_feed_records=True converts a DataFrame to
+        # a list of record dicts (only needed by callers that serialize post_results whole)
+        "feed_data": feed_data.to_dict('records') if return_feed_records and hasattr(feed_data, 'to_dict') else feed_data,
         "optimization_config": RUN_CONFIG
     })
     
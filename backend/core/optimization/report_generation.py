@@ -9,9 +9,13 @@ This module contains all HTML report generation functionality:
 - Feed selection display utilities
 """
 
+import io
 import numpy as np
 import pandas as pd
 import os
+import sys
+import tempfile
+from datetime import datetime
 from pathlib import Path
 
 # Import from animal_requirements for table creation
@@ -20,114 +24,13 @@ from .animal_requirements import rsm_create_animal_requirements_dataframe
 # Import from utilities
 from .utilities import rename_variable, replace_na_and_negatives
 
-def calculate_weighted_absorption(dt_forages, dt_concentrates):
-    #Get proportions from the Total rows in forage and concentrate tables
-    # Extract from the "Total" rows in each dataframe
-    forage_total_row = dt_forages[dt_forages['Name'] == 'Total']
-    concentrate_total_row = dt_concentrates[dt_concentrates['Name'] == 'Total']
-    
-    if not forage_total_row.empty and not concentrate_total_row.empty:
-        # Get the DMI percentages from the Total rows
-        forage_prop = forage_total_row.iloc[0]['DM_prop'] / 100.0      # 45.12% → 0.4512
-        concentrate_prop = concentrate_total_row.iloc[0]['DM_prop'] / 100.0  # 54.87% → 0.5487
-        mineral_prop = 1.0 - forage_prop - concentrate_prop        # 0.25% → 0.0025
-        
-        # Calculate weighted absorption coefficients
-        weighted_ca = (forage_prop * 0.40 + concentrate_prop * 0.60 + mineral_prop * 0.60)
-        weighted_p = (forage_prop * 0.64 + concentrate_prop * 0.70 + mineral_prop * 0.70)
-        
-        return weighted_ca, weighted_p
-    
-    return 0.50, 0.67  # Fallback defaults
-
-def rsm_generate_report(post_results, animal_requirements, output_file="final_report.html", user_name="User", simulation_id="N/A", report_id="N/A"):
-    """
-    Generate HTML report from post-optimization analysis results.
-    
-    Parameters:
-    -----------
-    post_results : dict
-        Dictionary returned from run_post_optimization_analysis()
-    animal_requirements : dict
-        Animal requirements dictionary from calculate_an_requirements()
-    output_file : str
-        Output HTML file path
-    user_name : str
-        User name for the report header
-    simulation_id : str
-        Simulation ID for the report header
-    report_id : str
-        Report ID for the report header
-    """
-    
-    # Check if analysis was successful
-    if post_results['status'] != 'SUCCESS':
-        print(f"❌ Cannot generate report: Analysis status is {post_results['status']}")
-        return
-    
-    # Extract data from post_results dictionary
-    animal_inputs = post_results['animal_inputs']
-    dt_proportions = post_results['dt_proportions']
-    dt_forages = post_results['dt_forages']
-    methane_report = post_results['methane_report']
-    ration_evaluation = post_results['ration_evaluation']
-    
-    # Create Dt_results from dt_proportions
-    dt_results = dt_proportions[['Name', 'AF_kg', 'PRICE/KG', 'Cost']].copy()
-    
-    # Create An_Requirements DataFrame from animal_requirements dictionary
-    An_Requirements = rsm_create_animal_requirements_dataframe(animal_requirements, post_results['intermediate_results_values'])
-
-    # Update water intake with calculated value
-    An_Requirements.loc[An_Requirements['Parameter'] == 'Water Intake', 'Value'] = post_results['water_intake']
-
-    # Get concentrates from dt_proportions
-    dt_concentrates = dt_proportions[
-        (dt_proportions['Ingr_Type'] == 'Concentrate') | 
-        (dt_proportions['Ingr_Type'] == 'Minerals') |
-        (dt_proportions['Ingr_Type'] == 'By-Product/Other') |
-        (dt_proportions['Ingr_Type'] == 'Plant Protein') |
-        (dt_proportions['Ingr_Type'] == 'Additive')
-    ].copy()
-    
-    # Add concentrate totals if not empty
-    if not dt_concentrates.empty:
-        concentrate_total = dt_concentrates.select_dtypes(include=[np.number]).sum()
-        concentrate_total['Ingr_Type'] = 'Concentrate'
-        concentrate_total['Name'] = 'Total'
-        dt_concentrates = pd.concat([dt_concentrates, concentrate_total.to_frame().T], ignore_index=True)
-    
-    # Calculate weighted absorption coefficients for Ca and P display conversion
-    weighted_ca, weighted_p = calculate_weighted_absorption(dt_forages, dt_concentrates)
-
-    # Get current absorbed values
-    ca_absorbed = animal_requirements.get("An_Ca_req", 0)
-    p_absorbed = animal_requirements.get("An_P_req", 0)
-
-    # Convert to crude using weighted coefficients for display
-    ca_crude = (ca_absorbed / weighted_ca)*1000
-    p_crude = (p_absorbed / weighted_p)*1000 
-
-    # Update display values in requirements table
-    An_Requirements.loc[An_Requirements['Parameter'] == 'Calcium', 'Value'] = ca_crude
-    An_Requirements.loc[An_Requirements['Parameter'] == 'Phosphorus', 'Value'] = p_crude
-
-    # Update water intake with calculated value (water fix)
-    An_Requirements.loc[An_Requirements['Parameter'] == 'Water Intake', 'Value'] = post_results['water_intake']
-
-    # Round all numeric columns
-    dfs = [animal_inputs, An_Requirements, dt_results, dt_proportions, dt_forages, dt_concentrates, methane_report, ration_evaluation]
-    for df in dfs:
-        if not df.empty:
-            num_cols = df.select_dtypes(include=[np.number]).columns
-            df[num_cols] = df[num_cols].round(2)
+# Mode of a newly created report (as open() would create it), from the process umask read once at import
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+_REPORT_FILE_MODE = 0o666 & ~_UMASK
 
-    # Add solution summary information
-    solution_summary = rsm_create_solution_summary(post_results, animal_requirements)
-
-    # Custom CSS for modern, beautiful design
-    style = """
-    <style>
+# Custom CSS for modern, beautiful design (static, shared by every report)
+_REPORT_CSS = """
       * { box-sizing: border-box; }
       
       body { 
@@ -449,26 +352,222 @@ def rsm_generate_report(post_results, animal_requirements, output_file="final_re
           padding: 8px 10px;
         }
       }
-    </style>
     """
+# Inline form embedded in the report head by default
+_REPORT_STYLE = "\n    <style>" + _REPORT_CSS + "</style>\n    "
+# Stylesheet file written next to the report when external_css=True
+_REPORT_CSS_FILE = "report_style.css"
+
+# post_results fields rsm_generate_report reads
+_REPORT_REQUIRED_FIELDS = ('animal_inputs', 'dt_proportions', 'dt_forages', 'methane_report', 'ration_evaluation',
+                           'intermediate_results_values', 'water_intake', 'total_cost')
+
+# Ingredient types reported in the concentrate table
+_CONCENTRATE_TYPES = ('Concentrate', 'Minerals', 'By-Product/Other', 'Plant Protein', 'Additive')
+
+# Absorption coefficients used to convert absorbed Ca/P to crude for display
+# (rows: Ca, P; columns: forage, concentrate, mineral)
+_ABSORPTION_COEFFS = np.array([[0.40, 0.60, 0.60],
+                               [0.64, 0.70, 0.70]])
+
+# Emoji used in the report HTML, as numeric character references so the assembled
+# document stays an ASCII string (browsers render them identically)
+_EMOJI = {
+    'cow': '&#x1F404;',
+    'chart': '&#x1F4CA;',
+    'clipboard': '&#x1F4CB;',
+    'plate': '&#x1F37D;&#xFE0F;',
+    'grain': '&#x1F33E;',
+    'corn': '&#x1F33D;',
+    'globe': '&#x1F30D;',
+}
+
+# Two-decimal display format for tables that are not pre-rounded
+_FLOAT_FMT = '{:.2f}'.format
+
+# Table sections of the report, in display order: (frame key, section header, table class,
+# placeholder when the frame is empty, float format). The headers are rendered once here.
+_REPORT_SECTIONS = tuple(
+    (key,
+     f"\n<div class='section'>\n<h2><span class='emoji'>{emoji}</span>{title}</h2>\n<div class='table-container'>\n",
+     classes,
+     None if empty_text is None else f"<p style='text-align: center; color: #666; font-style: italic;'>{empty_text}</p>",
+     float_format)
+    for key, emoji, title, classes, empty_text, float_format in (
+        ('animal_inputs', _EMOJI['cow'], 'Animal Information', 'animal-info-table', None, None),
+        ('An_Requirements', _EMOJI['clipboard'], 'Nutritional Requirements', 'requirements-table', None, _FLOAT_FMT),
+        ('dt_results', _EMOJI['plate'], 'Least Cost Diet', 'diet-table', None, None),
+        ('dt_proportions', _EMOJI['chart'], 'Nutrient Proportions (%)', 'proportions-table', None, None),
+        ('dt_forages', _EMOJI['grain'], 'Forage', 'forage-table', "No forages in this diet.", None),
+        ('dt_concentrates', _EMOJI['corn'], 'Concentrate', 'concentrate-table', "No concentrates in this diet.", _FLOAT_FMT),
+        ('methane_report', _EMOJI['globe'], 'Environmental Impact', 'environmental-table', None, None),
+    )
+)
+
+# Static document head/tail around the per-report content
+_HTML_HEAD = "\n".join((
+    "<!DOCTYPE html>",
+    "<html><head>",
+    "<meta charset='utf-8'/>",
+    "<meta name='viewport' content='width=device-width, initial-scale=1.0'>",
+    "<title>Ration Formulation Report</title>",
+))
+_HTML_TAIL = "\n".join((
+    "</div>",  # Close content
+    "</div>",  # Close container
+    "</body></html>",
+))
+
+def _total_dm_prop(df):
+    """DM proportion (fraction) of the first "Total" row of a diet table, or None if it has none."""
+    idx = np.flatnonzero(df['Name'].to_numpy() == 'Total')
+    return df['DM_prop'].iat[idx[0]] / 100.0 if idx.size else None
+
+
+def calculate_weighted_absorption(dt_forages, dt_concentrates):
+    #Get proportions from the Total rows in forage and concentrate tables
+    # Extract from the "Total" rows in each dataframe
+    forage_prop = _total_dm_prop(dt_forages)                 # 45.12% → 0.4512
+    concentrate_prop = _total_dm_prop(dt_concentrates)       # 54.87% → 0.5487
+    
+    if forage_prop is not None and concentrate_prop is not None:
+        mineral_prop = 1.0 - forage_prop - concentrate_prop        # 0.25% → 0.0025
+        
+        # Calculate weighted absorption coefficients (Ca and P in one product)
+        weighted_ca, weighted_p = _ABSORPTION_COEFFS @ np.array([forage_prop, concentrate_prop, mineral_prop])
+        
+        return float(weighted_ca), float(weighted_p)
+    
+    return 0.50, 0.67  # Fallback defaults
+
+def _write_report_stylesheet(output_file):
+    """Write the shared stylesheet next to output_file (unless already current) and return its <link> tag."""
+    css_path = Path(output_file).with_name(_REPORT_CSS_FILE)
+    if not css_path.exists() or css_path.read_text(encoding="utf-8") != _REPORT_CSS:
+        css_path.write_text(_REPORT_CSS, encoding="utf-8")
+    return f"<link rel='stylesheet' href='{_REPORT_CSS_FILE}'>"
+
+
+def _write_table_section(buf, header, df, classes, empty_html=None, float_format=None):
+    """Write one report section holding a table into buf (parts separated by newlines)."""
+    buf.write(header)
+    if empty_html is not None and df.empty:
+        buf.write(empty_html)
+    else:
+        df.to_html(buf=buf, index=False, escape=False, classes=classes, float_format=float_format)
+    buf.write("\n</div>\n</div>")
+
+
+def rsm_generate_report(post_results, animal_requirements, output_file="final_report.html", user_name="User", simulation_id="N/A", report_id="N/A", external_css=False):
+    """
+    Generate HTML report from post-optimization analysis results.
+    
+    Parameters:
+    -----------
+    post_results : dict
+        Dictionary returned from run_post_optimization_analysis()
+    animal_requirements : dict
+        Animal requirements dictionary from calculate_an_requirements()
+    output_file : str
+        Output HTML file path
+    user_name : str
+        User name for the report header
+    simulation_id : str
+        Simulation ID for the report header
+    report_id : str
+        Report ID for the report header
+    external_css : bool
+        Link a shared report_style.css next to output_file instead of inlining the
+        stylesheet (for directories of many reports). Default keeps the report self-contained.
+    """
+    
+    # Check if analysis was successful
+    if post_results['status'] != 'SUCCESS':
+        print(f"❌ Cannot generate report: Analysis status is {post_results['status']}")
+        return
+
+    # Fail fast, before any table is built, if the analysis left out a field the report needs
+    missing = [key for key in _REPORT_REQUIRED_FIELDS if key not in post_results]
+    if missing:
+        print(f"❌ Cannot generate report: missing fields {missing}")
+        return
+    
+    # Extract data from post_results dictionary
+    animal_inputs = post_results['animal_inputs']
+    dt_proportions = post_results['dt_proportions']
+    dt_forages = post_results['dt_forages']
+    methane_report = post_results['methane_report']
+    ration_evaluation = post_results['ration_evaluation']
+    
+    # Create An_Requirements DataFrame from animal_requirements dictionary
+    An_Requirements = rsm_create_animal_requirements_dataframe(animal_requirements, post_results['intermediate_results_values'])
+
+    # Get concentrates from dt_proportions
+    dt_concentrates = dt_proportions[dt_proportions['Ingr_Type'].isin(_CONCENTRATE_TYPES)].copy()
+    
+    # Add concentrate totals if not empty
+    if not dt_concentrates.empty:
+        numeric_sums = dt_concentrates.select_dtypes(include=[np.number]).sum()
+        total_row = {col: numeric_sums.get(col, np.nan) for col in dt_concentrates.columns}
+        total_row['Ingr_Type'] = 'Concentrate'
+        total_row['Name'] = 'Total'
+        # Append in place rather than concatenating a one-row frame (avoids a full copy)
+        dt_concentrates.index = pd.RangeIndex(len(dt_concentrates))
+        dt_concentrates.loc[len(dt_concentrates)] = total_row
+    
+    # Calculate weighted absorption coefficients for Ca and P display conversion
+    weighted_ca, weighted_p = calculate_weighted_absorption(dt_forages, dt_concentrates)
+
+    # Get current absorbed values
+    ca_absorbed = animal_requirements.get("An_Ca_req", 0)
+    p_absorbed = animal_requirements.get("An_P_req", 0)
+
+    # Convert to crude using weighted coefficients for display
+    ca_crude = (ca_absorbed / weighted_ca)*1000
+    p_crude = (p_absorbed / weighted_p)*1000 
+
+    # Update display values in requirements table: crude Ca/P and the calculated water intake
+    # (water fix). The parameters are unique, so each is a scalar store into one copy of the
+    # Value array, assigned back as a whole column.
+    param_rows = {parameter: i for i, parameter in enumerate(An_Requirements['Parameter'].to_numpy())}
+    values = An_Requirements['Value'].to_numpy(copy=True)
+    display_values = {'Calcium': ca_crude, 'Phosphorus': p_crude, 'Water Intake': post_results['water_intake']}
+    for parameter, value in display_values.items():
+        row = param_rows.get(parameter)
+        if row is not None:
+            values[row] = value
+    An_Requirements['Value'] = values
+
+    # Round the numeric columns of the tables shared with post_results (callers read the rounded
+    # values back); integer columns are unchanged by rounding, so only floats are touched.
+    # The report-local tables (requirements, concentrates) are formatted by to_html instead.
+    dfs = [animal_inputs, dt_proportions, dt_forages, methane_report, ration_evaluation]
+    for df in dfs:
+        if df.empty:
+            continue
+        for col, dtype in zip(df.columns, df.dtypes):
+            if dtype.kind == 'f':
+                df[col] = np.round(df[col].to_numpy(), 2)
+
+    # Create Dt_results from the rounded dt_proportions
+    dt_results = dt_proportions[['Name', 'AF_kg', 'PRICE/KG', 'Cost']].copy()
+
+    # Add solution summary information
+    solution_summary = rsm_create_solution_summary(post_results, animal_requirements)
 
     # Get current date and time for report generation
-    from datetime import datetime
     report_date = datetime.now().strftime("%B %d, %Y at %I:%M %p")
 
-    # Assemble HTML with modern structure
+    # Assemble HTML with modern structure into one buffer; the tables are rendered straight
+    # into it by to_html(buf=...) instead of as intermediate strings joined afterwards
     html_parts = [
-        "<!DOCTYPE html>",
-        "<html><head>",
-        "<meta charset='utf-8'/>",
-        "<meta name='viewport' content='width=device-width, initial-scale=1.0'>",
-        "<title>Ration Formulation Report</title>",
-        style,
+        _HTML_HEAD,
+        _write_report_stylesheet(output_file) if external_css else _REPORT_STYLE,
         "</head><body>",
         
         "<div class='container'>",
         "<div class='header'>",
-        "<h1>🐄 Ration Formulation Report</h1>",
+        f"<h1>{_EMOJI['cow']} Ration Formulation Report</h1>",
         "<div class='report-meta'>",
         f"<div class='meta-item'><strong>User</strong><span class='meta-value'>{user_name}</span></div>",
         f"<div class='meta-item'><strong>Simulation ID</strong><span class='meta-value'>{simulation_id}</span></div>",
@@ -482,7 +581,7 @@ def rsm_generate_report(post_results, animal_requirements, output_file="final_re
         
         # Solution Summary Section
         "<div class='section'>",
-        "<h2><span class='emoji'>📊</span>Solution Summary</h2>",
+        f"<h2><span class='emoji'>{_EMOJI['chart']}</span>Solution Summary</h2>",
         "<div class='metric-grid'>",
         f"<div class='metric-item'>",
         f"<div class='metric-value'>${post_results['total_cost']:.2f}</div>",
@@ -498,82 +597,46 @@ def rsm_generate_report(post_results, animal_requirements, output_file="final_re
         f"</div>",
         "</div>",
         "</div>",
-        
-        # Animal Information
-        "<div class='section'>",
-        "<h2><span class='emoji'>🐄</span>Animal Information</h2>",
-        "<div class='table-container'>",
-        animal_inputs.to_html(index=False, escape=False, classes='animal-info-table'),
-        "</div>",
-        "</div>",
-        
-        # Animal Requirements
-        "<div class='section'>",
-        "<h2><span class='emoji'>📋</span>Nutritional Requirements</h2>",
-        "<div class='table-container'>",
-        An_Requirements.to_html(index=False, escape=False, classes='requirements-table'),
-        "</div>",
-        "</div>",
-        
-        # Diet Results
-        "<div class='section'>",
-        "<h2><span class='emoji'>🍽️</span>Least Cost Diet</h2>",
-        "<div class='table-container'>",
-        dt_results.to_html(index=False, escape=False, classes='diet-table'),
-        "</div>",
-        "</div>",
-        
-        # Detailed Proportions
-        "<div class='section'>",
-        "<h2><span class='emoji'>📊</span>Nutrient Proportions (%)</h2>",
-        "<div class='table-container'>",
-        dt_proportions.to_html(index=False, escape=False, classes='proportions-table'),
-        "</div>",
-        "</div>",
-        
-        # Forages
-        "<div class='section'>",
-        "<h2><span class='emoji'>🌾</span>Forage</h2>",
-        "<div class='table-container'>",
-        dt_forages.to_html(index=False, escape=False, classes='forage-table') if not dt_forages.empty else "<p style='text-align: center; color: #666; font-style: italic;'>No forages in this diet.</p>",
-        "</div>",
-        "</div>",
-        
-        # Concentrates
-        "<div class='section'>",
-        "<h2><span class='emoji'>🌽</span>Concentrate</h2>",
-        "<div class='table-container'>",
-        dt_concentrates.to_html(index=False, escape=False, classes='concentrate-table') if not dt_concentrates.empty else "<p style='text-align: center; color: #666; font-style: italic;'>No concentrates in this diet.</p>",
-        "</div>",
-        "</div>",
-        
-        # Methane Report
-        "<div class='section'>",
-        "<h2><span class='emoji'>🌍</span>Environmental Impact</h2>",
-        "<div class='table-container'>",
-        methane_report.to_html(index=False, escape=False, classes='environmental-table'),
-        "</div>",
-        "</div>",
-        
-        "</div>",  # Close content
-        "</div>",  # Close container
-        
-        "</body></html>"
     ]
+    buf = io.StringIO()
+    buf.write("\n".join(html_parts))
+
+    # Table sections (Animal Information, Requirements, Diet, Proportions, Forage, Concentrate, Methane)
+    frames = {
+        'animal_inputs': animal_inputs,
+        'An_Requirements': An_Requirements,
+        'dt_results': dt_results,
+        'dt_proportions': dt_proportions,
+        'dt_forages': dt_forages,
+        'dt_concentrates': dt_concentrates,
+        'methane_report': methane_report,
+    }
+    for key, header, classes, empty_html, float_format in _REPORT_SECTIONS:
+        _write_table_section(buf, header, frames[key], classes, empty_html, float_format)
 
-    html_content = "\n".join(html_parts)
-    # Ensure file gets overwritten
+    buf.write("\n")
+    buf.write(_HTML_TAIL)
+    # Encode once and write the bytes directly (no second encoding pass in a text-mode writer)
+    html_bytes = buf.getvalue().encode("utf-8")
+    # Ensure file gets overwritten: write a temporary file next to it and swap it in
+    # atomically, so readers never see a half-written report
+    tmp_file = None
     try:
-        # Remove existing file if it exists
-        if os.path.exists(output_file):
-            os.remove(output_file)
-            #print(f"🗑️ Removed existing file: {output_file}")
-    
-        # Write new file
-        Path(output_file).write_text(html_content, encoding="utf-8")
+        fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(output_file) or ".", suffix=".tmp")
+        with os.fdopen(fd, "wb", buffering=1 << 16) as f:
+            f.write(html_bytes)
+        # mkstemp creates the file owner-only: keep the mode of the report it replaces, or the umask default
+        try:
+            mode = os.stat(output_file).st_mode & 0o777
+        except OSError:
+            mode = _REPORT_FILE_MODE
+        os.chmod(tmp_file, mode)
+        os.replace(tmp_file, output_file)
         #print(f"✅ Report generated: {output_file}")
     
     except Exception as e:
+        if tmp_file is not None and os.path.exists(tmp_file):
+            os.unlink(tmp_file)
         print(f"Error writing report: {e}")
         print(f"   Attempted to write to: {os.path.abspath(output_file)}")
 
@@ -634,75 +697,71 @@ def print_selected_feeds(best_solution_vector, f_nd, total_cost):
     """
     Print the selected feeds for the diet recommendation
     """
-    print("\n" + "="*60)
-    print("🍽️  DIET RECOMMENDATION - SELECTED FEEDS")
-    print("="*60)
+    # Lines are collected and written to stdout in one call at the end
+    out = ["\n" + "="*60, "🍽️  DIET RECOMMENDATION - SELECTED FEEDS", "="*60]
     
-    # Convert f_nd to DataFrame for easy access
+    # Convert f_nd to DataFrame once and read the needed columns as arrays
     f_nd_df = pd.DataFrame(f_nd)
-    
-    # Get selected feeds (non-zero amounts)
-    selected_feeds = []
-    total_dm = 0
-    
-    for i, amount in enumerate(best_solution_vector):
-        if amount > 0:
-            feed_name = f_nd_df.iloc[i]['Fd_Name']
-            feed_category = f_nd_df.iloc[i]['Fd_Category']
-            feed_type = f_nd_df.iloc[i]['Fd_Type']
-            feed_cost = f_nd_df.iloc[i]['Fd_Cost']
-            feed_dm = f_nd_df.iloc[i]['Fd_DM']
-            
-            # Calculate as-fed amount
-            af_amount = amount / (feed_dm / 100) if feed_dm > 0 else amount
-            feed_cost_total = af_amount * feed_cost
-            
-            selected_feeds.append({
-                'name': feed_name,
-                'category': feed_category,
-                'type': feed_type,
-                'dm_kg': amount,
-                'af_kg': af_amount,
-                'dm_pct': feed_dm,
-                'cost_per_kg': feed_cost,
-                'total_cost': feed_cost_total
-            })
-            total_dm += amount
+    amounts = np.asarray(best_solution_vector, dtype=float)
+    n = len(amounts)
+    names = f_nd_df['Fd_Name'].to_numpy()[:n]
+    categories = f_nd_df['Fd_Category'].to_numpy()[:n]
+    types = f_nd_df['Fd_Type'].to_numpy()[:n]
+    costs = f_nd_df['Fd_Cost'].to_numpy()[:n]
+    dms = f_nd_df['Fd_DM'].to_numpy()[:n]
+
+    # Get selected feeds (non-zero amounts); solutions are sparse, so only those rows are visited
+    nz = np.flatnonzero(amounts > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Calculate as-fed amount
+        af_amounts = np.where(dms[nz] > 0, amounts[nz] / (dms[nz] / 100), amounts[nz])
+    feed_costs_total = af_amounts * costs[nz]
+
+    selected_feeds = [
+        {
+            'name': names[i],
+            'category': categories[i],
+            'type': types[i],
+            'dm_kg': amounts[i],
+            'af_kg': af,
+            'dm_pct': dms[i],
+            'cost_per_kg': costs[i],
+            'total_cost': cost_total
+        }
+        for i, af, cost_total in zip(nz.tolist(), af_amounts.tolist(), feed_costs_total.tolist())
+    ]
+    total_dm = sum(amounts[nz].tolist())
     
     # Sort by amount (highest first)
     selected_feeds.sort(key=lambda x: x['dm_kg'], reverse=True)
     
     # Print header
-    print(f"{'Feed Name':<25} {'Category':<15} {'DM (kg)':<10} {'AF (kg)':<10} {'Cost ($)':<10}")
-    print("-" * 70)
+    out.append(f"{'Feed Name':<25} {'Category':<15} {'DM (kg)':<10} {'AF (kg)':<10} {'Cost ($)':<10}")
+    out.append("-" * 70)
     
     # Print each selected feed
     for feed in selected_feeds:
-        print(f"{feed['name']:<25} {feed['category']:<15} {feed['dm_kg']:<10.3f} {feed['af_kg']:<10.3f} {feed['total_cost']:<10.2f}")
+        out.append(f"{feed['name']:<25} {feed['category']:<15} {feed['dm_kg']:<10.3f} {feed['af_kg']:<10.3f} {feed['total_cost']:<10.2f}")
     
-    print("-" * 70)
-    print(f"{'TOTAL':<25} {'':<15} {total_dm:<10.3f} {'':<10} {total_cost:<10.2f}")
+    out.append("-" * 70)
+    out.append(f"{'TOTAL':<25} {'':<15} {total_dm:<10.3f} {'':<10} {total_cost:<10.2f}")
     
     # Calculate percentages
-    print(f"\n📊 DIET COMPOSITION:")
-    print(f"Total DM: {total_dm:.3f} kg/day")
-    print(f"Total Cost: ${total_cost:.2f}/day")
-    
-    # Group by category
-    category_totals = {}
-    for feed in selected_feeds:
-        cat = feed['category']
-        if cat not in category_totals:
-            category_totals[cat] = {'dm': 0, 'cost': 0}
-        category_totals[cat]['dm'] += feed['dm_kg']
-        category_totals[cat]['cost'] += feed['total_cost']
+    out.append(f"\n📊 DIET COMPOSITION:")
+    out.append(f"Total DM: {total_dm:.3f} kg/day")
+    out.append(f"Total Cost: ${total_cost:.2f}/day")
     
-    print(f"\n📈 BY CATEGORY:")
-    for cat, totals in category_totals.items():
-        pct = (totals['dm'] / total_dm) * 100 if total_dm > 0 else 0
-        print(f"  {cat}: {totals['dm']:.3f} kg ({pct:.1f}%) - ${totals['cost']:.2f}")
+    out.append(f"\n📈 BY CATEGORY:")
+    if selected_feeds:
+        # Group by category (in order of first appearance)
+        category_totals = (pd.DataFrame(selected_feeds)
+                           .groupby('category', sort=False, dropna=False)[['dm_kg', 'total_cost']].sum())
+        for cat, dm, cost in category_totals.itertuples(name=None):
+            pct = (dm / total_dm) * 100 if total_dm > 0 else 0
+            out.append(f"  {cat}: {dm:.3f} kg ({pct:.1f}%) - ${cost:.2f}")
     
-    print("="*60)
+    out.append("="*60)
+    sys.stdout.write("\n".join(out) + "\n")
 
 # Run 
 
@@ -12,9 +12,9 @@ optimization population:
 - Detailed adequacy calculation for all nutritional constraints
 """
 
+import logging
 import numpy as np
 import pandas as pd
-import re
 from dataclasses import dataclass
 
 # Import from config
@@ -23,17 +23,20 @@ from .config import Constraints, CONSTRAINT_TOLERANCE_RANGES
 # Import from optimization_core
 from .optimization_core import (
     rsm_decode_solution_to_q,
-    rsm_diet_supply,
+    rsm_diet_supply_cached,
     rsm_detect_present_categories
 )
 
 # Import from constraints
 from .constraints import (
-    evaluate_constraint_adequacy,
+    category_matrix,
+    evaluate_constraint_adequacy_many,
     ca_constraint_name,
     CONSTRAINT_META
 )
 
+logger = logging.getLogger(__name__)
+
 # ===================================================================
 # SOLUTION SELECTION CONFIGURATION
 # ===================================================================
@@ -49,6 +52,11 @@ SELECTION_CONFIG = {
         'forage_minimum_pct': 15.0      # Minimum forage inclusion required
     }
 
+def _decode_q(solution_x, res, animal_requirements):
+    """Decode one solution to kg quantities (for callers without a pre-decoded q)"""
+    decision_mode = getattr(getattr(res, "problem", None), "decision_mode", "kg")
+    return rsm_decode_solution_to_q(solution_x, decision_mode, float(animal_requirements["Trg_Dt_DMIn"]))[0]
+
 def _get_forage_percentage(solution, res, animal_requirements, f_nd, categories=None, cached_q=None):        
         #Calculate percentage of practical forage (moist forage) in solution using mask_moist_forage from detect_present_categories.
         #This excludes dry hay/straw and focuses on practical moist forages.
@@ -58,9 +66,7 @@ def _get_forage_percentage(solution, res, animal_requirements, f_nd, categories=
             if cached_q is not None:
                 q = cached_q
             else:
-                decision_mode = getattr(getattr(res, "problem", None), "decision_mode", "kg")
-                trg_dmi = float(animal_requirements["Trg_Dt_DMIn"])
-                q = rsm_decode_solution_to_q(solution["x"], decision_mode, trg_dmi)[0]
+                q = _decode_q(solution["x"], res, animal_requirements)
             if len(q) == 0:
                 return 0.0
 
@@ -75,12 +81,16 @@ def _get_forage_percentage(solution, res, animal_requirements, f_nd, categories=
                 return 0.0
 
             total_dm = np.sum(q)
-            moist_forage_dm = np.sum(q[moist_forage_mask]) if np.any(moist_forage_mask) else 0.0
+            category_kg = solution.get("category_kg") if isinstance(solution, dict) else None
+            if category_kg is not None and "mask_moist_forage" in category_kg:
+                moist_forage_dm = category_kg["mask_moist_forage"]
+            else:
+                moist_forage_dm = q[moist_forage_mask].sum()  # 0.0 for an empty mask
             moist_forage_percentage = (moist_forage_dm / total_dm * 100.0) if total_dm > 0 else 0.0
             return moist_forage_percentage
         except Exception as e:
             # Log the error for debugging but return conservative value
-            print(f"WARNING: Forage percentage calculation failed: {e}")
+            logger.warning("Forage percentage calculation failed: %s", e)
             return 0.0  # Conservative fallback
 
 def _calculate_practicality_score(solution, res, animal_requirements, f_nd, categories=None, cached_q=None):
@@ -90,9 +100,7 @@ def _calculate_practicality_score(solution, res, animal_requirements, f_nd, cate
             if cached_q is not None:
                 q = cached_q
             else:
-                decision_mode = getattr(getattr(res, "problem", None), "decision_mode", "kg")
-                trg_dmi = float(animal_requirements["Trg_Dt_DMIn"])
-                q = rsm_decode_solution_to_q(solution["x"], decision_mode, trg_dmi)[0]
+                q = _decode_q(solution["x"], res, animal_requirements)
             
             # Forage inclusion scoring - use existing categories if available
             forage_pct = _get_forage_percentage(solution, res, animal_requirements, f_nd, categories, q)
@@ -108,7 +116,7 @@ def _calculate_practicality_score(solution, res, animal_requirements, f_nd, cate
                 forage_score = 0.0      # Unrealistic (pure concentrate)
             
             # Ingredient diversity scoring (optimized for small producers)
-            active_ingredients = np.sum(q > 0.001)  # Count significant ingredients
+            active_ingredients = np.count_nonzero(q > 0.001)  # Count significant ingredients
             # Target 3-6 ingredients for small producers (peak score at 4-5 ingredients)
             if active_ingredients <= 6:
                 diversity_score = min(active_ingredients / 4.0, 1.0)  # Peak at 4+ ingredients
@@ -127,8 +135,11 @@ def _calculate_practicality_score(solution, res, animal_requirements, f_nd, cate
             
             anchoring_bonus = 1.0
             if categories is not None:
-                user_forage_count = np.sum((q > 0.01) & categories.get("mask_moist_forage", np.zeros_like(q, dtype=bool)))
-                user_conc_count = np.sum((q > 0.01) & categories.get("mask_conc_all", np.zeros_like(q, dtype=bool)))
+                used = q > 0.01
+                mask_forage = categories.get("mask_moist_forage")
+                mask_conc = categories.get("mask_conc_all")
+                user_forage_count = np.count_nonzero(used & mask_forage) if mask_forage is not None else 0
+                user_conc_count = np.count_nonzero(used & mask_conc) if mask_conc is not None else 0
                 if user_forage_count >= 1 and user_conc_count >= 1:
                     anchoring_bonus = 1.05  # 5% bonus for including both
             
@@ -147,6 +158,41 @@ def _calculate_practicality_score(solution, res, animal_requirements, f_nd, cate
         except Exception:
             return {'forage': 0.5, 'diversity': 0.5, 'overall': 0.5, 'forage_pct': 25.0}
 
+def _score_practicality_vec(Qm, forage_pct, categories=None):
+        """
+        _calculate_practicality_score for a stacked population (rows of Qm, forage_pct per row),
+        as array operations. Returns a dict of length-N arrays.
+        """
+        forage_score = np.select([forage_pct >= 45, forage_pct >= 40, forage_pct >= 25, forage_pct >= 5],
+                                 [1.0, 0.8, 0.5, 0.2], 0.0)
+
+        # Ingredient diversity: peak at 4-6 ingredients, penalty above 6
+        active_ingredients = np.count_nonzero(Qm > 0.001, axis=1)
+        diversity_score = np.where(active_ingredients <= 6,
+                                   np.minimum(active_ingredients / 4.0, 1.0),
+                                   np.maximum(0.5, 1.0 - (active_ingredients - 6) * 0.1))
+
+        # DOMINANCE
+        with np.errstate(divide="ignore", invalid="ignore"):
+            max_ingredient_pct = (Qm.max(axis=1) / Qm.sum(axis=1)) * 100.0
+        dominance_penalty = np.select([max_ingredient_pct > 80.0, max_ingredient_pct > 60.0], [0.1, 0.7], 1.0)
+
+        anchoring_bonus = 1.0
+        if categories is not None:
+            empty = np.zeros(Qm.shape[1], dtype=bool)
+            used = Qm > 0.01
+            user_forage_count = np.count_nonzero(used & categories.get("mask_moist_forage", empty), axis=1)
+            user_conc_count = np.count_nonzero(used & categories.get("mask_conc_all", empty), axis=1)
+            anchoring_bonus = np.where((user_forage_count >= 1) & (user_conc_count >= 1), 1.05, 1.0)
+
+        base_score = 0.6 * forage_score + 0.4 * diversity_score
+        return {
+            'forage': forage_score,
+            'diversity': diversity_score,
+            'overall': base_score * dominance_penalty * anchoring_bonus,
+            'forage_pct': forage_pct
+        }
+
 def _score_constraint_compliance(solution):
         """Score based on constraint compliance with graduated penalties"""
         try:
@@ -170,16 +216,34 @@ def _score_constraint_compliance(solution):
         except Exception:
             return 0.5
 
-def _extract_percentage_from_adequacy(adequacy_text):
-        """Extract percentage value from adequacy result text"""
-        try:
-            import re
-            match = re.search(r'(\d+\.?\d*)%', adequacy_text)
-            return float(match.group(1)) if match else 0.0
-        except:
-            return 0.0
+def _cost_bounds(population_costs):
+    """(min, max) of the population costs, or None for a single solution / no cost data"""
+    if population_costs and len(population_costs) > 1:
+        return min(population_costs), max(population_costs)
+    return None
+
+def _score_cost_efficiency(cost, cost_bounds):
+    """Min-max normalized cost, inverted so that lower cost scores higher"""
+    if cost_bounds is None:
+        return 1.0  # Single solution or no cost data
+    min_cost, max_cost = cost_bounds
+    cost_range = max_cost - min_cost
+    if cost_range > 1e-9:  # Avoid division by zero
+        cost_normalized = (cost - min_cost) / cost_range
+        return max(0.0, 1.0 - cost_normalized)  # Invert: lower cost = higher score
+    return 1.0  # All costs are the same
+
+def _score_cost_efficiency_vec(costs, cost_bounds):
+    """_score_cost_efficiency over an array of costs"""
+    if cost_bounds is not None:
+        min_cost, max_cost = cost_bounds
+        cost_range = max_cost - min_cost
+        if cost_range > 1e-9:
+            cost_score = 1.0 - (costs - min_cost) / cost_range
+            return np.where(cost_score > 0.0, cost_score, 0.0)
+    return np.ones(len(costs))
 
-def _score_nutrient_by_tolerance(actual_pct, target_pct, nutrient_key, tolerance_ranges, is_energy_or_protein=False):
+def _score_nutrient_by_tolerance(actual_pct, target_pct, tol, is_energy_or_protein=False):
     """
     Score nutrient using CONSTRAINT_TOLERANCE_RANGES with specified scoring logic.
     
@@ -189,10 +253,9 @@ def _score_nutrient_by_tolerance(actual_pct, target_pct, nutrient_key, tolerance
         Actual percentage of nutrient supplied
     target_pct : float
         Target percentage (usually 100.0)
-    nutrient_key : str
-        Key for the nutrient ('dmi', 'energy', 'protein')
-    tolerance_ranges : dict
-        Dictionary of tolerance ranges by nutrient
+    tol : sequence of float
+        Perfect/good/marginal upper deviations (%) of the nutrient, a row of _TOL_ARRAY
+        (NaN if the nutrient has no tolerance range)
     is_energy_or_protein : bool
         Whether scoring energy or protein (affects penalty logic)
     
@@ -200,20 +263,20 @@ def _score_nutrient_by_tolerance(actual_pct, target_pct, nutrient_key, tolerance
     --------
     float : Score from 0.0 to 1.0
     """
-    if nutrient_key not in tolerance_ranges:
+    perfect_hi, good_hi, marginal_hi = tol
+    if np.isnan(perfect_hi):
         return 0.5  # Fallback
     
-    config = tolerance_ranges[nutrient_key]
     deviation_pct = abs(actual_pct - target_pct)
     is_positive_deviation = actual_pct > target_pct
     is_negative_deviation = actual_pct < target_pct
     
     # Determine tolerance level
-    if deviation_pct <= config["perfect"][1]:
+    if deviation_pct <= perfect_hi:
         level = "perfect"
-    elif deviation_pct <= config["good"][1]:
+    elif deviation_pct <= good_hi:
         level = "good"
-    elif deviation_pct <= config["marginal"][1]:
+    elif deviation_pct <= marginal_hi:
         level = "marginal"
     else:
         level = "infeasible"
@@ -238,25 +301,83 @@ def _score_nutrient_by_tolerance(actual_pct, target_pct, nutrient_key, tolerance
     else:  # infeasible
         return 0.1  # Always infeasible
 
-def _calculate_critical_adequacy_score(solution_x, res, animal_requirements, f_nd):
+# Critical nutrients as (tolerance key, energy/protein scoring)
+_CRITICAL_NUTRIENTS = (("dmi", False), ("energy", True), ("protein", True))
+_TOLERANCE_LEVELS = ("perfect", "good", "marginal")
+
+def _tolerance_array(tolerance_ranges):
+    """
+    (3, 3) perfect/good/marginal upper deviations of the critical nutrients (DMI, Energy, Protein);
+    a row is NaN where the nutrient has no complete tolerance range.
+    """
+    return np.array([
+        [tolerance_ranges[key][level][1] for level in _TOLERANCE_LEVELS]
+        if key in tolerance_ranges and all(level in tolerance_ranges[key] for level in _TOLERANCE_LEVELS)
+        else [np.nan] * len(_TOLERANCE_LEVELS)
+        for key, _ in _CRITICAL_NUTRIENTS], dtype=float)
+
+# Critical nutrient tolerances per animal type, read once from CONSTRAINT_TOLERANCE_RANGES
+_TOL_ARRAY = {animal_type: _tolerance_array(ranges) for animal_type, ranges in CONSTRAINT_TOLERANCE_RANGES.items()}
+_NO_TOLERANCES = _tolerance_array({})
+
+def _score_nutrients_vec(pcts, upper_bounds, is_energy_or_protein, target_pct=100.0):
+    """
+    _score_nutrient_by_tolerance over an (N, k) array of percentages in one pass.
+    upper_bounds is (k, 3): the perfect/good/marginal upper deviations of each nutrient.
+    """
+    deviation_pct = np.abs(pcts - target_pct)
+    is_positive_deviation = pcts > target_pct
+    is_energy_or_protein = np.asarray(is_energy_or_protein, dtype=bool)
+    good = np.where(is_energy_or_protein, np.where(is_positive_deviation, 0.8, 0.6), 0.8)
+    marginal = np.where(is_energy_or_protein, np.where(is_positive_deviation, 0.6, 0.3), 0.2)
+    return np.select(
+        [deviation_pct <= upper_bounds[:, 0], deviation_pct <= upper_bounds[:, 1], deviation_pct <= upper_bounds[:, 2]],
+        [1.0, good, marginal], 0.1)
+
+def _population_critical_adequacy(candidates, res, f_nd, animal_requirements, memo=None, present_categories=None,
+                                  supply_memo=None):
+    """
+    Attach 'critical_pcts' (DMI, Energy, Protein %) and the 'critical_adequacy' score to each
+    candidate, scoring the whole group at once. Leaves the candidates untouched if the group
+    cannot be scored this way; _calculate_critical_adequacy_score then handles them one by one.
+    """
+    try:
+        pcts = np.array([
+            _critical_adequacy_pcts(res, c["x"], f_nd, animal_requirements, c.get("q"), c.get("category_kg"), memo,
+                                    present_categories, supply_memo)
+            for c in candidates], dtype=float).reshape(-1, 3)
+        upper_bounds = _TOL_ARRAY[animal_requirements.get("An_StatePhys", "Lactating Cow")]
+    except Exception:
+        return
+    if np.isnan(upper_bounds).any():
+        return
+    scores = _score_nutrients_vec(pcts, upper_bounds, [ep for _, ep in _CRITICAL_NUTRIENTS])
+    # DMI: 30% weight, Energy: 35% weight, Protein: 35% weight
+    critical = 0.30 * scores[:, 0] + 0.35 * scores[:, 1] + 0.35 * scores[:, 2]
+    # 10% bonus if Energy AND Protein are both >=98%
+    bonus = (pcts[:, 1] >= 98.0) & (pcts[:, 2] >= 98.0)
+    critical = np.where(bonus, np.minimum(1.0, critical * 1.1), critical)
+    for c, row, score in zip(candidates, pcts.tolist(), critical.tolist()):
+        c["critical_pcts"] = tuple(row)
+        c["critical_adequacy"] = score
+
+def _calculate_critical_adequacy_score(solution_x, res, animal_requirements, f_nd, q=None, category_kg=None, memo=None,
+                                       present_categories=None, supply_memo=None):
         """Calculate critical adequacy score prioritizing Energy and Protein closeness to 100%"""
         try:
-            adequacy_results = _calculate_detailed_adequacy(res, solution_x, f_nd, animal_requirements)
-            
-            # Extract critical nutrient percentages
-            dmi_pct = _extract_percentage_from_adequacy(adequacy_results.get("DMI", "0%"))
-            energy_pct = _extract_percentage_from_adequacy(adequacy_results.get("Energy", "0%"))
-            protein_pct = _extract_percentage_from_adequacy(adequacy_results.get("Protein", "0%"))
+            # Critical nutrient percentages
+            dmi_pct, energy_pct, protein_pct = _critical_adequacy_pcts(
+                res, solution_x, f_nd, animal_requirements, q, category_kg, memo, present_categories, supply_memo)
 
             
             # Get tolerance ranges from global configuration
             animal_type = animal_requirements.get("An_StatePhys", "Lactating Cow")
-            tolerance_ranges = CONSTRAINT_TOLERANCE_RANGES.get(animal_type, {})
+            dmi_tol, energy_tol, protein_tol = _TOL_ARRAY.get(animal_type, _NO_TOLERANCES).tolist()
             
             # Score each critical nutrient using tolerance ranges
-            dmi_score = _score_nutrient_by_tolerance(dmi_pct, 100.0, "dmi", tolerance_ranges, is_energy_or_protein=False)
-            energy_score = _score_nutrient_by_tolerance(energy_pct, 100.0, "energy", tolerance_ranges, is_energy_or_protein=True)
-            protein_score = _score_nutrient_by_tolerance(protein_pct, 100.0, "protein", tolerance_ranges, is_energy_or_protein=True)
+            dmi_score = _score_nutrient_by_tolerance(dmi_pct, 100.0, dmi_tol, is_energy_or_protein=False)
+            energy_score = _score_nutrient_by_tolerance(energy_pct, 100.0, energy_tol, is_energy_or_protein=True)
+            protein_score = _score_nutrient_by_tolerance(protein_pct, 100.0, protein_tol, is_energy_or_protein=True)
             
             # Weighted average: Energy and Protein are more important
             # DMI: 30% weight, Energy: 35% weight, Protein: 35% weight
@@ -273,37 +394,36 @@ def _calculate_critical_adequacy_score(solution_x, res, animal_requirements, f_n
             
             return critical_adequacy_score
         except Exception as e:
-            print(f"Error calculating critical adequacy: {e}")
+            logger.warning("Error calculating critical adequacy: %s", e)
             return 0.5  # Neutral score on error
 
-def _calculate_composite_score(solution, res, f_nd, animal_requirements, categories=None, population_costs=None):
+def _calculate_composite_score(solution, res, f_nd, animal_requirements, categories=None, population_costs=None, memo=None,
+                               present_categories=None, supply_memo=None):
         """Calculate weighted composite score balancing all objectives with critical adequacy priority"""
         try:
-            # Calculate critical adequacy score (DMI, Energy, Protein)
-            critical_adequacy_score = _calculate_critical_adequacy_score(solution["x"], res, animal_requirements, f_nd)
+            # Quantities decoded once for the whole population (see _decode_population)
+            cached_q = solution.get("q")
+            if cached_q is None:
+                cached_q = _decode_q(solution["x"], res, animal_requirements)
+
+            # Calculate critical adequacy score (DMI, Energy, Protein); precomputed per group when possible
+            critical_adequacy_score = solution.get("critical_adequacy")
+            if critical_adequacy_score is None:
+                critical_adequacy_score = _calculate_critical_adequacy_score(
+                    solution["x"], res, animal_requirements, f_nd, cached_q, solution.get("category_kg"), memo,
+                    present_categories, supply_memo)
             
             # Practicality score - pass cached q to avoid redundant calculations
-            decision_mode = getattr(getattr(res, "problem", None), "decision_mode", "kg")
-            trg_dmi = float(animal_requirements["Trg_Dt_DMIn"])
-            cached_q = rsm_decode_solution_to_q(solution["x"], decision_mode, trg_dmi)[0]
-            practicality_data = _calculate_practicality_score(solution, res, animal_requirements, f_nd, categories, cached_q)
+            practicality_data = solution.get("practicality")
+            if practicality_data is None:
+                practicality_data = _calculate_practicality_score(solution, res, animal_requirements, f_nd, categories, cached_q)
             practicality_score = practicality_data['overall']
             
             # Constraint compliance
             constraint_score = _score_constraint_compliance(solution)
             
             # Cost efficiency (dynamic min-max normalization and invert)
-            if population_costs and len(population_costs) > 1:
-                min_cost = min(population_costs)
-                max_cost = max(population_costs)
-                cost_range = max_cost - min_cost
-                if cost_range > 1e-9:  # Avoid division by zero
-                    cost_normalized = (solution["cost"] - min_cost) / cost_range
-                    cost_score = max(0.0, 1.0 - cost_normalized)  # Invert: lower cost = higher score
-                else:
-                    cost_score = 1.0  # All costs are the same
-            else:
-                cost_score = 1.0  # Single solution or no cost data
+            cost_score = _score_cost_efficiency(solution["cost"], _cost_bounds(population_costs))
             
             # Weighted composite using configuration 
             weights = SELECTION_CONFIG['objective_weights']
@@ -323,84 +443,210 @@ def _calculate_composite_score(solution, res, f_nd, animal_requirements, categor
                 'practicality_data': practicality_data
             }
         except Exception as e:
-            print(f"Error in composite scoring: {e}")
+            logger.warning("Error in composite scoring: %s", e)
             return {'composite': 0.5, 'critical_adequacy': 0.5, 'practicality': 0.5, 
                    'constraints': 0.5, 'cost': 0.5, 'practicality_data': {'overall': 0.5, 'forage_pct': 25.0}}
 
+# Candidates given the full composite score per round of _score_candidates
+_SCORING_BATCH = 20
+
+def _score_candidates(candidates, res, f_nd, animal_requirements, categories=None, memo=None, present_categories=None,
+                      supply_memo=None):
+    """
+    Attach composite 'scores' to every candidate _apply_fallback_logic could select or rank
+    ahead of its selection, and return those candidates in their original order.
+
+    Critical adequacy (a diet supply evaluation per candidate) is the only expensive term and
+    lies in [0, 1], so scoring a candidate at full adequacy bounds its composite from above.
+    Practical candidates are scored in batches by descending bound until the best composite
+    beats every remaining bound; beyond that only candidates whose bound reaches that composite
+    can rank ahead of it. Without any practical candidate all of them are scored.
+    """
+    n = len(candidates)
+    population_costs = [c["cost"] for c in candidates]
+    weights = SELECTION_CONFIG['objective_weights']
+
+    for c in candidates:
+        if c.get("practicality") is None:
+            c["practicality"] = _calculate_practicality_score(c, res, animal_requirements, f_nd, categories, c.get("q"))
+
+    # Cheap score terms of the whole group as arrays
+    practicality_data = [c["practicality"] for c in candidates]
+    practicality = np.fromiter((p['overall'] for p in practicality_data), dtype=np.float64, count=n)
+    forage_pct = np.fromiter((p['forage_pct'] for p in practicality_data), dtype=np.float64, count=n)
+    constraint_scores = [_score_constraint_compliance(c) for c in candidates]
+    constraint = np.asarray(constraint_scores, dtype=np.float64)
+    cost = _score_cost_efficiency_vec(np.asarray(population_costs, dtype=np.float64), _cost_bounds(population_costs))
+
+    upper = (weights['critical_adequacy'] * 1.0 + weights['practicality'] * practicality +
+             weights['constraints'] * constraint + weights['cost'] * cost)
+    practical = ((practicality >= SELECTION_CONFIG['practicality_threshold']) &
+                 (forage_pct >= SELECTION_CONFIG['forage_minimum_pct']))
+
+    def _score(idx):
+        batch = [candidates[i] for i in idx]
+        _population_critical_adequacy(batch, res, f_nd, animal_requirements, memo, present_categories, supply_memo)
+        critical = np.array([np.nan if c.get("critical_adequacy") is None else c["critical_adequacy"] for c in batch])
+        composite = (weights['critical_adequacy'] * critical + weights['practicality'] * practicality[idx] +
+                     weights['constraints'] * constraint[idx] + weights['cost'] * cost[idx])
+        for c, i, comp, cost_score in zip(batch, idx.tolist(), composite.tolist(), cost[idx].tolist()):
+            if c.get("critical_adequacy") is None:
+                c["scores"] = _calculate_composite_score(c, res, f_nd, animal_requirements, categories, population_costs,
+                                                         memo, present_categories, supply_memo)
+                continue
+            c["scores"] = {
+                'composite': comp,
+                'critical_adequacy': c["critical_adequacy"],
+                'practicality': practicality_data[i]['overall'],
+                'constraints': constraint_scores[i],
+                'cost': cost_score,
+                'practicality_data': practicality_data[i]
+            }
+        return [c["scores"]["composite"] for c in batch]
+
+    scored = np.zeros(n, dtype=bool)
+    if practical.any() and np.isfinite(upper).all():
+        order = np.flatnonzero(practical)
+        order = order[np.argsort(-upper[order], kind="stable")]
+        best = -np.inf
+        for start in range(0, len(order), _SCORING_BATCH):
+            if upper[order[start]] < best:
+                break
+            batch = order[start:start + _SCORING_BATCH]
+            best = max(best, max(_score(batch)))
+            scored[batch] = True
+        remaining = np.flatnonzero(~scored & (upper >= best))
+    else:
+        remaining = np.arange(n)
+    if remaining.size:
+        _score(remaining)
+        scored[remaining] = True
+    return [c for c, s in zip(candidates, scored.tolist()) if s]
+
 def _apply_fallback_logic(candidates):
         """Smart fallback when top solutions are impractical"""
         
         if not candidates:
-            print("No candidates available!")
+            logger.warning("No candidates available!")
             return None, "No candidates available"
         
-        # Sort by composite score
-        ranked = sorted(candidates, key=lambda x: x['scores']['composite'], reverse=True)
+        # Rank by composite score (stable: ties keep their candidate order)
+        n = len(candidates)
+        composite = np.fromiter((c['scores']['composite'] for c in candidates), dtype=np.float64, count=n)
+        order = np.argsort(-composite, kind="stable")
+        ranked = [candidates[i] for i in order.tolist()]
         
-        # Check all candidates for practicality
+        # Practicality check for all candidates at once
         threshold = SELECTION_CONFIG['practicality_threshold']
+        practicality = np.fromiter((c['scores']['practicality_data']['overall'] for c in candidates), dtype=np.float64, count=n)
+        forage_pct = np.fromiter((c['scores']['practicality_data']['forage_pct'] for c in candidates), dtype=np.float64, count=n)
+        meets_criteria = ((practicality >= threshold) & (forage_pct >= SELECTION_CONFIG['forage_minimum_pct']))[order]
         
-        for i, candidate in enumerate(ranked):
-            practicality = candidate['scores']['practicality_data']['overall']
-            forage_pct = candidate['scores']['practicality_data']['forage_pct']
-            
-            # Only show details for first 10 candidates to prevent console spam
-            if i < 10:
-                # print(f"Candidate #{i+1}: practicality={practicality:.3f}, forage={forage_pct:.1f}%")
-                pass
-            
-            if practicality >= threshold and forage_pct >= SELECTION_CONFIG['forage_minimum_pct']:
-                print(f"MEETS CRITERIA - Selecting solution #{i+1}")
-                return candidate, f"Selected candidate #{i+1}"
-            else:
-                if i < 10:  # Only show rejection reasons for first 10
-                    reasons = []
-                    if practicality < threshold:
-                        reasons.append(f"low practicality ({practicality:.3f} < {threshold})")
-                    if forage_pct < SELECTION_CONFIG['forage_minimum_pct']:
-                        reasons.append(f"low forage ({forage_pct:.1f}% < {SELECTION_CONFIG['forage_minimum_pct']}%)")
-                    # print(f"REJECTED: {', '.join(reasons)}")
-                
-            if i == 0:  # Log if #1 solution is impractical
-                # print(f"Top solution rejected: practicality={practicality:.3f}, forage={forage_pct:.1f}%")
-                pass
-            elif i == 9 and len(ranked) > 10:  # Indicate if more candidates exist
-                # print(f"... checking {len(ranked) - 10} more candidates silently ...")
-                pass
+        if meets_criteria.any():
+            i = int(np.argmax(meets_criteria))
+            logger.info("MEETS CRITERIA - Selecting solution #%d", i + 1)
+            return ranked[i], f"Selected candidate #{i+1}"
         
         # Fallback: Find best solution above practicality threshold
-        print(f"\n   🔍 EXTENDED FALLBACK SEARCH:")
-        practical_candidates = [
-            c for c in ranked 
-            if (c['scores']['practicality_data']['overall'] >= threshold and 
-                c['scores']['practicality_data']['forage_pct'] >= SELECTION_CONFIG['forage_minimum_pct'])
-        ]
+        logger.info("EXTENDED FALLBACK SEARCH:")
+        practical_candidates = [ranked[i] for i in np.flatnonzero(meets_criteria).tolist()]
         
-        print(f"   Found {len(practical_candidates)} practical candidates out of {len(ranked)} total")
+        logger.info("Found %d practical candidates out of %d total", len(practical_candidates), len(ranked))
         
         if practical_candidates:
             selected = practical_candidates[0]
             pract_score = selected['scores']['practicality_data']['overall']
             forage_pct = selected['scores']['practicality_data']['forage_pct']
-            print(f"   🔄 FALLBACK SUCCESS: Selected practical solution #{ranked.index(selected)+1}")
-            print(f"      Practicality: {pract_score:.3f}, Forage: {forage_pct:.1f}%")
+            logger.info("FALLBACK SUCCESS: Selected practical solution #%d", ranked.index(selected) + 1)
+            logger.info("Practicality: %.3f, Forage: %.1f%%", pract_score, forage_pct)
             return selected, "Fallback to practical solution"
         
         # Last resort: Select best overall but flag as impractical
-        print("LAST RESORT: No practical solutions found anywhere!")
-        print(f"   Selecting best available (composite score: {ranked[0]['scores']['composite']:.3f})")
+        logger.warning("LAST RESORT: No practical solutions found anywhere!")
+        logger.warning("Selecting best available (composite score: %.3f)", ranked[0]['scores']['composite'])
         return ranked[0], "Warning: No practical solutions found"
 
-def _calculate_detailed_adequacy(res, solution_x, f_nd, animal_requirements):
+def _detailed_adequacy_cached(res, solution_x, f_nd, animal_requirements, q=None, category_kg=None, memo=None,
+                              present_categories=None, supply_memo=None):
+    """
+    (adequacy_results, adequacy_pcts) of a solution. memo is the selection run's dict of results
+    keyed on the solution bytes: each candidate is scored and then summarized from the same
+    adequacy, and the winner is evaluated again. Without a memo the adequacy is computed directly.
+    """
+    if memo is None:
+        return _compute_detailed_adequacy(res, solution_x, f_nd, animal_requirements, q, category_kg, present_categories,
+                                          supply_memo)
+    key = np.asarray(solution_x, dtype=float).tobytes()
+    entry = memo.get(key)
+    if entry is None:
+        entry = memo[key] = _compute_detailed_adequacy(res, solution_x, f_nd, animal_requirements, q, category_kg,
+                                                       present_categories, supply_memo)
+    return entry
+
+
+def _calculate_detailed_adequacy(res, solution_x, f_nd, animal_requirements, q=None, category_kg=None, memo=None,
+                                 present_categories=None, supply_memo=None):
     """Calculate detailed adequacy percentages aligned with CONSTRAINT_TOLERANCE_RANGES"""
+    return dict(_detailed_adequacy_cached(res, solution_x, f_nd, animal_requirements, q, category_kg, memo,
+                                          present_categories, supply_memo)[0])
+
+
+def _critical_adequacy_pcts(res, solution_x, f_nd, animal_requirements, q=None, category_kg=None, memo=None,
+                           present_categories=None, supply_memo=None):
+    """DMI, Energy and Protein adequacy percentages (0.0 when not evaluated)"""
+    adequacy_pcts = _detailed_adequacy_cached(res, solution_x, f_nd, animal_requirements, q, category_kg, memo,
+                                              present_categories, supply_memo)[1]
+    return adequacy_pcts.get("DMI", 0.0), adequacy_pcts.get("Energy", 0.0), adequacy_pcts.get("Protein", 0.0)
+
+
+def _adequacy_pct(actual, target):
+    """
+    Adequacy percentage as shown in the adequacy text, rounded to one decimal
+    and unsigned; 0.0 if not finite.
+    """
+    pct = 100.0 * actual / max(target, 1e-12)
+    return abs(float(f"{pct:.1f}")) if np.isfinite(pct) else 0.0
+
+
+# Adequacy lines of _compute_detailed_adequacy, in display order:
+# (label, tolerance key, units, supply, requirement). The supply is an index into the diet
+# summary values or a category mask key; the requirement is a named requirement or a
+# (Constraints key, default) fraction of DMI, with None marking a key that must exist.
+_ADEQUACY_SPECS = (
+    ("DMI", "dmi", "kg/day", 0, "dmi"),
+    ("Energy", "energy", "Mcal/day", 1, "energy"),
+    ("Protein", "protein", "g/day", 2, "protein"),
+    ("Calcium", "ca", "kg/day", 3, "ca"),
+    ("Phosphorus", "p", "kg/day", 4, "p"),
+    ("Forage NDF", "ndf_for", "kg/day", 6, ("ndf_for", 0.20)),
+    ("NDF", "ndf", "kg/day", 5, ("ndf", None)),
+    ("Starch", "starch", "kg/day", 7, ("starch_max", None)),
+    ("Fat", "fat", "kg/day", 8, ("ee_max", None)),
+    ("Concentrate", "conc_max", "kg/day", "mask_conc_all", ("conc_max", 0.6)),
+    ("Moist Forage", "moist_forage_min", "kg/day", "mask_moist_forage", ("moist_forage_min", 0.2)),
+    ("Straw", "forage_straw_max", "kg/day", "mask_straw", ("forage_straw_max", 0.25)),
+    ("Fibrous Forage", "forage_fibrous_max", "kg/day", "mask_lqf", ("forage_fibrous_max", 0.80)),
+    ("By-product", "conc_byprod_max", "kg/day", "mask_wet_byprod", ("conc_byprod_max", 0.30)),
+    ("Wet Other", "other_wet_ingr_max", "kg/day", "mask_wet_other", ("other_wet_ingr_max", 0.30)),
+)
+_CRITICAL_ADEQUACY_LABELS = ("DMI", "Energy", "Protein")
+
+
+def _compute_detailed_adequacy(res, solution_x, f_nd, animal_requirements, q=None, category_kg=None,
+                               present_categories=None, supply_memo=None):
+    """
+    Uncached body of _calculate_detailed_adequacy. Returns the adequacy texts plus the
+    numeric percentages of the critical nutrients (DMI, Energy, Protein). present_categories
+    are the rsm_detect_present_categories masks of f_nd, detected here when not given, and
+    supply_memo the run's rsm_diet_supply_cached memo.
+    """
     try:
-        # Convert solution to quantities
-        decision_mode = getattr(getattr(res, "problem", None), "decision_mode", "kg")
-        trg_dmi = float(animal_requirements["Trg_Dt_DMIn"])
-        q = rsm_decode_solution_to_q(solution_x, decision_mode, trg_dmi)[0]
+        # Convert solution to quantities (unless already decoded)
+        if q is None:
+            q = _decode_q(solution_x, res, animal_requirements)
         
         # Calculate nutritional supply
-        diet_summary_values, intermediate_results_values, _ = rsm_diet_supply(q, f_nd, animal_requirements)
+        diet_summary_values, intermediate_results_values, _ = rsm_diet_supply_cached(q, f_nd, animal_requirements, supply_memo)
         
         # Get animal type and tolerance ranges
         animal_type = animal_requirements.get("An_StatePhys", "Lactating Cow")
@@ -411,142 +657,193 @@ def _calculate_detailed_adequacy(res, solution_x, f_nd, animal_requirements):
         is_heifer = ("heifer" in st)
         thr = Constraints[animal_requirements["An_StatePhys"]]
         
-        adequacy_results = {}
-
-        # Core nutritional constraints
+        # Requirements and limits (kg/day unless noted)
         dmi_req = float(animal_requirements["Trg_Dt_DMIn"])
-        energy_req = float(animal_requirements["An_ME"] if is_heifer else animal_requirements["An_NEL"])
-        protein_req = float(intermediate_results_values[2])
-        ca_req = float(animal_requirements.get("An_Ca_req", 0.0))
-        p_req = float(animal_requirements.get("An_P_req", 0.0))
-        
-        dmi_supply = float(diet_summary_values[0])
-        energy_supply = float(diet_summary_values[1])
-        protein_supply = float(diet_summary_values[2])
-        ca_supply = float(diet_summary_values[3])
-        p_supply = float(diet_summary_values[4])
-        ndf_supply = float(diet_summary_values[5])
-        ndf_for_supply = float(diet_summary_values[6])
-        starch_supply = float(diet_summary_values[7])
-        ee_supply = float(diet_summary_values[8])
-        
-        # Evaluate core constraints
-        if dmi_req > 0:
-            result = evaluate_constraint_adequacy(dmi_supply, dmi_req, "dmi", animal_requirements, "DMI", "kg/day")
-            if result: adequacy_results["DMI"] = result
-            
-        if energy_req > 0:
-            result = evaluate_constraint_adequacy(energy_supply, energy_req, "energy", animal_requirements, "Energy", "Mcal/day")
-            if result: adequacy_results["Energy"] = result
-            
-        if protein_req > 0:
-            result = evaluate_constraint_adequacy(protein_supply, protein_req, "protein", animal_requirements, "Protein", "g/day")
-            if result: adequacy_results["Protein"] = result
-            
-        if ca_req > 0:
-            result = evaluate_constraint_adequacy(ca_supply, ca_req, "ca", animal_requirements, "Calcium", "kg/day")
-            if result: adequacy_results["Calcium"] = result
-            
-        if p_req > 0:
-            result = evaluate_constraint_adequacy(p_supply, p_req, "p", animal_requirements, "Phosphorus", "kg/day")
-            if result: adequacy_results["Phosphorus"] = result
-            
-        # NDF forage minimum
-        ndf_for_min_kg = float(thr.get("ndf_for", 0.20) * dmi_req)
-        if ndf_for_min_kg > 0:
-            result = evaluate_constraint_adequacy(ndf_for_supply, ndf_for_min_kg, "ndf_for", animal_requirements, "Forage NDF", "kg/day")
-            if result: adequacy_results["Forage NDF"] = result
-        
-        # Maximum limits
-        ndf_max_kg = float(thr["ndf"] * dmi_req)
-        starch_max_kg = float(thr["starch_max"] * dmi_req)
-        ee_max_kg = float(thr["ee_max"] * dmi_req)
-        
-        # Debug NDF adequacy calculation (removed - issue fixed)
-            
-        if ndf_max_kg > 0:
-            result = evaluate_constraint_adequacy(ndf_supply, ndf_max_kg, "ndf", animal_requirements, "NDF", "kg/day")
-            if result: adequacy_results["NDF"] = result
-            
-        if starch_max_kg > 0:
-            result = evaluate_constraint_adequacy(starch_supply, starch_max_kg, "starch", animal_requirements, "Starch", "kg/day")
-            if result: adequacy_results["Starch"] = result
-            
-        if ee_max_kg > 0:
-            result = evaluate_constraint_adequacy(ee_supply, ee_max_kg, "fat", animal_requirements, "Fat", "kg/day")
-            if result: adequacy_results["Fat"] = result
-            
+        requirements = {
+            "dmi": dmi_req,
+            "energy": float(animal_requirements["An_ME"] if is_heifer else animal_requirements["An_NEL"]),
+            "protein": float(intermediate_results_values[2]),
+            "ca": float(animal_requirements.get("An_Ca_req", 0.0)),
+            "p": float(animal_requirements.get("An_P_req", 0.0)),
+        }
+
         # Conditional constraints
-        categories = rsm_detect_present_categories(f_nd)
-            
-        # Concentrate maximum
-        mask_conc_all = categories.get('mask_conc_all')
-        if mask_conc_all is not None and len(mask_conc_all) == len(q):
-            conc_kg = float(np.sum(q[mask_conc_all]) if np.any(mask_conc_all) else 0.0)
-            conc_limit = float(thr.get("conc_max", 0.6) * dmi_req)
-            if conc_limit > 0:
-                result = evaluate_constraint_adequacy(conc_kg, conc_limit, "conc_max", animal_requirements, "Concentrate", "kg/day")
-                if result: adequacy_results["Concentrate"] = result
-        
-        # Moist forage minimum
-        mask_moist_forage = categories.get('mask_moist_forage')
-        if mask_moist_forage is not None and len(mask_moist_forage) == len(q):
-            moist_kg = float(np.sum(q[mask_moist_forage]) if np.any(mask_moist_forage) else 0.0)
-            moist_req = float(thr.get("moist_forage_min", 0.2) * dmi_req)
-            if moist_req > 0:
-                result = evaluate_constraint_adequacy(moist_kg, moist_req, "moist_forage_min", animal_requirements, "Moist Forage", "kg/day")
-                # Special formatting for moist forage to show MINIMUM
-                if result:
+        categories = present_categories if present_categories is not None else rsm_detect_present_categories(f_nd)
+
+        def _category_kg(key, mask):
+            # kg of a category: precomputed for the population when available
+            if category_kg is not None and key in category_kg:
+                return category_kg[key]
+            return float(q[mask].sum())
+
+        # Gather (supply, requirement) of every applicable constraint, then evaluate them together
+        rows = []
+        for label, constraint_key, units, supply, requirement in _ADEQUACY_SPECS:
+            if isinstance(supply, str):
+                mask = categories.get(supply)
+                if mask is None or len(mask) != len(q):
+                    continue
+                supply_value = _category_kg(supply, mask)
+            else:
+                supply_value = float(diet_summary_values[supply])
+            if isinstance(requirement, str):
+                target = requirements[requirement]
+            else:
+                thr_key, default = requirement
+                target = float((thr[thr_key] if default is None else thr.get(thr_key, default)) * dmi_req)
+            if target > 0:
+                rows.append((label, constraint_key, units, supply_value, target))
+
+        adequacy_results = {}
+        adequacy_pcts = {}
+        if rows:
+            labels, keys, units, supplies, targets = zip(*rows)
+            texts = evaluate_constraint_adequacy_many(supplies, targets, keys, animal_requirements, labels, units)
+            for label, result, supply_value, target in zip(labels, texts, supplies, targets):
+                if not result:
+                    continue
+                if label == "Moist Forage":
+                    # Special formatting for moist forage to show MINIMUM
                     result = result.replace("/ REQ ", "/ MINIMUM ")
-                    adequacy_results["Moist Forage"] = result
+                adequacy_results[label] = result
+                if label in _CRITICAL_ADEQUACY_LABELS:
+                    adequacy_pcts[label] = _adequacy_pct(supply_value, target)
         
-        # Straw maximum  
-        mask_straw = categories.get('mask_straw')
-        if mask_straw is not None and len(mask_straw) == len(q):
-            straw_kg = float(np.sum(q[mask_straw]) if np.any(mask_straw) else 0.0)
-            straw_lim = float(thr.get("forage_straw_max", 0.25) * dmi_req)
-            if straw_lim > 0:
-                result = evaluate_constraint_adequacy(straw_kg, straw_lim, "forage_straw_max", animal_requirements, "Straw", "kg/day")
-                if result: adequacy_results["Straw"] = result
-        
-        # Fibrous forage maximum
-        mask_lqf = categories.get('mask_lqf')
-        if mask_lqf is not None and len(mask_lqf) == len(q):
-            lqf_kg = float(np.sum(q[mask_lqf]) if np.any(mask_lqf) else 0.0)
-            lqf_lim = float(thr.get("forage_fibrous_max", 0.80) * dmi_req)
-            if lqf_lim > 0:
-                result = evaluate_constraint_adequacy(lqf_kg, lqf_lim, "forage_fibrous_max", animal_requirements, "Fibrous Forage", "kg/day")
-                if result: adequacy_results["Fibrous Forage"] = result
-        
-        # By-product maximum
-        mask_wet_byprod = categories.get('mask_wet_byprod')
-        if mask_wet_byprod is not None and len(mask_wet_byprod) == len(q):
-            byprod_kg = float(np.sum(q[mask_wet_byprod]) if np.any(mask_wet_byprod) else 0.0)
-            byprod_lim = float(thr.get("conc_byprod_max", 0.30) * dmi_req)
-            if byprod_lim > 0:
-                result = evaluate_constraint_adequacy(byprod_kg, byprod_lim, "conc_byprod_max", animal_requirements, "By-product", "kg/day")
-                if result: adequacy_results["By-product"] = result
-        
-        # Other wet ingredients maximum
-        mask_wet_other = categories.get('mask_wet_other')
-        if mask_wet_other is not None and len(mask_wet_other) == len(q):
-            other_wet_kg = float(np.sum(q[mask_wet_other]) if np.any(mask_wet_other) else 0.0)
-            other_wet_lim = float(thr.get("other_wet_ingr_max", 0.30) * dmi_req)
-            if other_wet_lim > 0:
-                result = evaluate_constraint_adequacy(other_wet_kg, other_wet_lim, "other_wet_ingr_max", animal_requirements, "Wet Other", "kg/day")
-                if result: adequacy_results["Wet Other"] = result
-        
-        return adequacy_results
+        return adequacy_results, adequacy_pcts
         
     except Exception as e:
-        print(f"Error calculating detailed adequacy: {e}")
-        return {}
-            
-def rsm_solution_selection(res, f_nd, animal_requirements, use_cv_ranking=True):
+        logger.warning("Error calculating detailed adequacy: %s", e)
+        return {}, {}
+
+def _decode_population(X, decision_mode, trg_dmi):
+    """
+    Decode every solution row of X to kg quantities once, so the scoring helpers can share
+    them. Rows that do not decode are None; the helpers then decode (and fail) themselves.
+    """
+    Q = []
+    for x in X:
+        try:
+            Q.append(rsm_decode_solution_to_q(x, decision_mode, trg_dmi)[0])
+        except Exception:
+            Q.append(None)
+    return Q
+
+def _population_category_kg(Q, categories, f_nd):
+    """
+    Per-solution {mask key: kg} of the category masks from one Q @ M product over the
+    decoded population (constraints.category_matrix); None for rows without q.
+    """
+    out = [None] * len(Q)
+    rows = [i for i, q in enumerate(Q) if q is not None]
+    if not rows:
+        return out
+    try:
+        keys, M = category_matrix(categories, f_nd)
+        totals = np.vstack([Q[i] for i in rows]) @ M
+    except Exception:
+        return out
+    for i, row in zip(rows, totals.tolist()):
+        out[i] = dict(zip(keys, row))
+    return out
+
+def _population_practicality(Q, category_kg, categories, present_categories):
+    """
+    Per-solution practicality dicts of the decoded population, scored in one vectorized pass
+    (_score_practicality_vec). None where a row cannot take that path; those candidates are
+    scored one by one by _calculate_practicality_score.
+    """
+    out = [None] * len(Q)
+    rows = [i for i, q in enumerate(Q)
+            if q is not None and category_kg[i] is not None and "mask_moist_forage" in category_kg[i]]
+    if not rows:
+        return out
+    try:
+        Qm = np.vstack([Q[i] for i in rows])
+        # Same applicability checks as _get_forage_percentage / the anchoring bonus
+        moist_forage_mask = (categories if categories is not None else present_categories).get("mask_moist_forage")
+        if Qm.shape[1] == 0 or moist_forage_mask is None or len(moist_forage_mask) != Qm.shape[1]:
+            return out
+        if categories is not None and any(len(categories.get(k, ())) not in (0, Qm.shape[1])
+                                          for k in ("mask_moist_forage", "mask_conc_all")):
+            return out
+        total_dm = Qm.sum(axis=1)
+        moist_dm = np.array([category_kg[i]["mask_moist_forage"] for i in rows])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            forage_pct = np.where(total_dm > 0, moist_dm / total_dm * 100.0, 0.0)
+        scores = _score_practicality_vec(Qm, forage_pct, categories)
+    except Exception:
+        return out
+    columns = {k: v.tolist() if isinstance(v, np.ndarray) else [v] * len(rows) for k, v in scores.items()}
+    for r, i in enumerate(rows):
+        out[i] = {k: col[r] for k, col in columns.items()}
+    return out
+
+def _cv_totals(CV, n):
+    """
+    Total constraint violation of each of the n solutions as a list of floats; 0.0 where CV
+    has no (numeric) entry for the solution.
+    """
+    if CV is None or len(CV) == 0:
+        return [0.0] * n
+    cv = np.asarray(CV) if isinstance(CV, np.ndarray) else None
+    if cv is not None and cv.dtype.kind == "f" and (cv.ndim == 1 or cv.shape[1:] == (1,)):
+        # pymoo's (n, 1) / (n,) float arrays
+        totals = cv.reshape(len(cv))[:n].tolist()
+        return totals + [0.0] * (n - len(totals))
+    totals = []
+    for idx in range(n):
+        try:
+            totals.append(float(CV[idx]) if idx < len(CV) and CV[idx] is not None else 0.0)
+        except Exception:
+            totals.append(0.0)
+    return totals
+
+def _enhance_and_select(candidates, res, f_nd, animal_requirements, maps, cv_totals, categories, memo,
+                        present_categories, supply_memo):
+    """
+    Attach constraint violation info to a group of candidates, score them and pick one with
+    _apply_fallback_logic. Returns (selected candidate or None, selection message).
+    """
+    n_maps = len(maps) if maps else 0
+    for item in candidates:
+        idx = item["index"]
+        # Add constraint violation info
+        item["cv_total"] = cv_totals[idx]
+        
+        # Add detailed constraint severities if available
+        if idx < n_maps:
+            item["constraint_severities"] = maps[idx] or {}
+    
+    # Calculate comprehensive scores using existing categories (only where they can decide the selection)
+    enhanced_candidates = _score_candidates(candidates, res, f_nd, animal_requirements, categories, memo,
+                                            present_categories, supply_memo)
+    
+    for item in enhanced_candidates:
+        # Critical nutrient adequacy of the candidate, kept with it for reporting
+        dmi_pct, energy_pct, protein_pct = item.get("critical_pcts") or _critical_adequacy_pcts(
+            res, item["x"], f_nd, animal_requirements, item["q"], item["category_kg"], memo, present_categories,
+            supply_memo)
+        item["critical_adequacies"] = {
+            "dmi": dmi_pct,
+            "energy": energy_pct, 
+            "protein": protein_pct,
+            "min_adequacy": min(dmi_pct, energy_pct, protein_pct)
+        }
+    
+    # Apply practicality filter and select best (ranked by composite score)
+    return _apply_fallback_logic(enhanced_candidates)
+
+def rsm_solution_selection(res, f_nd, animal_requirements, use_cv_ranking=True, supply_memo=None):
     
+    # Detailed adequacy of the solutions evaluated in this run, keyed on the solution bytes
+    adequacy_memo = {}
+    # Diet supplies of this run (see rsm_diet_supply_cached); the caller can pass its own to reuse them afterwards
+    if supply_memo is None:
+        supply_memo = {}
+
     # Handle empty population
     if (res is None) or (getattr(res, "X", None) is None) or (len(getattr(res, "X", [])) == 0):
-        print("NO POPULATION: returning diagnostic-only")
+        logger.warning("NO POPULATION: returning diagnostic-only")
         return None, {"satisfaction_flag": "NO_POPULATION"}, "NO_POPULATION"
     
     X = np.asarray(res.X)
@@ -560,109 +857,68 @@ def rsm_solution_selection(res, f_nd, animal_requirements, use_cv_ranking=True):
     maps = None
     if hasattr(res.problem, 'last_satisfaction_flags'):
         flags = res.problem.last_satisfaction_flags
-        print(f"Using stored satisfaction flags for {len(X)} solutions")
+        logger.info("Using stored satisfaction flags for %d solutions", len(X))
     else:
         # Default fallback when satisfaction flags are not available
         flags = ['MARGINAL'] * len(X)
-        print(f"No satisfaction flags found, defaulting {len(X)} solutions to MARGINAL")
+        logger.info("No satisfaction flags found, defaulting %d solutions to MARGINAL", len(X))
     
     if hasattr(res.problem, 'last_constraint_maps'):
         maps = res.problem.last_constraint_maps
 
-    # Group solutions by satisfaction flag
-    solution_groups = {"PERFECT": [], "GOOD": [], "MARGINAL": [], "INFEASIBLE": []}
-    for i, (x, c, d2, d3, fl) in enumerate(zip(X, costs, intake_dev, total_dev, flags)):
-        solution_groups.setdefault(fl, [])
-        solution_groups[fl].append(dict(index=i, x=x, cost=float(c), dev2=float(d2), dev3=float(d3), flag=fl))
+    # Decode the whole population once (decision mode and target DMI are fixed for the run)
+    decision_mode = getattr(getattr(res, "problem", None), "decision_mode", "kg")
+    try:
+        trg_dmi = float(animal_requirements["Trg_Dt_DMIn"])
+        Q = _decode_population(X, decision_mode, trg_dmi)
+    except Exception:
+        Q = [None] * len(X)
+    # Category kg and practicality of the whole population, vectorized
+    present_categories = rsm_detect_present_categories(f_nd)
+    category_kg = _population_category_kg(Q, present_categories, f_nd)
+    practicality = _population_practicality(
+        Q, category_kg, getattr(res, 'problem', None) and getattr(res.problem, 'categories', None), present_categories)
+
+    # Group solutions by satisfaction flag (index arrays; item dicts are built only for the groups scored)
+    flags_arr = np.asarray(list(flags[:len(X)]), dtype=str)
+    group_idx = {g: np.flatnonzero(flags_arr == g) for g in ("PERFECT", "GOOD", "MARGINAL", "INFEASIBLE")}
+    for fl in dict.fromkeys(flags_arr.tolist()):
+        if fl not in group_idx:
+            group_idx[fl] = np.flatnonzero(flags_arr == fl)
 
-    # Handle unknown flags - map infeasible conflicts to INFEASIBLE, others to MARGINAL
-    unknown_flags = set(flags) - set(solution_groups.keys())
+    # Flags that only appear past the population (stale entries) cannot be grouped
+    unknown_flags = set(flags) - set(group_idx.keys())
     if unknown_flags:
-        print(f"Warning: Unknown flags {unknown_flags} being processed")
-        for i, (x, c, d2, d3, fl) in enumerate(zip(X, costs, intake_dev, total_dev, flags)):
-            if fl in unknown_flags:
-                # Map infeasible conflict flags to INFEASIBLE category
-                if fl.startswith("INFEASIBLE"):
-                    solution_groups["INFEASIBLE"].append(dict(
-                        index=i, x=x, cost=float(c), dev2=float(d2), dev3=float(d3), flag="INFEASIBLE"
-                    ))
-                    print(f"  Mapped {fl} → INFEASIBLE")
-                else:
-                    # Map other unknown flags to MARGINAL
-                    solution_groups["MARGINAL"].append(dict(
-                        index=i, x=x, cost=float(c), dev2=float(d2), dev3=float(d3), flag="MARGINAL"
-                    ))
-                    print(f"  Mapped {fl} → MARGINAL")
-
-    for k, v in solution_groups.items():
-        print(f"{k} solutions: {len(v)}")
+        logger.warning("Unknown flags %s being processed", unknown_flags)
+
+    def _group_candidates(flag):
+        idx = group_idx[flag]
+        return [dict(index=i, x=X[i], q=Q[i], category_kg=category_kg[i], practicality=practicality[i],
+                     cost=c, dev2=d2, dev3=d3, flag=flag)
+                for i, c, d2, d3 in zip(idx.tolist(), costs[idx].tolist(),
+                                        intake_dev[idx].tolist(), total_dev[idx].tolist())]
+
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Solutions per flag: %s", ", ".join(f"{k} {len(v)}" for k, v in group_idx.items()))
 
     # cross-group selection: evaluate PERFECT and GOOD together
-    print(f"CROSS-GROUP SELECTION:")
-    
     # Combine PERFECT and GOOD candidates for comparison
-    perfect_candidates = solution_groups.get("PERFECT", [])
-    good_candidates = solution_groups.get("GOOD", [])
+    perfect_candidates = _group_candidates("PERFECT")
+    good_candidates = _group_candidates("GOOD")
     combined_candidates = perfect_candidates + good_candidates
     
-    print(f"   PERFECT: {len(perfect_candidates)} candidates")
-    print(f"   GOOD: {len(good_candidates)} candidates") 
-    print(f"   COMBINED: {len(combined_candidates)} candidates")
+    logger.info("CROSS-GROUP SELECTION: PERFECT %d, GOOD %d, COMBINED %d candidates",
+                len(perfect_candidates), len(good_candidates), len(combined_candidates))
     
     selected = None
     status = "INFEASIBLE"
+    cv_totals = _cv_totals(getattr(res, "CV", None), len(X))
+    categories = getattr(res, 'problem', None) and getattr(res.problem, 'categories', None)
     
     if combined_candidates:
-        # Process all combined candidates        
-        CV = getattr(res, "CV", None)
-        categories = getattr(res, 'problem', None) and getattr(res.problem, 'categories', None)
-        
-        enhanced_candidates = []
-        
-        for item in combined_candidates:
-            # Add constraint violation info
-            cv_value = 0.0
-            if CV is not None and len(CV) > 0:
-                try:
-                    idx = item.get("index", 0)
-                    if idx < len(CV):
-                        cv_value = float(CV[idx]) if CV[idx] is not None else 0.0
-                except Exception:
-                    cv_value = 0.0
-            item["cv_total"] = cv_value
-            
-            # Add detailed constraint severities if available
-            if maps and item.get("index", 0) < len(maps):
-                item["constraint_severities"] = maps[item.get("index", 0)] or {}
-            
-            # Calculate comprehensive scores using existing categories  
-            population_costs = [c["cost"] for c in combined_candidates]
-            item["scores"] = _calculate_composite_score(item, res, f_nd, animal_requirements, categories, population_costs)
-            
-            # Calculate detailed adequacy for evaluation
-            adequacy_results = _calculate_detailed_adequacy(res, item["x"], f_nd, animal_requirements)
-            dmi_pct = _extract_percentage_from_adequacy(adequacy_results.get("DMI", "0%"))
-            energy_pct = _extract_percentage_from_adequacy(adequacy_results.get("Energy", "0%"))
-            protein_pct = _extract_percentage_from_adequacy(adequacy_results.get("Protein", "0%"))
-            
-            # Add adequacy info to item for sorting
-            item["critical_adequacies"] = {
-                "dmi": dmi_pct,
-                "energy": energy_pct, 
-                "protein": protein_pct,
-                "min_adequacy": min(dmi_pct, energy_pct, protein_pct)
-            }
-            
-            enhanced_candidates.append(item)
-        
-        # Sort by composite score (which already includes critical adequacy weighting)
-        enhanced_candidates.sort(key=lambda x: x['scores']['composite'], reverse=True)
-        
-        # Apply practicality filter and select best
-        selected_candidate, selection_msg = _apply_fallback_logic(enhanced_candidates)
-        
-        if selected_candidate:
-            selected = selected_candidate
+        selected, selection_msg = _enhance_and_select(combined_candidates, res, f_nd, animal_requirements, maps, cv_totals, categories,
+                                                 adequacy_memo, present_categories, supply_memo)
+        if selected:
             # Determine status based on original flag
             if selected["flag"] == "PERFECT":
                 status = "OPTIMAL"
@@ -670,113 +926,40 @@ def rsm_solution_selection(res, f_nd, animal_requirements, use_cv_ranking=True):
                 status = "GOOD"
             else:
                 status = "MARGINAL"
-                
-            # Display comprehensive selection info
-            scores = selected["scores"]
-            practicality_data = scores['practicality_data']
-            adeq = selected['critical_adequacies']
-            
-            # print(f"🎯 FINAL SELECTED SOLUTION:")
-            # print(f"  Original Flag: {selected['flag']} | Final Status: {status}")
-            # print(f"  Cost: ${selected['cost']:.2f} | CV: {selected.get('cv_total', 0):.6f}")
-            # print(f"  Critical Nutrients - DMI: {adeq['dmi']:.1f}% | Energy: {adeq['energy']:.1f}% | Protein: {adeq['protein']:.1f}%")
-            # print(f"  Composite Score: {scores['composite']:.3f}")
-            # print(f"  Critical Adequacy: {scores.get('critical_adequacy', 0):.3f}")
-            # print(f"  Practicality: {scores['practicality']:.3f} (forage: {practicality_data['forage_pct']:.1f}%)")
-            # print(f"  Selection Reason: {selection_msg}")
     
     # Fallback to MARGINAL if no PERFECT/GOOD solutions work
     if selected is None:
-        # print(f"NO SUITABLE PERFECT/GOOD SOLUTION FOUND - TRYING MARGINAL")
-        marginal_candidates = solution_groups.get("MARGINAL", [])
-        
+        marginal_candidates = _group_candidates("MARGINAL")
         if marginal_candidates:
-            # Process marginal candidates with same logic
-            CV = getattr(res, "CV", None)
-            categories = getattr(res, 'problem', None) and getattr(res.problem, 'categories', None)
-            
-            marginal_enhanced = []
-            for item in marginal_candidates:
-                cv_value = 0.0
-                if CV is not None and len(CV) > 0:
-                    try:
-                        idx = item.get("index", 0)
-                        if idx < len(CV):
-                            cv_value = float(CV[idx]) if CV[idx] is not None else 0.0
-                    except Exception:
-                        cv_value = 0.0
-                item["cv_total"] = cv_value
-                
-                if maps and item.get("index", 0) < len(maps):
-                    item["constraint_severities"] = maps[item.get("index", 0)] or {}
-                
-                marginal_costs = [c["cost"] for c in marginal_candidates]
-                item["scores"] = _calculate_composite_score(item, res, f_nd, animal_requirements, categories, marginal_costs)
-                marginal_enhanced.append(item)
-            
-            selected_candidate, selection_msg = _apply_fallback_logic(marginal_enhanced)
-            if selected_candidate:
-                selected = selected_candidate
+            selected, selection_msg = _enhance_and_select(marginal_candidates, res, f_nd, animal_requirements, maps, cv_totals, categories,
+                                                 adequacy_memo, present_categories, supply_memo)
+            if selected:
                 status = "MARGINAL"
-                
-                scores = selected["scores"]
-                practicality_data = scores['practicality_data']
-                
-                # print(f"MARGINAL SOLUTION SELECTED:")
-                # print(f"  Cost: ${selected['cost']:.2f} | CV: {selected.get('cv_total', 0):.6f}")
-                # print(f"  Composite Score: {scores['composite']:.3f}")
-                # print(f"  Critical Adequacy: {scores.get('critical_adequacy', 0):.3f}")
-                # print(f"  Practicality: {scores['practicality']:.3f} (forage: {practicality_data['forage_pct']:.1f}%)")
-                # print(f"  Selection: {selection_msg}")
 
     # Final fallback to INFEASIBLE solutions if no other options
     if selected is None:
-        # print(f"NO SUITABLE MARGINAL SOLUTION FOUND - TRYING INFEASIBLE (BEST AVAILABLE)")
-        infeasible_candidates = solution_groups.get("INFEASIBLE", [])
-        
+        infeasible_candidates = _group_candidates("INFEASIBLE")
         if infeasible_candidates:
-            # Process infeasible candidates with same logic
-            CV = getattr(res, "CV", None)
-            categories = getattr(res, 'problem', None) and getattr(res.problem, 'categories', None)
-            
-            infeasible_enhanced = []
-            for item in infeasible_candidates:
-                cv_value = 0.0
-                if CV is not None and len(CV) > 0:
-                    try:
-                        idx = item.get("index", 0)
-                        if idx < len(CV):
-                            cv_value = float(CV[idx]) if CV[idx] is not None else 0.0
-                    except Exception:
-                        cv_value = 0.0
-                item["cv_total"] = cv_value
-                
-                if maps and item.get("index", 0) < len(maps):
-                    item["constraint_severities"] = maps[item.get("index", 0)] or {}
-                
-                infeasible_costs = [c["cost"] for c in infeasible_candidates]
-                item["scores"] = _calculate_composite_score(item, res, f_nd, animal_requirements, categories, infeasible_costs)
-                infeasible_enhanced.append(item)
-            
-            selected_candidate, selection_msg = _apply_fallback_logic(infeasible_enhanced)
-            if selected_candidate:
-                selected = selected_candidate
+            selected, selection_msg = _enhance_and_select(infeasible_candidates, res, f_nd, animal_requirements, maps, cv_totals, categories,
+                                                 adequacy_memo, present_categories, supply_memo)
+            if selected:
                 status = "INFEASIBLE"  # Keep as INFEASIBLE to trigger proper analysis
                 
                 scores = selected["scores"]
                 practicality_data = scores['practicality_data']
                 
-                print(f"INFEASIBLE SOLUTION SELECTED (BEST AVAILABLE):")
-                print(f"  Cost: ${selected['cost']:.2f} | CV: {selected.get('cv_total', 0):.6f}")
-                print(f"  Composite Score: {scores['composite']:.3f}")
-                print(f"  Critical Adequacy: {scores.get('critical_adequacy', 0):.3f}")
-                print(f"  Practicality: {scores['practicality']:.3f} (forage: {practicality_data['forage_pct']:.1f}%)")
-                print(f"  Selection: {selection_msg}")
-                print(f"  NOTE: This solution violates constraints and will trigger detailed analysis.")
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info(
+                        "INFEASIBLE SOLUTION SELECTED (BEST AVAILABLE): cost $%.2f | CV %.6f | composite %.3f | "
+                        "critical adequacy %.3f | practicality %.3f (forage %.1f%%) | %s. "
+                        "This solution violates constraints and will trigger detailed analysis.",
+                        selected['cost'], selected.get('cv_total', 0), scores['composite'],
+                        scores.get('critical_adequacy', 0), scores['practicality'],
+                        practicality_data['forage_pct'], selection_msg)
 
     # No suitable solution found at all
     if selected is None:
-        print('NO SOLUTIONS AVAILABLE - COMPLETE FAILURE')
+        logger.warning("NO SOLUTIONS AVAILABLE - COMPLETE FAILURE")
         return None, None, "INFEASIBLE"
 
     # --- Use stored constraint analysis from evaluate_constraints ---
@@ -847,7 +1030,10 @@ def rsm_solution_selection(res, f_nd, animal_requirements, use_cv_ranking=True):
     
     # Calculate and display detailed adequacy percentages for all constraints
     # print(f"  Detailed Adequacy Analysis:")
-    adequacy_results = _calculate_detailed_adequacy(res, selected["x"], f_nd, animal_requirements)
+    adequacy_results = _calculate_detailed_adequacy(res, selected["x"], f_nd, animal_requirements,
+                                                    q=selected.get("q"), category_kg=selected.get("category_kg"),
+                                                    memo=adequacy_memo, present_categories=present_categories,
+                                                    supply_memo=supply_memo)
     # for constraint_name, adequacy_info in adequacy_results.items():
     #     if adequacy_info:
     #         print(f"    {constraint_name}: {adequacy_info}")
@@ -856,9 +1042,9 @@ def rsm_solution_selection(res, f_nd, animal_requirements, use_cv_ranking=True):
     solution_metrics["detailed_adequacy"] = adequacy_results
 
     # Calculate final solution vector
-    decision_mode = getattr(getattr(res, "problem", None), "decision_mode", "kg")
-    trg_dmi = float(animal_requirements["Trg_Dt_DMIn"])
-    q = rsm_decode_solution_to_q(selected["x"], decision_mode, trg_dmi)[0]
+    q = selected.get("q")
+    if q is None:
+        q = _decode_q(selected["x"], res, animal_requirements)
     
     return q, solution_metrics, status
 
@@ -0,0 +1,67 @@
+"""
+Unit tests for the adequacy display texts: evaluate_constraint_adequacy_many must give the
+same text as evaluate_constraint_adequacy for every constraint
+"""
+import numpy as np
+import pytest
+
+from core.optimization.config import CONSTRAINT_TOLERANCE_RANGES
+from core.optimization.constraints import evaluate_constraint_adequacy, evaluate_constraint_adequacy_many
+
+ANIMAL_REQUIREMENTS = {"An_StatePhys": "Lactating Cow"}
+TOLERANCE_RANGES = CONSTRAINT_TOLERANCE_RANGES[ANIMAL_REQUIREMENTS["An_StatePhys"]]
+
+
+def _band_edges(config):
+    """Finite lo/hi edges (in % deviation) of the severity bands of one constraint"""
+    edges = {0.0}
+    for level in ("perfect", "good", "marginal", "infeasible"):
+        if level in config:
+            edges.update(edge for edge in config[level] if edge < 1000)
+    return sorted(edges)
+
+
+def _assert_matches_scalar(actual, target, keys, units):
+    names = [f"{key} constraint" for key in keys]
+    texts = evaluate_constraint_adequacy_many(actual, target, keys, ANIMAL_REQUIREMENTS, names, units)
+    expected = [
+        evaluate_constraint_adequacy(a, t, key, ANIMAL_REQUIREMENTS, name, unit)
+        for a, t, key, name, unit in zip(actual, target, keys, names, units)
+    ]
+    assert texts == expected
+
+
+@pytest.mark.unit
+class TestEvaluateConstraintAdequacyMany:
+    """Vectorized adequacy texts against the per-constraint version"""
+
+    @pytest.mark.parametrize("key", sorted(TOLERANCE_RANGES))
+    def test_band_boundaries(self, key):
+        """Supplies on each band edge, within and just outside its 1e-9 tolerance, on both sides of the target"""
+        target = 12.5
+        actual, keys = [], []
+        for edge in _band_edges(TOLERANCE_RANGES[key]):
+            for nudge in (-1e-6, -1e-10, 0.0, 1e-10, 1e-6):
+                for sign in (-1.0, 1.0):
+                    actual.append(target * (1.0 + sign * (edge + nudge) / 100.0))
+                    keys.append(key)
+        units = [TOLERANCE_RANGES[key].get("unit", "")] * len(keys)
+        _assert_matches_scalar(actual, [target] * len(keys), keys, units)
+
+    def test_random_rows_across_constraints(self):
+        """Random supplies and targets over every constraint, mixed in one call"""
+        rng = np.random.default_rng(3)
+        keys = sorted(TOLERANCE_RANGES) * 20
+        target = rng.uniform(0.05, 30.0, len(keys))
+        actual = target * rng.uniform(0.0, 2.0, len(keys))
+        units = [TOLERANCE_RANGES[key].get("unit", "") for key in keys]
+        _assert_matches_scalar(actual.tolist(), target.tolist(), keys, units)
+
+    def test_unknown_key_and_zero_target(self):
+        """Constraints without a tolerance range give None; zero supplies and targets are formatted alike"""
+        keys = ["dmi", "not_a_constraint", "ndf", "ca", "energy"]
+        actual = [0.0, 5.0, 3.0, 0.0, 0.0]
+        target = [0.0, 5.0, 0.0, 0.1, 25.0]
+        units = ["kg/day", "", "kg/day", "kg/day", "Mcal/day"]
+        _assert_matches_scalar(actual, target, keys, units)
+        assert evaluate_constraint_adequacy_many(actual, target, keys, ANIMAL_REQUIREMENTS, keys, units)[1] is None
@@ -0,0 +1,145 @@
+"""
+Unit tests for the population constraint pass: build_conditional_constraints_batch and
+evaluate_constraints_batch must give the same G, severity maps and flags as the per-diet
+functions
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.optimization.config import Constraints
+from core.optimization.animal_requirements import rsm_calculate_an_requirements
+from core.optimization.feed_processing import rsm_process_feed_dataframe
+from core.optimization.optimization_core import rsm_detect_present_categories, rsm_diet_supply_batch
+from core.optimization.constraints import (
+    build_conditional_constraints,
+    build_conditional_constraints_batch,
+    evaluate_constraints,
+    evaluate_constraints_batch,
+)
+
+FEED_COLUMNS = ["fd_name", "fd_category", "fd_type", "fd_cost", "fd_dm", "fd_ash", "fd_cp", "fd_ee", "fd_st", "fd_ndf", "fd_ca", "fd_p"]
+FEEDS = [
+    ("Maize silage", "Grass/Legume", "Forage", 0.05, 35, 4, 8, 3, 30, 45, 0.25, 0.22),
+    ("Napier grass", "Grass/Legume", "Forage", 0.03, 20, 10, 9, 2.5, 2, 65, 0.4, 0.3),
+    ("Wheat straw", "Crop residue", "Forage", 0.02, 90, 8, 3.5, 1.5, 1, 78, 0.2, 0.08),
+    ("Alfalfa hay", "Grass/Legume", "Forage", 0.25, 88, 9, 18, 2.5, 2, 42, 1.4, 0.25),
+    ("Maize grain", "Cereal grain", "Concentrate", 0.30, 88, 1.5, 9, 4, 70, 10, 0.03, 0.3),
+    ("Soybean meal", "Plant Protein", "Concentrate", 0.55, 89, 7, 48, 1.5, 2, 12, 0.35, 0.7),
+    ("Wheat bran", "By-product", "Concentrate", 0.18, 88, 6, 16, 4, 20, 45, 0.12, 1.1),
+    ("Brewers grains wet", "By-product", "Concentrate", 0.05, 25, 4, 27, 8, 5, 50, 0.3, 0.6),
+    ("Mineral premix", "Minerals", "Concentrate", 0.9, 98, 90, 0, 0, 0, 0, 20, 8),
+    ("Molasses", "Sugar/Sugar Alcohol", "Concentrate", 0.2, 18, 10, 4, 0.2, 0, 0, 0.8, 0.1),
+]
+
+# Relative offsets of the supply from the target that land on the tolerance band edges
+BAND_EDGES = (0.0, 0.025, 0.05, 0.08, 0.10, 0.12, 0.15, 0.20, 0.25)
+
+KW = dict(energy_offset=1.0, mp_offset=0.10, dmi_lo=0.90, dmi_hi=1.05)
+
+
+@pytest.fixture(scope="module")
+def setup():
+    """Animal, feed library, thresholds and categories as DietOptimizationProblem builds them"""
+    animal_requirements = rsm_calculate_an_requirements({"An_StatePhys": "Lactating Cow", "An_BW": 550, "Trg_MilkProd_L": 25})
+    f_nd, _ = rsm_process_feed_dataframe(pd.DataFrame(FEEDS, columns=FEED_COLUMNS))
+    thr = Constraints[animal_requirements["An_StatePhys"]]
+    dmi = animal_requirements["Trg_Dt_DMIn"]
+    targets = np.array([
+        dmi, animal_requirements["An_NEL"], 0.0, animal_requirements["An_Ca_req"], animal_requirements["An_P_req"],
+        thr["ndf"] * dmi, thr["ndf_for"] * dmi, thr["starch_max"] * dmi, thr["ee_max"] * dmi,
+    ])
+    return animal_requirements, f_nd, thr, rsm_detect_present_categories(f_nd), targets
+
+
+def _diets(setup):
+    """Feed amounts, supplies and targets of random, single-feed, band-edge and infeasible diets"""
+    animal_requirements, f_nd, _, _, base = setup
+    rng = np.random.default_rng(7)
+    n_feeds = len(f_nd["Fd_Name"])
+    dmi = animal_requirements["Trg_Dt_DMIn"]
+
+    # Random diets around the target intake, and diets made of one feed (plus traces of the others)
+    Q_random = rng.dirichlet(np.ones(n_feeds), 60) * dmi * rng.uniform(0.6, 1.4, (60, 1))
+    Q_single = np.full((n_feeds, n_feeds), 1e-3)
+    np.fill_diagonal(Q_single, dmi)
+    Q = np.vstack([Q_random, Q_single])
+    diet_summary, intermediates, _ = rsm_diet_supply_batch(Q, f_nd, animal_requirements)
+    S = diet_summary[:, :9]
+    T = np.tile(base, (len(Q), 1))
+    T[:, 2] = intermediates[:, 2]
+
+    # Supplies exactly on the band edges, below and above the targets
+    n_edges = 2 * len(BAND_EDGES)
+    Q_edge = Q_random[:n_edges]
+    T_edge = T[:n_edges]
+    offsets = np.concatenate([-np.array(BAND_EDGES), np.array(BAND_EDGES)])[:, None]
+    S_edge = T_edge * (1.0 + offsets)
+
+    # Infeasible diets: far below / above every target, and a diet with no intake at all
+    Q_bad = Q_random[:3]
+    T_bad = T[:3]
+    S_bad = T_bad * np.array([[0.3], [2.5], [1.0]])
+    S_bad[2, 0] = 0.0
+
+    return np.vstack([Q, Q_edge, Q_bad]), np.vstack([S, S_edge, S_bad]), np.vstack([T, T_edge, T_bad])
+
+
+@pytest.mark.unit
+class TestEvaluateConstraintsBatch:
+    """Batched constraint builder and evaluator against the per-diet versions"""
+
+    @pytest.mark.parametrize("epsilon", [3.0, 0.05])
+    def test_matches_per_diet_evaluation(self, setup, epsilon):
+        """G, scales, names, severity maps and flags agree row by row"""
+        animal_requirements, f_nd, thr, categories, _ = setup
+        Trg_Dt_DMIn = animal_requirements["Trg_Dt_DMIn"]
+        Q, S, T = _diets(setup)
+        assert np.isfinite(S).all()
+
+        G, scales, names = build_conditional_constraints_batch(
+            Q, S, T, epsilon, f_nd, Trg_Dt_DMIn, thr, categories, energy_offset=1.0, mp_offset=0.10
+        )
+        maps, flags = evaluate_constraints_batch(
+            Q, S, T, epsilon, f_nd, Trg_Dt_DMIn, thr, categories, animal_requirements, constraint_names=names, **KW
+        )
+        assert len(maps) == len(flags) == len(Q)
+
+        for i in range(len(Q)):
+            g, s, row_names = build_conditional_constraints(
+                Q[i], S[i], T[i], epsilon, f_nd, Trg_Dt_DMIn, thr, categories, animal_requirements,
+                energy_offset=1.0, mp_offset=0.10
+            )
+            m = len(row_names)
+            assert names[:m] == row_names
+            np.testing.assert_array_equal(G[i, :m], np.array(g, dtype=float))
+            np.testing.assert_array_equal(scales[i, :m], np.array(s, dtype=float))
+            if S[i, 0] <= 0:
+                # Conc_max is only built for a positive intake; the batch pads its column
+                assert names[m:] == ["Conc_max"]
+                assert G[i, m] == 0.0 and scales[i, m] == 1.0
+            else:
+                assert m == len(names)
+
+            severities, flag = evaluate_constraints(
+                Q[i], S[i], T[i], epsilon, f_nd, Trg_Dt_DMIn, thr, categories, animal_requirements,
+                constraint_names=row_names, **KW
+            )
+            assert maps[i] == severities
+            assert list(maps[i]) == list(severities)
+            assert flags[i] == flag
+
+    def test_diets_cover_every_severity(self, setup):
+        """The test diets reach every severity band and both feasible and infeasible flags"""
+        animal_requirements, f_nd, thr, categories, _ = setup
+        Q, S, T = _diets(setup)
+        _, _, names = build_conditional_constraints_batch(
+            Q, S, T, 0.05, f_nd, animal_requirements["Trg_Dt_DMIn"], thr, categories
+        )
+        maps, flags = evaluate_constraints_batch(
+            Q, S, T, 0.05, f_nd, animal_requirements["Trg_Dt_DMIn"], thr, categories, animal_requirements,
+            constraint_names=names, **KW
+        )
+        assert {severity for m in maps for severity in m.values()} == {"perfect", "good", "marginal", "infeasible"}
+        assert {"PERFECT", "GOOD", "INFEASIBLE"} <= set(flags)
+        assert any(flag.startswith("INFEASIBLE|CONFLICT") for flag in flags)